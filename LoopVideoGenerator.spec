@@ -1,5 +1,10 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# onedir (default) starts far faster than onefile, which unpacks the whole
+# bundle to a temp dir on every launch. Set ONEFILE = True for a single
+# portable exe. UPX stays off: decompressing the Qt DLLs at load time
+# costs more startup than the smaller download saves.
+ONEFILE = False
 
 a = Analysis(
     ['main.py'],
@@ -10,23 +15,18 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter', 'GPUtil', 'ffmpeg'],
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
+exe_options = dict(
     name='LoopVideoGenerator',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
@@ -37,3 +37,30 @@ exe = EXE(
     entitlements_file=None,
     icon=['src\\icons\\loop_app_icon.ico'],
 )
+
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        **exe_options,
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        **exe_options,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='LoopVideoGenerator',
+    )
@@ -31,9 +31,12 @@ pip install pyinstaller Pillow
 
 # 5. Build with PyInstaller
 # Note: --windowed (noconsole) is preferred on Mac.
+# onedir (the default here) launches much faster than onefile, which has to
+# unpack itself on every start. Use BUILD_MODE=onefile for a single binary.
+BUILD_MODE="${BUILD_MODE:-onedir}"
 
-echo "Running PyInstaller..."
-pyinstaller --noconsole --onefile --windowed \
+echo "Running PyInstaller ($BUILD_MODE)..."
+pyinstaller --noconsole --"$BUILD_MODE" --windowed --noupx \
             --name "LoopVideoGenerator" \
             --add-data "src/icons:src/icons" \
             --icon "src/icons/loop_app_icon.png" \
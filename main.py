@@ -1,16 +1,33 @@
 import sys
 import os
-from PySide6.QtWidgets import QApplication
-from src.ui import MainWindow
 
 def main():
+    # Any options switch to the headless CLI (macOS may pass -psn_* itself)
+    if len(sys.argv) > 1 and sys.argv[1].startswith("-") and not sys.argv[1].startswith("-psn"):
+        from src.cli import run_cli
+        sys.exit(run_cli(sys.argv[1:]))
+
+    from src import startup
+    # Interpreter start (and onefile unpacking) up to here
+    startup.mark("python")
+
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
+    from src.ui import MainWindow
+    startup.mark("imports")
+
     app = QApplication(sys.argv)
     
     # Optional: Set app styling here
     app.setStyle("Fusion")
 
     window = MainWindow()
+    startup.mark("window")
     window.show()
+    startup.mark("shown")
+
+    # First event loop turn: the window is on screen and taking input
+    QTimer.singleShot(0, startup.finish)
     
     sys.exit(app.exec())
 
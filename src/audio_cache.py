@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+
+from src.utils import get_app_data_dir, get_file_identity
+
+DEFAULT_MAX_MB = 4096
+# Half-written entries left by a crashed render are removed after this long
+PARTIAL_MAX_AGE = 24 * 3600
+
+class AudioCache:
+    """
+    Content-addressed store of mixed (concatenated + encoded) playlist audio.
+
+    Entries are keyed by a hash of the ordered input identities, the repeat
+    count and the audio codec arguments, so any change to the playlist or to
+    the encoding settings produces a new key. File mtimes double as the LRU
+    clock: a hit touches the entry, eviction removes the oldest first.
+    An entry returned by get() is pinned, and never evicted, until the
+    render using it calls release().
+    """
+
+    def __init__(self, cache_dir=None, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir or get_app_data_dir("audio_cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._pins = {}     # entry path -> renders using it
+
+    def make_key(self, audio_paths, repeat_count, codec_args):
+        """Hash of (ordered input identities, repeat count, codec settings)."""
+        payload = {
+            "inputs": [list(get_file_identity(p)) for p in audio_paths],
+            "repeat": repeat_count,
+            "codec": list(codec_args),
+        }
+        blob = json.dumps(payload, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(blob).hexdigest()
+
+    def _entry_path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}{ext}")
+
+    def temp_path(self, key, ext):
+        """
+        Where a render should write a new entry before calling put(). Unique
+        per call, so renders producing the same entry never share a file.
+        """
+        return os.path.join(self.cache_dir, f"{key}.{uuid.uuid4().hex}.partial{ext}")
+
+    def get(self, key, ext):
+        """
+        Returns the cached file path (marked recently used and pinned until
+        release()), or None.
+        """
+        path = self._entry_path(key, ext)
+        with self._lock:
+            if not os.path.isfile(path):
+                return None
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            self._pins[path] = self._pins.get(path, 0) + 1
+        return path
+
+    def release(self, path):
+        """Unpins an entry returned by get() once the render is done with it."""
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+
+    def put(self, key, ext, src_path, move=True):
+        """
+        Stores src_path under key. With move=True the file is renamed into
+        place (it must live on the cache volume, see temp_path()); otherwise
+        it is copied. Returns the entry path, or None on failure.
+        """
+        dest = self._entry_path(key, ext)
+        tmp = src_path if move else self.temp_path(key, ext)
+        try:
+            if not move:
+                shutil.copyfile(src_path, tmp)
+            # Atomic: readers see the old entry or the complete new one
+            os.replace(tmp, dest)
+        except OSError as e:
+            logging.warning(f"Could not store audio cache entry {key}: {e}")
+            self.discard(tmp)
+            return None
+
+        self.evict()
+        return dest
+
+    def discard(self, tmp_path):
+        """Removes a half-written entry (from temp_path(), e.g. after a failed render)."""
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Drops least recently used entries until the cache fits max_bytes
+        (pinned ones stay), and stale half-written ones.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            now = time.time()
+            for entry in os.scandir(self.cache_dir):
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+                if ".partial" in entry.name:
+                    if now - st.st_mtime > PARTIAL_MAX_AGE:
+                        self.discard(entry.path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path in self._pins:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
@@ -0,0 +1,229 @@
+import math
+import time
+import random
+import itertools
+import threading
+import subprocess
+
+class FFmpegBackend:
+    """
+    Runs ffmpeg for real. Processes are started in their own process group
+    with stdin open, so stop() can ask them to quit with 'q'.
+    """
+    name = 'ffmpeg'
+
+    def start(self, cmd, duration=None, speed_key=None, speed=None):
+        from src.process_control import popen_kwargs
+
+        return subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            **popen_kwargs()
+        )
+
+    def stop(self, process):
+        from src.process_control import stop_process_tree
+        stop_process_tree(process)
+
+    def suspend(self, process):
+        from src.process_control import suspend_process
+        suspend_process(process)
+
+    def resume(self, process):
+        from src.process_control import resume_process
+        resume_process(process)
+
+# === SIMULATOR ===
+# Fallback when neither a recorded profile nor the planner has a speed
+DEFAULT_SIMULATED_SPEED = 4.0
+# Progress lines per simulated encode (ffmpeg prints ~2 per second)
+PROGRESS_LINES = 8
+
+class SimulatedProcess:
+    """
+    Stands in for an ffmpeg Popen object: stdout yields ffmpeg's stats lines
+    ("frame=... time=HH:MM:SS.xx ... speed=N.NNx") paced in scaled wall time,
+    'q' on stdin stops it early, and returncode is set like ffmpeg's.
+    """
+
+    def __init__(self, pid, duration, speed, time_scale, overhead=0.0, fail_at=None):
+        self.pid = pid
+        self.args = None
+        self.returncode = None
+        self.stdin = self
+        self.stdout = self
+        self.duration = max(duration or 0.0, 0.0)
+        self.speed = max(speed, 0.01)
+        self.time_scale = time_scale
+        self.fail_at = fail_at      # media seconds at which the encode breaks
+        self._position = 0.0
+        self._step = self.duration / PROGRESS_LINES if self.duration else 0.0
+        self._quit = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._done = threading.Event()
+        # Wall-clock deadline of the next line; startup overhead comes first
+        self._due = time.monotonic() + overhead / time_scale
+
+    # --- stdout ---
+    def readline(self):
+        if self.returncode is not None:
+            return ''
+        self._sleep_until(self._due)
+        if self._quit.is_set():
+            # ffmpeg finalizes the output and exits cleanly on 'q'
+            return self._exit(0)
+
+        if self.fail_at is not None and self._position + self._step >= self.fail_at:
+            self._position = self.fail_at
+            self._exit(1)
+            return "Error while processing the encoded stream\nConversion failed!\n"
+        if self._position >= self.duration:
+            return self._exit(0)
+
+        self._position = min(self._position + self._step, self.duration)
+        self._due += self._step / self.speed / self.time_scale
+        return self._stats_line()
+
+    def _stats_line(self):
+        h, rest = divmod(self._position, 3600)
+        m, s = divmod(rest, 60)
+        return (f"frame={int(self._position * 30):6d} fps= {self.speed * 30:.0f} q=28.0 "
+                f"size={int(self._position * 256):8d}kB time={int(h):02d}:{int(m):02d}:{s:05.2f} "
+                f"bitrate=2048.0kbits/s speed={self.speed:.2f}x\n")
+
+    def _sleep_until(self, deadline):
+        while True:
+            self._running.wait()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._quit.is_set():
+                return
+            # Wake early for 'q'; suspension is noticed on the next pass
+            if self._quit.wait(remaining):
+                return
+
+    def _exit(self, code):
+        if self.returncode is None:
+            self.returncode = code
+            self._done.set()
+        return ''
+
+    # --- stdin ---
+    def write(self, text):
+        if 'q' in text:
+            self._quit.set()
+            self._running.set()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    # --- Popen API ---
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def kill(self):
+        self._quit.set()
+        self._running.set()
+        self._exit(-9)
+
+    # --- SIGSTOP / SIGCONT ---
+    def suspend(self):
+        if self._running.is_set():
+            self._suspended_at = time.monotonic()
+            self._running.clear()
+
+    def resume(self):
+        if not self._running.is_set():
+            # A stopped process makes no progress while suspended
+            self._due += time.monotonic() - self._suspended_at
+            self._running.set()
+
+class SimulatedBackend:
+    """
+    Fake ffmpeg for benchmarking the scheduler, progress aggregation and
+    resume logic without encoding anything.
+
+    Each encode lasts duration / speed seconds of simulated time, where the
+    speed comes from `profiles` (speed history key -> x realtime, e.g. the
+    recorded speed_history.json entries), else the caller's predicted speed,
+    with log-normal jitter. `time_scale` simulated seconds pass per real
+    second. A `failure_rate` share of encodes exits with code 1 part way.
+    Nothing is written to disk.
+    """
+    name = 'simulated'
+
+    def __init__(self, profiles=None, time_scale=1.0, jitter=0.2, failure_rate=0.0,
+                 overhead=None, seed=None):
+        from src.planner import JOB_OVERHEAD_SECONDS
+
+        self.profiles = profiles or {}
+        self.time_scale = max(float(time_scale), 1e-6)
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.overhead = JOB_OVERHEAD_SECONDS if overhead is None else overhead
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pids = itertools.count(1)
+        self.started = 0
+        self.failed = 0
+        # Simulated seconds of every encode, in start order
+        self.encode_seconds = []
+
+    @classmethod
+    def from_history(cls, path=None, **kwargs):
+        """Uses the realized speeds of a speed history file as profiles."""
+        from src.history import SpeedHistory
+
+        return cls(profiles=SpeedHistory(path).speeds(), **kwargs)
+
+    def start(self, cmd, duration=None, speed_key=None, speed=None):
+        base = self.profiles.get(speed_key) or speed or DEFAULT_SIMULATED_SPEED
+        with self._lock:
+            factor = math.exp(self._random.gauss(0.0, self.jitter)) if self.jitter else 1.0
+            fail_at = None
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                fail_at = self._random.uniform(0.0, duration or 0.0)
+            pid = next(self._pids)
+            self.started += 1
+            if fail_at is not None:
+                self.failed += 1
+            media = fail_at if fail_at is not None else (duration or 0.0)
+            self.encode_seconds.append(self.overhead + media / (base * factor))
+
+        process = SimulatedProcess(pid, duration, base * factor, self.time_scale,
+                                   overhead=self.overhead, fail_at=fail_at)
+        process.args = cmd
+        return process
+
+    def stop(self, process):
+        process.write('q\n')
+        process.wait()
+
+    def suspend(self, process):
+        process.suspend()
+
+    def resume(self, process):
+        process.resume()
+
+BACKENDS = {
+    FFmpegBackend.name: FFmpegBackend,
+    SimulatedBackend.name: SimulatedBackend,
+}
+
+def get_backend(name='ffmpeg', **kwargs):
+    """Creates an execution backend by name ('ffmpeg' or 'simulated')."""
+    try:
+        return BACKENDS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown execution backend: {name}")
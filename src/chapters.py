@@ -0,0 +1,74 @@
+import os
+
+from src.utils import probe_media
+
+# moov sizing for -moov_size: bytes of sample tables per video frame / AAC
+# frame (worst case with B-frames and one chunk per sample), plus headroom
+MOOV_BYTES_PER_VIDEO_FRAME = 24
+MOOV_BYTES_PER_AUDIO_FRAME = 12
+MOOV_BYTES_PER_CHAPTER = 128
+MOOV_BASE_BYTES = 64 * 1024
+AAC_FRAMES_PER_SECOND = 48000 / 1024
+DEFAULT_FPS = 60.0
+
+def track_title(path):
+    """'Artist - Title' from the file's tags, else the file name."""
+    probed = probe_media(path)
+    tags = probed.get('tags', {}) if probed else {}
+    title = (tags.get('title') or "").strip()
+    artist = (tags.get('artist') or "").strip()
+    if title and artist:
+        return f"{artist} - {title}"
+    if title:
+        return title
+    return os.path.splitext(os.path.basename(path))[0]
+
+def build_chapters(paths, durations, fades=None):
+    """
+    One chapter per track of the rendered timeline as (start, end, title)
+    in seconds. With crossfades a chapter starts where its fade-in begins.
+    """
+    chapters = []
+    position = 0.0
+    for i, path in enumerate(paths):
+        duration = durations[i] or 0.0
+        end = position + duration
+        if duration > 0:
+            chapters.append((position, end, track_title(path)))
+        position = end - (fades[i] if fades and i < len(fades) else 0.0)
+    return chapters
+
+def _escape(value):
+    # ffmetadata escapes '=', ';', '#', '\' and newlines with a backslash
+    for ch in ('\\', '=', ';', '#', '\n'):
+        value = value.replace(ch, '\\' + ch)
+    return value
+
+def format_ffmetadata(chapters, title=None):
+    """The ffmetadata document muxed alongside the render."""
+    lines = [";FFMETADATA1"]
+    if title:
+        lines.append(f"title={_escape(title)}")
+    for start, end, name in chapters:
+        lines.extend([
+            "[CHAPTER]",
+            "TIMEBASE=1/1000",
+            f"START={int(round(start * 1000))}",
+            f"END={int(round(end * 1000))}",
+            f"title={_escape(name)}",
+        ])
+    return "\n".join(lines) + "\n"
+
+def metadata_path_for(output_path, scratch_root):
+    return os.path.join(scratch_root, f"{os.path.basename(output_path)}.ffmeta")
+
+def estimate_moov_size(duration, fps=None, chapters=0):
+    """
+    Bytes to reserve at the front of an MP4 for its moov atom, so the file
+    comes out faststart-ready without the +faststart rewrite pass. Errs on
+    the generous side: unused space is just a 'free' atom.
+    """
+    fps = fps or DEFAULT_FPS
+    duration = max(duration or 0, 1)
+    tables = duration * (fps * MOOV_BYTES_PER_VIDEO_FRAME + AAC_FRAMES_PER_SECOND * MOOV_BYTES_PER_AUDIO_FRAME)
+    return int(MOOV_BASE_BYTES + chapters * MOOV_BYTES_PER_CHAPTER + tables * 1.5)
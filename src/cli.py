@@ -0,0 +1,375 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.error
+
+from src.utils import discover_project
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="LoopVideoGenerator",
+        description="Render looping-video playlists without the GUI."
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--batch", metavar="ROOT", help="Batch root folder containing project subfolders.")
+    source.add_argument("--folder", metavar="DIR", help="Single project folder (video + audio files).")
+
+    parser.add_argument("--output", "-o",
+                        help="Output file (single) or folder (batch / --separate).")
+    parser.add_argument("--encoder", default="auto",
+                        help="Video encoder, e.g. libx264, h264_nvenc (default: auto-detect).")
+    parser.add_argument("--separate", action="store_true", help="Render one file per track.")
+    parser.add_argument("--repeat", type=int, default=1, help="Playlist repeat count (combined mode).")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel renders in batch mode.")
+    parser.add_argument("--adaptive-workers", action="store_true",
+                        help="Batch mode: start at --workers, then run more or fewer renders at once as CPU, "
+                             "memory and disk load allow (Linux).")
+    parser.add_argument("--max-workers", type=int, default=None, metavar="N",
+                        help="With --adaptive-workers: never run more than N renders at once (default: CPU count).")
+    parser.add_argument("--crossfade", type=float, default=0, metavar="SECONDS",
+                        help="Crossfade consecutive tracks (combined mode, default: off).")
+    parser.add_argument("--normalize", action="store_true",
+                        help="Two-pass EBU R128 loudness normalization of every track (-16 LUFS).")
+    parser.add_argument("--no-chapters", action="store_true",
+                        help="Do not embed track titles and chapter markers in the output.")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="Skip the ffprobe check of finished outputs (duration, streams, A/V drift).")
+    parser.add_argument("--quarantine", action="store_true",
+                        help="Rename outputs that fail the check to X.corrupt (default: only report them).")
+    parser.add_argument("--progressive", choices=["fmp4", "hls"],
+                        help="Write video outputs as fragmented-MP4 or HLS segments plus a manifest while "
+                             "encoding (X.segments/ next to X.mp4), so uploads can start early.")
+    parser.add_argument("--remux", action="store_true",
+                        help="With --progressive: also stream-copy the segments into a regular X.mp4 at the end.")
+    parser.add_argument("--upload-dir", metavar="DIR",
+                        help="With --progressive: mirror finished segments and the manifest into DIR as they appear.")
+    pace = parser.add_mutually_exclusive_group()
+    pace.add_argument("--deadline", metavar="WHEN",
+                      help="Finish by WHEN (+2h, 23:30 or an ISO date-time): each job gets the slowest "
+                           "(best quality) preset that still makes it.")
+    pace.add_argument("--target-speed", type=float, metavar="X",
+                      help="Best preset that still encodes at X times realtime.")
+    parser.add_argument("--scratch-dir", metavar="DIR",
+                        help="Fast local folder for intermediates (default: the app cache dir).")
+    parser.add_argument("--no-shared-backgrounds", action="store_true",
+                        help="Batch mode: re-encode every folder's background video, even where folders share "
+                             "the same clip (by default each distinct clip is encoded once and stream-copied).")
+    parser.add_argument("--stage-inputs", choices=["auto", "always"],
+                        help="Batch mode: copy the next folders' inputs into the scratch dir while the current "
+                             "ones encode ('auto': only files on network shares such as SMB/NFS).")
+    parser.add_argument("--stage-depth", type=int, default=None, metavar="N",
+                        help="With --stage-inputs: folders to copy ahead (default: 2).")
+    parser.add_argument("--min-free", type=int, default=None, metavar="MB",
+                        help="Free space to keep on every volume; jobs wait until theirs fits (default: 1024).")
+    parser.add_argument("--strict-disk", action="store_true",
+                        help="Refuse a job whose estimated size does not fit even with nothing else running "
+                             "(default: warn and render it).")
+    parser.add_argument("--preview", action="store_true",
+                        help="Quick low-resolution check instead of the full encode: the first seconds of every "
+                             "track and every transition, written to X.preview.mp4.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Plan only: print ffmpeg commands, estimates and disk usage; encode nothing.")
+
+    service = parser.add_argument_group("render service")
+    service.add_argument("--serve", action="store_true",
+                         help="Run the persistent render queue with its local HTTP API.")
+    service.add_argument("--port", type=int, default=None, help="Render service port (default: 8765).")
+    service.add_argument("--submit", action="store_true",
+                         help="Queue the --batch/--folder render on the running service instead of rendering here.")
+    service.add_argument("--jobs", action="store_true", help="List the service's jobs and their progress.")
+    service.add_argument("--job", metavar="ID", help="Show one service job in detail.")
+    service.add_argument("--cancel-job", metavar="ID", help="Cancel a queued or running service job.")
+
+    watch = parser.add_argument_group("watch folder")
+    watch.add_argument("--watch", action="store_true",
+                       help="With --batch: keep running and render new or changed subfolders as they land.")
+    watch.add_argument("--settle", type=int, default=None,
+                       help="Seconds a folder must stay unchanged before it is rendered (default: 30).")
+
+    nodes = parser.add_argument_group("distributed batch")
+    nodes.add_argument("--worker", action="store_true",
+                       help="With --batch: claim folders from the shared queue in --output until none are left.")
+    nodes.add_argument("--worker-id", help="Name of this node in the shared queue (default: host-pid).")
+    nodes.add_argument("--lease", type=int, default=None, help="Folder lease in seconds (default: 120).")
+    nodes.add_argument("--queue-status", action="store_true",
+                       help="Show the shared queue in --output: folder states and per-node progress.")
+
+    monitoring = parser.add_argument_group("monitoring")
+    monitoring.add_argument("--metrics-port", type=int, default=None,
+                            help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics.")
+    monitoring.add_argument("--metrics-textfile", metavar="PATH",
+                            help="Keep a Prometheus textfile (node_exporter collector) updated at PATH.")
+    monitoring.add_argument("--log-json", metavar="PATH",
+                            help="Write structured JSON-lines job events and logs to PATH ('-' for stderr).")
+    return parser
+
+def setup_monitoring(args):
+    """Structured logging and the metrics endpoints requested on the command line."""
+    from src.metrics import setup_logging, serve_metrics, start_textfile_writer
+
+    setup_logging(args.log_json)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    if args.metrics_textfile:
+        start_textfile_writer(os.path.abspath(args.metrics_textfile))
+
+def build_settings(args):
+    """Translates CLI arguments into RenderThread settings."""
+    if args.encoder == "auto":
+        from src.utils import cached_gpu, detect_gpu, store_gpu
+        encoder = cached_gpu()
+        if not encoder:
+            encoder = detect_gpu()
+            store_gpu(encoder)
+    else:
+        encoder = args.encoder
+
+    settings = {
+        "gpu_encoder": encoder,
+        "separate_files": args.separate,
+        "playlist_repeat": max(args.repeat, 1),
+        "crossfade_seconds": max(args.crossfade, 0),
+        "normalize_loudness": args.normalize,
+        "embed_chapters": not args.no_chapters,
+        "verify_outputs": not args.no_verify,
+        "quarantine_invalid": args.quarantine,
+        "dry_run": args.dry_run,
+        "preview": args.preview,
+    }
+    if args.deadline:
+        from src.presets import parse_deadline
+        settings["deadline"] = parse_deadline(args.deadline)
+    if args.target_speed:
+        settings["target_speed"] = args.target_speed
+    if args.progressive:
+        settings["progressive_output"] = args.progressive
+        settings["progressive_remux"] = args.remux
+        if args.upload_dir:
+            settings["upload_dir"] = os.path.abspath(args.upload_dir)
+    if args.scratch_dir:
+        settings["scratch_dir"] = os.path.abspath(args.scratch_dir)
+    if args.min_free is not None:
+        settings["scratch_reserve_mb"] = max(args.min_free, 0)
+    if args.strict_disk:
+        settings["strict_disk_admission"] = True
+
+    # Absolute paths: a queued job may run from another working directory
+    if args.batch:
+        settings["mode"] = "worker" if args.worker else "batch"
+        settings["batch_root"] = os.path.abspath(args.batch)
+        settings["output_path"] = os.path.abspath(args.output)
+        settings["batch_workers"] = max(args.workers, 1)
+        if args.no_shared_backgrounds:
+            settings["shared_backgrounds"] = False
+        if args.stage_inputs:
+            settings["stage_inputs"] = args.stage_inputs
+            if args.stage_depth is not None:
+                settings["stage_depth"] = max(args.stage_depth, 0)
+        if args.adaptive_workers:
+            settings["adaptive_workers"] = True
+            if args.max_workers:
+                settings["max_workers"] = max(args.max_workers, 1)
+        if args.worker_id:
+            settings["worker_id"] = args.worker_id
+        if args.lease:
+            settings["lease_seconds"] = args.lease
+    else:
+        video_path, audio_paths = discover_project(os.path.abspath(args.folder))
+        settings["mode"] = "single"
+        settings["output_path"] = os.path.abspath(args.output)
+        settings["video_path"] = video_path
+        settings["audio_paths"] = audio_paths
+    return settings
+
+def _make_progress_printer(interval=30.0):
+    """
+    Progress output from the coalesced snapshots plus the ETA text:
+    rewritten in place on a terminal, otherwise (logs, render nodes) printed
+    as a plain line at most every `interval` seconds. Returns
+    (on_eta, on_snapshot) callbacks.
+    """
+    state = {'eta': "", 'snapshot': None, 'last': 0.0}
+
+    def render():
+        line = state['eta']
+        snap = state['snapshot']
+        if snap:
+            line = f"{snap['overall']:>3}% {line}"
+            if len(snap['jobs']) > 1:
+                line += " | " + ", ".join(f"{j['label']} {j['percent']}%" for j in snap['jobs'])
+        if sys.stderr.isatty():
+            sys.stderr.write(f"\r{line}\033[K")
+            sys.stderr.flush()
+            return
+        now = time.monotonic()
+        if now - state['last'] >= interval:
+            state['last'] = now
+            print(line, file=sys.stderr)
+
+    def on_eta(text):
+        state['eta'] = text
+        render()
+
+    def on_snapshot(snapshot):
+        state['snapshot'] = snapshot
+        render()
+
+    return on_eta, on_snapshot
+
+def _format_job(job):
+    line = f"{job['id']}  {job['state']:<9} {job['progress']:>3}%"
+    if job.get('eta'):
+        line += f"  {job['eta']}"
+    line += f"  {job['message']}"
+    for active in job.get('active') or []:
+        line += f"\n    {active['label']:<30} {active['percent']:>3}%  {active['eta'] or ''}"
+    return line
+
+def run_service_command(args):
+    """Handles --serve / --submit / --jobs / --job / --cancel-job."""
+    from src.service import DEFAULT_PORT, ServiceClient, serve
+
+    port = args.port or DEFAULT_PORT
+    if args.serve:
+        serve(port)
+        return 0
+
+    client = ServiceClient(port)
+    try:
+        if args.submit:
+            job = client.submit(build_settings(args))
+            print(f"Queued job {job['id']}")
+        elif args.cancel_job:
+            ok = client.cancel(args.cancel_job)['cancelled']
+            print("Cancelled." if ok else "Job not found or already finished.")
+            return 0 if ok else 1
+        elif args.job:
+            print(json.dumps(client.get(args.job), indent=2))
+        else:
+            jobs = client.list()
+            for job in jobs:
+                print(_format_job(job))
+            if not jobs:
+                print("Queue is empty.")
+    except urllib.error.HTTPError as e:
+        print(f"Render service error: {e.code} {e.reason}", file=sys.stderr)
+        return 1
+    except (urllib.error.URLError, OSError) as e:
+        print(f"Render service not reachable on port {port}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def show_queue_status(output_root):
+    """Prints the shared work queue of a distributed batch."""
+    from src.workqueue import WorkQueue, QUEUE_DB_NAME
+
+    if not os.path.isfile(os.path.join(output_root, QUEUE_DB_NAME)):
+        print(f"No shared queue in {output_root}", file=sys.stderr)
+        return 1
+
+    counts, folders, workers = WorkQueue(output_root).status()
+    print("  ".join(f"{state}: {n}" for state, n in sorted(counts.items())) or "Queue is empty.")
+    for folder in folders:
+        if folder['display_state'] in ('claimed', 'expired'):
+            print(f"  {folder['name']:<30} {folder['display_state']:<8} {folder['progress']:>3}%  {folder['worker']}")
+    now = time.time()
+    for worker in workers:
+        age = int(now - (worker['last_seen'] or 0))
+        print(f"node {worker['worker']}: {worker['done']} done, {worker['failed']} failed, "
+              f"last seen {age}s ago, current: {worker['current'] or '-'}")
+    return 0
+
+def run_cli(argv):
+    """Runs one render in the foreground. Returns the process exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    is_render = bool(args.batch or args.folder)
+    if is_render and not args.output:
+        parser.error("--output is required")
+    if args.submit and not is_render:
+        parser.error("--submit needs --batch or --folder")
+    if args.worker and not args.batch:
+        parser.error("--worker needs --batch")
+    if args.watch and not args.batch:
+        parser.error("--watch needs --batch")
+    if args.queue_status:
+        if not args.output:
+            parser.error("--queue-status needs --output")
+        return show_queue_status(args.output)
+    if not is_render and not (args.serve or args.jobs or args.job or args.cancel_job):
+        parser.error("one of --batch, --folder, --serve or --jobs is required")
+    if args.preview and (args.watch or args.worker or args.progressive):
+        parser.error("--preview cannot be combined with --watch, --worker or --progressive")
+    if args.stage_depth is not None and not args.stage_inputs:
+        parser.error("--stage-depth needs --stage-inputs")
+    if args.stage_inputs and not args.batch:
+        parser.error("--stage-inputs needs --batch")
+    if args.max_workers and not args.adaptive_workers:
+        parser.error("--max-workers needs --adaptive-workers")
+    if (args.remux or args.upload_dir) and not args.progressive:
+        parser.error("--remux and --upload-dir need --progressive")
+    if args.deadline:
+        from src.presets import parse_deadline
+        try:
+            parse_deadline(args.deadline)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.batch and not os.path.isdir(args.batch):
+        print(f"Batch root not found: {args.batch}", file=sys.stderr)
+        return 2
+    if args.folder and not os.path.isdir(args.folder):
+        print(f"Folder not found: {args.folder}", file=sys.stderr)
+        return 2
+
+    if args.serve or args.submit or args.jobs or args.job or args.cancel_job:
+        if args.serve:
+            setup_monitoring(args)
+        return run_service_command(args)
+
+    setup_monitoring(args)
+
+    if args.watch:
+        from src.watcher import run_watch
+
+        settings = build_settings(args)
+        if args.settle is not None:
+            settings["watch_settle_seconds"] = args.settle
+        try:
+            run_watch(settings)
+        except KeyboardInterrupt:
+            print("\nStopped watching.", file=sys.stderr)
+        return 0
+
+    from src.processor import RenderThread
+
+    settings = build_settings(args)
+    result = {"ok": False}
+
+    def on_finished(success, message):
+        result["ok"] = success
+        print(message)
+
+    thread = RenderThread(settings)
+    thread.progress_update.connect(print)
+    on_eta, on_snapshot = _make_progress_printer()
+    thread.eta_update.connect(on_eta)
+    thread.progress_snapshot.connect(on_snapshot)
+    thread.finished.connect(on_finished)
+    # Render on a plain worker thread (signals are delivered directly, no Qt
+    # event loop needed) so Ctrl+C can cancel and stop ffmpeg cleanly
+    worker = threading.Thread(target=thread.run)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        print("\nCancelling...", file=sys.stderr)
+        thread.cancel()
+        worker.join()
+
+    return 0 if result["ok"] else 1
@@ -0,0 +1,293 @@
+"""
+Adaptive batch concurrency: the number of folders rendered at once follows
+the machine's live load instead of a fixed worker count.
+
+Load comes from Linux's /proc: CPU and I/O-wait time, available memory,
+pressure stall information (PSI, kernel 4.20+) and the CPU time and thread
+count of the running ffmpeg processes. Pressure on memory or I/O (or CPU
+stalls from oversubscription, e.g. several 4K x264 encodes each running a
+thread per core) shrinks the limit; idle cores enough for one more job of
+the kind running grow it. Running jobs are never interrupted: a smaller
+limit takes effect as they finish. Elsewhere the fixed count is used.
+"""
+import os
+import time
+import logging
+import threading
+
+PROC = "/proc"
+
+# Seconds between load samples
+SAMPLE_SECONDS = 5.0
+# After a change, wait this long before the next one: new jobs need time to
+# ramp up, and PSI figures are 10-second averages
+SETTLE_SECONDS = 20.0
+
+# Shrink when any of these is exceeded
+MEM_AVAILABLE_LOW = 0.10    # share of RAM still available
+PSI_MEMORY_HIGH = 10.0      # % of time some task stalled on memory (avg10)
+PSI_IO_HIGH = 20.0          # % of time all tasks stalled on I/O (full avg10)
+IOWAIT_HIGH = 0.25          # share of CPU time idle waiting for I/O
+PSI_CPU_HIGH = 80.0         # % of time some task waited for a CPU (avg10)
+# Grow only below these
+CPU_BUSY_GROW = 0.85
+PSI_CPU_GROW = 20.0
+
+# === /proc ===
+def read_cpu_times(proc=PROC):
+    """(idle, iowait, total) jiffies of all CPUs since boot, or None."""
+    try:
+        with open(os.path.join(proc, "stat"), 'r') as f:
+            fields = f.readline().split()
+    except OSError:
+        return None
+    if not fields or fields[0] != 'cpu':
+        return None
+    # user nice system idle iowait irq softirq steal (guest time is in user)
+    values = [int(v) for v in fields[1:9]]
+    return values[3], values[4], sum(values)
+
+def read_meminfo(proc=PROC):
+    """{'MemTotal': kB, 'MemAvailable': kB, ...}, empty if unreadable."""
+    info = {}
+    try:
+        with open(os.path.join(proc, "meminfo"), 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                parts = value.split()
+                if parts:
+                    info[key] = int(parts[0])
+    except (OSError, ValueError):
+        pass
+    return info
+
+def read_pressure(resource, proc=PROC):
+    """
+    PSI of 'cpu', 'memory' or 'io' as {'some': avg10, 'full': avg10}
+    (percent), or None without PSI support.
+    """
+    result = {}
+    try:
+        with open(os.path.join(proc, "pressure", resource), 'r') as f:
+            for line in f:
+                parts = line.split()
+                values = dict(p.split('=', 1) for p in parts[1:] if '=' in p)
+                result[parts[0]] = float(values.get('avg10', 0.0))
+    except (OSError, ValueError, IndexError):
+        return None
+    return result
+
+def read_process(pid, proc=PROC):
+    """(CPU jiffies used, thread count) of a process, or None if it is gone."""
+    try:
+        with open(os.path.join(proc, str(pid), "stat"), 'r') as f:
+            text = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces: fields start after its ')'
+    fields = text[text.rfind(')') + 2:].split()
+    try:
+        # utime, stime (fields 14, 15) and num_threads (field 20)
+        return int(fields[11]) + int(fields[12]), int(fields[17])
+    except (IndexError, ValueError):
+        return None
+
+# === SAMPLING ===
+class LoadSampler:
+    """
+    Turns successive /proc readings into load figures. sample() returns
+    None on the first call (CPU use is a difference between two readings).
+    """
+
+    def __init__(self, proc=PROC):
+        self.proc = proc
+        self.cores = os.cpu_count() or 1
+        self._clock = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self._last_cpu = None
+        self._last_time = None
+        self._last_jobs = {}    # pid -> jiffies
+
+    def available(self):
+        return read_cpu_times(self.proc) is not None
+
+    def sample(self, pids=()):
+        """
+        Dict with 'cpu' (busy share of all cores), 'iowait' (share),
+        'mem_available' (share of RAM), 'psi_cpu' / 'psi_memory' / 'psi_io'
+        (PSI dicts or None), 'cores', 'job_cores' (cores the given
+        processes kept busy) and 'job_threads' (their threads).
+        """
+        now = time.monotonic()
+        cpu = read_cpu_times(self.proc)
+        jobs = {}
+        threads = 0
+        for pid in pids:
+            stats = read_process(pid, self.proc)
+            if stats:
+                jobs[pid] = stats[0]
+                threads += stats[1]
+
+        last_cpu, last_time, last_jobs = self._last_cpu, self._last_time, self._last_jobs
+        self._last_cpu, self._last_time, self._last_jobs = cpu, now, jobs
+        if cpu is None or last_cpu is None or cpu[2] <= last_cpu[2]:
+            return None
+
+        total = cpu[2] - last_cpu[2]
+        idle = cpu[0] - last_cpu[0]
+        iowait = cpu[1] - last_cpu[1]
+        # Processes started since the last sample count from zero
+        job_jiffies = sum(used - last_jobs.get(pid, 0) for pid, used in jobs.items())
+        elapsed = max(now - last_time, 1e-6)
+
+        memory = read_meminfo(self.proc)
+        mem_total = memory.get('MemTotal')
+        return {
+            'cpu': max(total - idle - iowait, 0) / total,
+            'iowait': iowait / total,
+            'mem_available': memory.get('MemAvailable', mem_total or 0) / mem_total if mem_total else 1.0,
+            'psi_cpu': read_pressure('cpu', self.proc),
+            'psi_memory': read_pressure('memory', self.proc),
+            'psi_io': read_pressure('io', self.proc),
+            'cores': self.cores,
+            'job_cores': job_jiffies / self._clock / elapsed,
+            'job_threads': threads,
+        }
+
+# === CONTROL ===
+class ConcurrencyController:
+    """
+    Decides the job limit from load samples: one step down under memory,
+    I/O or CPU-stall pressure, one step up when all slots are busy and the
+    idle cores could take another job like the running ones.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None, settle_seconds=SETTLE_SECONDS):
+        self.minimum = max(int(minimum), 1)
+        self.maximum = max(int(maximum or os.cpu_count() or 1), self.minimum)
+        self.limit = min(max(int(initial), self.minimum), self.maximum)
+        self.settle_seconds = settle_seconds
+        self._changed_at = None
+
+    @staticmethod
+    def pressure(sample):
+        """Why the machine is overloaded, or None."""
+        psi_memory, psi_io, psi_cpu = sample['psi_memory'], sample['psi_io'], sample['psi_cpu']
+        if sample['mem_available'] < MEM_AVAILABLE_LOW:
+            return f"{sample['mem_available']:.0%} memory available"
+        if psi_memory and psi_memory.get('some', 0) >= PSI_MEMORY_HIGH:
+            return f"memory pressure {psi_memory['some']:.0f}%"
+        if psi_io and psi_io.get('full', 0) >= PSI_IO_HIGH:
+            return f"I/O pressure {psi_io['full']:.0f}%"
+        if sample['iowait'] >= IOWAIT_HIGH:
+            return f"I/O wait {sample['iowait']:.0%}"
+        if psi_cpu and psi_cpu.get('some', 0) >= PSI_CPU_HIGH:
+            return f"CPU pressure {psi_cpu['some']:.0f}%"
+        return None
+
+    def decide(self, sample, running, now=None):
+        """
+        New limit for the sample given `running` jobs, and the reason for a
+        change (None if the limit stays).
+        """
+        now = time.monotonic() if now is None else now
+        if sample is None or (self._changed_at is not None and now - self._changed_at < self.settle_seconds):
+            return self.limit, None
+
+        reason = self.pressure(sample)
+        if reason:
+            if self.limit <= self.minimum:
+                return self.limit, None
+            return self._change(self.limit - 1, reason, now)
+
+        if running < self.limit or self.limit >= self.maximum:
+            return self.limit, None
+        psi_cpu = sample['psi_cpu']
+        if sample['cpu'] >= CPU_BUSY_GROW or (psi_cpu and psi_cpu.get('some', 0) >= PSI_CPU_GROW):
+            return self.limit, None
+        # A job like the running ones needs about their average CPU
+        spare = sample['cores'] * (1.0 - sample['cpu'])
+        per_job = sample['job_cores'] / running if running and sample['job_cores'] else 1.0
+        if spare < per_job:
+            return self.limit, None
+        return self._change(self.limit + 1, f"{spare:.1f} idle core(s), jobs use ~{per_job:.1f}", now)
+
+    def _change(self, limit, reason, now):
+        self.limit = limit
+        self._changed_at = now
+        return limit, reason
+
+class JobSlots:
+    """A semaphore whose size can change while it is in use."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.running = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, should_stop=None, poll_seconds=1.0):
+        """Blocks until a slot is free. Returns False once should_stop() is true."""
+        with self._cond:
+            while self.running >= self.limit:
+                if should_stop and should_stop():
+                    return False
+                self._cond.wait(poll_seconds)
+            if should_stop and should_stop():
+                return False
+            self.running += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.running -= 1
+            self._cond.notify_all()
+
+    def resize(self, limit):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+class AdaptiveConcurrency:
+    """
+    Background loop sampling the load every `interval` seconds and resizing
+    `slots` by the controller's decisions. pids() lists the running ffmpeg
+    processes; on_change(limit, reason) is called after every change.
+    """
+
+    def __init__(self, slots, controller, sampler=None, pids=None, on_change=None, interval=SAMPLE_SECONDS):
+        self.slots = slots
+        self.controller = controller
+        self.sampler = sampler or LoadSampler()
+        self.pids = pids or (lambda: [])
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="adaptive-concurrency", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self):
+        # A first reading, so the next one has something to compare with
+        self.sampler.sample(self.pids())
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception:
+                logging.exception("Adaptive concurrency sample failed")
+
+    def step(self):
+        sample = self.sampler.sample(self.pids())
+        before = self.controller.limit
+        limit, reason = self.controller.decide(sample, self.slots.running)
+        if limit != before:
+            self.slots.resize(limit)
+            if self.on_change:
+                self.on_change(limit, reason)
+        return sample
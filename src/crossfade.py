@@ -0,0 +1,89 @@
+import os
+
+# Overlaps are rendered to PCM so joining them never re-encodes twice
+OVERLAP_EXT = ".wav"
+OVERLAP_CODEC_ARGS = ['-c:a', 'pcm_s16le']
+DEFAULT_CURVE = 'tri'
+
+def plan_fades(durations, seconds):
+    """
+    Crossfade length for each boundary between consecutive tracks. A fade
+    never takes more than half of either neighbour, and boundaries next to
+    a track of unknown duration stay hard cuts (0).
+    """
+    fades = []
+    for a, b in zip(durations, durations[1:]):
+        if not a or not b or seconds <= 0:
+            fades.append(0.0)
+        else:
+            fades.append(round(min(seconds, a / 2, b / 2), 3))
+    return fades
+
+def overlap_key(path_a, path_b, fade):
+    """Transitions repeat with the playlist; each distinct one renders once."""
+    return (path_a, path_b, fade)
+
+def overlap_command(path_a, duration_a, path_b, fade, output_path, filter_a=None, filter_b=None, curve=DEFAULT_CURVE,
+                    sample_rate=None):
+    """
+    ffmpeg command that renders only the overlap region: the last `fade`
+    seconds of path_a crossfaded into the first `fade` seconds of path_b,
+    at sample_rate (path_a's rate after filter_a) if given.
+    """
+    chain_a = f"{filter_a}," if filter_a else ""
+    chain_b = f"{filter_b}," if filter_b else ""
+    # The two fades are summed by amix, which is what acrossfade computes;
+    # acrossfade itself returns nothing when its first input is Vorbis
+    # (ffmpeg 7.0) or shorter than the fade. Unlike acrossfade, amix picks
+    # its own output rate, hence sample_rate. Probed durations can run past
+    # the decodable audio (an MP3's encoder padding counts in), so the tail
+    # is padded to keep the overlap `fade` long.
+    graph = (
+        f"[0:a]{chain_a}asetpts=PTS-STARTPTS,apad=whole_dur={fade},afade=t=out:d={fade}:curve={curve}[a];"
+        f"[1:a]{chain_b}asetpts=PTS-STARTPTS,afade=t=in:d={fade}:curve={curve}[b];"
+        f"[a][b]amix=inputs=2:duration=longest:normalize=0{f',aresample={sample_rate}' if sample_rate else ''}[x]"
+    )
+    return [
+        'ffmpeg', '-y',
+        '-ss', f"{max(duration_a - fade, 0):.3f}", '-t', f"{fade:.3f}", '-i', path_a,
+        '-t', f"{fade:.3f}", '-i', path_b,
+        '-filter_complex', graph, '-map', '[x]',
+        *OVERLAP_CODEC_ARGS, output_path
+    ]
+
+def build_segments(paths, durations, fades, overlap_paths):
+    """
+    The joined timeline as ffmpeg inputs: each track trimmed to its body
+    (input seeking, so nothing outside the body is decoded), with the
+    pre-rendered overlap between neighbours. Returns a list of
+    (input_args, source_path_or_None); overlaps have no source path since
+    any per-track filtering was already applied when they were rendered.
+    """
+    segments = []
+    for i, path in enumerate(paths):
+        head = fades[i - 1] if i > 0 else 0.0
+        tail = fades[i] if i < len(fades) else 0.0
+
+        args = []
+        if head:
+            args.extend(['-ss', f"{head:.3f}"])
+        body = round(durations[i] - head - tail, 3)
+        if tail:
+            args.extend(['-t', f"{max(body, 0):.3f}"])
+        args.extend(['-i', path])
+        # Fades taking all of a short track leave only its overlaps ('-t 0'
+        # would mean no limit)
+        if not tail or body > 0:
+            segments.append((args, path))
+
+        if tail:
+            overlap = overlap_paths[overlap_key(path, paths[i + 1], tail)]
+            segments.append((['-i', overlap], None))
+    return segments
+
+def overlap_file_name(index):
+    return f"overlap_{index:04d}{OVERLAP_EXT}"
+
+def scratch_dir_for(output_path, scratch_root):
+    """Where the overlaps of a render go inside its job's scratch workspace."""
+    return os.path.join(scratch_root, f"{os.path.basename(output_path)}.xfade")
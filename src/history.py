@@ -0,0 +1,97 @@
+import os
+import json
+import logging
+import threading
+
+from src.utils import get_app_data_dir
+
+# Weight of the newest sample in the running average
+SMOOTHING = 0.3
+
+class SpeedHistory:
+    """
+    Realized encode speeds (x realtime) per (encoder, resolution, preset, mode),
+    stored as an exponentially weighted average in the app data dir.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_app_data_dir(), "speed_history.json")
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable speed history: {e}")
+            return {}
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save speed history: {e}")
+
+    @staticmethod
+    def make_key(encoder, width, height, preset, mode):
+        return f"{encoder}|{width or 0}x{height or 0}|{preset or '-'}|{mode}"
+
+    def record(self, key, media_seconds, wall_seconds):
+        """Adds one finished encode (media length vs. time it took)."""
+        if not media_seconds or not wall_seconds or wall_seconds <= 0:
+            return
+        speed = media_seconds / wall_seconds
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry['speed'] = (1 - SMOOTHING) * entry['speed'] + SMOOTHING * speed
+                entry['samples'] += 1
+            else:
+                self._entries[key] = {'speed': speed, 'samples': 1}
+            self._save()
+
+    def speeds(self):
+        """Every recorded profile as {key: speed}."""
+        with self._lock:
+            return {key: entry['speed'] for key, entry in self._entries.items()}
+
+    def lookup(self, encoder, width, height, preset, mode):
+        """
+        Expected speed for a job, or None if nothing comparable was recorded.
+        Falls back to the same encoder/preset/mode at another resolution,
+        scaled by pixel count.
+        """
+        with self._lock:
+            exact = self._entries.get(self.make_key(encoder, width, height, preset, mode))
+            if exact:
+                return exact['speed']
+
+            if not width or not height:
+                return None
+
+            best = None
+            prefix = f"{encoder}|"
+            suffix = f"|{preset or '-'}|{mode}"
+            for key, entry in self._entries.items():
+                if not key.startswith(prefix) or not key.endswith(suffix):
+                    continue
+                try:
+                    w, h = key.split('|')[1].split('x')
+                    pixels = int(w) * int(h)
+                except ValueError:
+                    continue
+                if pixels <= 0:
+                    continue
+                scaled = entry['speed'] * pixels / (width * height)
+                # Prefer the best-sampled neighbour
+                if best is None or entry['samples'] > best[0]:
+                    best = (entry['samples'], scaled)
+
+        return best[1] if best else None
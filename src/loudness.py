@@ -0,0 +1,102 @@
+import os
+import re
+import json
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils import get_ffmpeg_path, get_media_analysis, store_media_analysis
+
+# EBU R128 streaming targets: integrated loudness, true peak, loudness range
+DEFAULT_TARGET = {'I': -16.0, 'TP': -1.5, 'LRA': 11.0}
+
+# loudnorm works at 192 kHz internally; bring tracks back before the concat
+OUTPUT_SAMPLE_RATE = 48000
+
+def target_name(target):
+    return f"loudnorm:I={target['I']}:TP={target['TP']}:LRA={target['LRA']}"
+
+def measure_loudness(file_path, target=DEFAULT_TARGET):
+    """
+    First loudnorm pass over one file (cached by file identity).
+    Returns the measured values dict, or None if the measurement failed.
+    """
+    name = target_name(target)
+    cached = get_media_analysis(file_path, name)
+    if cached is not None:
+        return cached
+
+    from src.process_control import popen_kwargs
+
+    cmd = [
+        get_ffmpeg_path() or 'ffmpeg', '-hide_banner', '-nostats', '-i', file_path,
+        '-map', '0:a:0',
+        '-af', f"loudnorm=I={target['I']}:TP={target['TP']}:LRA={target['LRA']}:print_format=json",
+        '-f', 'null', '-'
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, stdin=subprocess.DEVNULL, **popen_kwargs())
+        # The JSON block is the last {...} in ffmpeg's log output
+        blocks = re.findall(r"\{[^{}]*\"input_i\"[^{}]*\}", result.stderr)
+        if result.returncode != 0 or not blocks:
+            logging.error(f"Loudness measurement failed for {file_path}")
+            return None
+        data = json.loads(blocks[-1])
+        measured = {
+            'input_i': float(data['input_i']),
+            'input_tp': float(data['input_tp']),
+            'input_lra': float(data['input_lra']),
+            'input_thresh': float(data['input_thresh']),
+            'target_offset': float(data['target_offset']),
+        }
+    except (OSError, ValueError, KeyError) as e:
+        logging.error(f"Loudness measurement failed for {file_path}: {e}")
+        return None
+
+    # -inf loudness (digital silence) cannot be normalized; remember that too
+    store_media_analysis(file_path, name, measured)
+    return measured
+
+def measure_all(paths, target=DEFAULT_TARGET, workers=None, cached_only=False, should_stop=None):
+    """
+    Measures every unique file in parallel (cache hits are free).
+    Returns {path: measurement or None}. With cached_only, nothing new is
+    measured (used by dry runs).
+    """
+    unique = list(dict.fromkeys(paths))
+    results = {}
+    todo = []
+    for path in unique:
+        cached = get_media_analysis(path, target_name(target))
+        if cached is not None or cached_only:
+            results[path] = cached
+        else:
+            todo.append(path)
+
+    if todo:
+        workers = workers or max((os.cpu_count() or 2) // 2, 1)
+
+        def measure(path):
+            if should_stop and should_stop():
+                return None
+            return measure_loudness(path, target)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, measured in zip(todo, pool.map(measure, todo)):
+                results[path] = measured
+    return results
+
+def loudnorm_filter(measured, target=DEFAULT_TARGET):
+    """
+    Second-pass (linear) loudnorm filter for one input, followed by a
+    resample back to OUTPUT_SAMPLE_RATE. Without a usable measurement it
+    falls back to single-pass (dynamic) loudnorm.
+    """
+    base = f"loudnorm=I={target['I']}:TP={target['TP']}:LRA={target['LRA']}"
+    if measured and all(abs(v) != float('inf') for v in measured.values()):
+        base += (
+            f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+            f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+            f":offset={measured['target_offset']}:linear=true"
+        )
+    return f"{base},aresample={OUTPUT_SAMPLE_RATE}"
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import logging
+import threading
+
+DEFAULT_METRICS_PORT = 9465
+
+# name -> (type, help). Counters only ever grow within a process.
+METRICS = {
+    'loopvideo_jobs_total': ('counter', "Render jobs finished, by result."),
+    'loopvideo_encode_seconds_total': ('counter', "Wall-clock seconds spent in ffmpeg encodes."),
+    'loopvideo_media_seconds_total': ('counter', "Seconds of media encoded."),
+    'loopvideo_realtime_factor': ('gauge', "Media seconds per wall second of the last encode."),
+    'loopvideo_probe_cache_hits_total': ('counter', "ffprobe results served from the probe cache."),
+    'loopvideo_probe_cache_misses_total': ('counter', "Files that had to be probed with ffprobe."),
+    'loopvideo_queue_depth': ('gauge', "Jobs waiting to be rendered."),
+    'loopvideo_concurrency_limit': ('gauge', "Batch folders allowed to render at once (adaptive workers)."),
+    'loopvideo_bytes_written_total': ('counter', "Bytes of finished output written."),
+    'loopvideo_verification_failures_total': ('counter', "Outputs that failed post-render verification."),
+    'loopvideo_last_job_timestamp_seconds': ('gauge', "Unix time of the last finished job."),
+}
+
+class MetricsRegistry:
+    """Thread-safe counters and gauges, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}   # (name, sorted label items) -> value
+
+    def inc(self, name, value=1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = float(value)
+
+    def get(self, name, **labels):
+        with self._lock:
+            return self._values.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def render(self):
+        """The Prometheus text exposition of every metric seen so far."""
+        with self._lock:
+            values = dict(self._values)
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            series = [(labels, v) for (n, labels), v in values.items() if n == name]
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series):
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value!r}" if label_text else f"{name} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically writes the metrics for node_exporter's textfile collector."""
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"Could not write metrics textfile {path}: {e}")
+
+registry = MetricsRegistry()
+
+# === EXPORT ===
+def serve_metrics(port=DEFAULT_METRICS_PORT, host='127.0.0.1'):
+    """Serves /metrics on a daemon thread. Returns the server."""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def start_textfile_writer(path, interval=15.0):
+    """Rewrites the textfile every `interval` seconds (and at exit) on a daemon thread."""
+    import atexit
+    atexit.register(registry.write_textfile, path)
+
+    def loop():
+        while True:
+            registry.write_textfile(path)
+            time.sleep(interval)
+    threading.Thread(target=loop, name="metrics-textfile", daemon=True).start()
+
+# === STRUCTURED LOGS ===
+events = logging.getLogger("loopvideo.events")
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus event fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def log_event(event, **fields):
+    """Logs a structured job event (e.g. job_started, job_finished)."""
+    events.info(event, extra={'fields': dict(fields, event=event)})
+
+def setup_logging(json_log=None, level=logging.INFO):
+    """
+    Root logging for headless runs: human-readable lines on stderr, plus
+    JSON lines in `json_log` ('-' for stderr instead of the text lines).
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    if json_log == '-':
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonLinesFormatter())
+        root.addHandler(handler)
+        return
+    text = logging.StreamHandler()
+    text.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    text.setLevel(logging.WARNING)
+    # Job events are for machines; keep the terminal readable
+    text.addFilter(lambda record: record.name != events.name)
+    root.addHandler(text)
+    if json_log:
+        handler = logging.FileHandler(json_log, encoding='utf-8')
+        handler.setFormatter(JsonLinesFormatter())
+        root.addHandler(handler)
@@ -0,0 +1,274 @@
+"""
+Frame-level MP3 joining for parallel audio-only renders.
+
+The playlist is decoded to PCM, cut into chunks on the MP3 frame grid and
+every chunk is encoded on its own, with a little of the neighbouring audio
+before and after it so the encoder starts and ends in a steady state. Only
+the frames that belong to the chunk are kept: chunk c's first kept frame is
+exactly global frame c * chunk_frames, so the concatenated frames decode to
+the same timeline one serial encode would, without gaps at the seams. The
+bit reservoir is disabled so no kept frame depends on a dropped one.
+A LAME/Info header with the total frame count, seek table and the encoder
+delay/padding gives players the exact duration and gapless trimming.
+"""
+import os
+import struct
+
+# libmp3lame's encoder delay (576 samples) plus the decoder's (528 + 1):
+# sample t of the input comes out of the decoder at t + this
+CODEC_DELAY = 576 + 529
+DECODER_DELAY = 529
+# Frames of context encoded in front of a chunk and thrown away
+PREROLL_FRAMES = 2
+# Chunk length: long enough that the pre-roll and seams cost nothing
+CHUNK_SECONDS = 60
+# Raw PCM of the decoded timeline
+PCM_FORMAT_ARGS = ['-f', 's16le']
+BYTES_PER_SAMPLE = 2
+# Chunk encodes write bare frames: no ID3 tag, no Xing header, no reservoir
+CHUNK_MUXER_ARGS = ['-reservoir', '0', '-write_xing', '0', '-id3v2_version', '0', '-f', 'mp3']
+
+# Layer III tables, indexed by the header's version bits (3 = MPEG-1,
+# 2 = MPEG-2, 0 = MPEG-2.5)
+_BITRATES = {
+    3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_BITRATES[0] = _BITRATES[2]
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+# Sample rates that use MPEG-1 frames (the grid the chunking assumes)
+SAMPLE_RATES = (44100, 48000, 32000)
+
+def samples_per_frame(sample_rate):
+    return 1152 if sample_rate in SAMPLE_RATES else 576
+
+# === FRAMES ===
+def parse_header(data, pos=0):
+    """
+    The Layer III frame header at data[pos:] as a dict, or None if there is
+    none: version bits, bitrate (kbps), sample_rate, channels, length
+    (bytes) and samples.
+    """
+    if len(data) < pos + 4:
+        return None
+    b0, b1, b2, b3 = data[pos], data[pos + 1], data[pos + 2], data[pos + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 3
+    layer = (b1 >> 1) & 3
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[version][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    mpeg1 = version == 3
+    length = (144000 if mpeg1 else 72000) * bitrate // sample_rate + padding
+    return {
+        'version': version,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': 1 if (b3 >> 6) == 3 else 2,
+        'length': length,
+        'samples': 1152 if mpeg1 else 576,
+    }
+
+def _side_info_size(header):
+    if header['version'] == 3:
+        return 17 if header['channels'] == 1 else 32
+    return 9 if header['channels'] == 1 else 17
+
+def _id3v2_size(data):
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = 0
+        for b in data[6:10]:
+            size = (size << 7) | (b & 0x7F)
+        return 10 + size + (10 if data[5] & 0x10 else 0)
+    return 0
+
+def iter_frames(data):
+    """
+    (offset, header) of every audio frame in an MP3 file's bytes. Skips a
+    leading ID3v2 tag and a Xing/Info header frame; stops at anything that
+    is not a frame (an ID3v1 tag, trailing junk).
+    """
+    pos = _id3v2_size(data)
+    first = True
+    while True:
+        header = parse_header(data, pos)
+        if header is None or pos + header['length'] > len(data):
+            return
+        if first:
+            first = False
+            tag = pos + 4 + _side_info_size(header)
+            if data[tag:tag + 4] in (b"Xing", b"Info"):
+                pos += header['length']
+                continue
+        yield pos, header
+        pos += header['length']
+
+# === CHUNKS ===
+def plan_chunks(total_samples, sample_rate, period_samples=None, chunk_seconds=CHUNK_SECONDS,
+                preroll_frames=PREROLL_FRAMES):
+    """
+    Splits a timeline of total_samples on the frame grid. Each chunk is a
+    dict with the PCM window to encode ('start', 'count' in samples; start
+    may be negative = silence before the timeline) and the frames of its
+    encode to keep ('skip', 'keep'). With period_samples (a whole number of
+    frames: one pass of a repeated playlist) chunks restart at every
+    period, so the passes are cut alike.
+    """
+    spf = samples_per_frame(sample_rate)
+    # Frames needed so the decoder (after its delay) reaches the last sample
+    total_frames = -(-(total_samples + CODEC_DELAY) // spf)
+    chunk_frames = max(int(chunk_seconds * sample_rate) // spf, preroll_frames + 1)
+    period = period_samples // spf if period_samples else total_frames
+
+    chunks = []
+    first = 0
+    while first < total_frames:
+        period_start = first - first % period
+        next_first = min(first + chunk_frames, period_start + period)
+        if total_frames - next_first <= preroll_frames:
+            # A last sliver (the decoder delay's extra frame) joins this chunk
+            next_first = total_frames
+        start = (first - preroll_frames) * spf
+        # One frame of look-ahead past the kept frames, so they are not
+        # the encoder's flush
+        end = min((next_first + 1) * spf, total_samples)
+        chunks.append({'start': start, 'count': max(end - start, 0),
+                       'skip': preroll_frames, 'keep': next_first - first})
+        first = next_first
+    return chunks
+
+def window_spans(pieces, start, count):
+    """
+    Samples [start, start + count) of a timeline made of raw PCM pieces
+    (path, samples) as (path, offset, samples) spans; path None is silence
+    (before the timeline, or a silent piece). Equal spans mean equal audio.
+    """
+    spans = []
+    if start < 0:
+        spans.append((None, 0, min(-start, count)))
+        count -= min(-start, count)
+        start = 0
+    offset = 0
+    for path, samples in pieces:
+        if count <= 0:
+            break
+        if start < offset + samples:
+            skip = start - offset
+            take = min(samples - skip, count)
+            spans.append((path, skip if path else 0, take))
+            start += take
+            count -= take
+        offset += samples
+    return spans
+
+def write_window(spans, channels, output_path):
+    """Writes the PCM of window_spans() to output_path."""
+    frame_bytes = channels * BYTES_PER_SAMPLE
+    with open(output_path, 'wb') as out:
+        for path, offset, samples in spans:
+            if path is None:
+                out.write(bytes(samples * frame_bytes))
+                continue
+            with open(path, 'rb') as f:
+                f.seek(offset * frame_bytes)
+                out.write(f.read(samples * frame_bytes))
+
+# === HEADER ===
+def crc16(data, crc=0):
+    """CRC-16 (polynomial 0x8005, reflected) of the LAME tag."""
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+def _info_header(header):
+    """4-byte header of the Info frame: like the audio's, big enough for the tag."""
+    version = header['version']
+    rate_bits = _SAMPLE_RATES[version].index(header['sample_rate'])
+    channel_bits = 3 if header['channels'] == 1 else 1
+    needed = 4 + _side_info_size(header) + 156
+    for index, bitrate in enumerate(_BITRATES[version]):
+        if index and bitrate >= header['bitrate']:
+            length = (144000 if version == 3 else 72000) * bitrate // header['sample_rate']
+            if length >= needed:
+                break
+    # No CRC, no padding
+    raw = bytes([0xFF, 0xE0 | (version << 3) | (1 << 1) | 1, (index << 4) | (rate_bits << 2), channel_bits << 6])
+    return raw, length
+
+def build_info_frame(header, frames, total_bytes, toc, delay, padding):
+    """
+    A Xing 'Info' frame with a LAME tag: frame and byte counts, the seek
+    table (toc: 100 byte offsets scaled to 0-255) and the encoder
+    delay/padding for gapless playback.
+    """
+    raw, length = _info_header(header)
+    body = bytearray(length)
+    body[:4] = raw
+    pos = 4 + _side_info_size(header)
+    xing = b"Info" + struct.pack(">III", 0x0F, frames, total_bytes) + bytes(toc) + struct.pack(">I", 0)
+    lame = bytearray(36)
+    lame[0:9] = b"LAME3.100"
+    lame[9] = 1                                 # tag revision 0, CBR
+    lame[20] = min(header['bitrate'], 255)
+    lame[21:24] = ((delay << 12) | padding).to_bytes(3, 'big')
+    struct.pack_into(">I", lame, 28, total_bytes)
+    # The music CRC (lame[32:34]) stays 0: nothing checks it, and it would
+    # mean a pure-Python pass over the whole file
+    body[pos:pos + 120] = xing
+    body[pos + 120:pos + 156] = lame
+    struct.pack_into(">H", body, pos + 154, crc16(body[:pos + 154]))
+    return bytes(body)
+
+def join_chunks(chunk_paths, chunks, total_samples, output_path):
+    """
+    Concatenates the kept frames of every chunk encode into output_path,
+    behind an Info/LAME header describing the whole file. Raises ValueError
+    if an encode came out shorter than planned.
+    """
+    kept = []       # (path, first byte, end byte, frame lengths)
+    header = None
+    for path, chunk in zip(chunk_paths, chunks):
+        with open(path, 'rb') as f:
+            data = f.read()
+        frames = list(iter_frames(data))[chunk['skip']:chunk['skip'] + chunk['keep']]
+        if len(frames) < chunk['keep']:
+            raise ValueError(f"{os.path.basename(path)}: {len(frames)} of {chunk['keep']} frames")
+        header = header or frames[0][1]
+        start = frames[0][0]
+        end = frames[-1][0] + frames[-1][1]['length']
+        kept.append((path, start, end, [h['length'] for _, h in frames]))
+
+    lengths = [n for _, _, _, chunk_lengths in kept for n in chunk_lengths]
+    frame_count = len(lengths)
+    info_length = _info_header(header)[1]
+    total_bytes = info_length + sum(lengths)
+
+    # Seek table: where each percent of the duration starts, in 1/256 of the file
+    offsets = []
+    position = info_length
+    for n in lengths:
+        offsets.append(position)
+        position += n
+    toc = [min(offsets[i * frame_count // 100] * 256 // total_bytes, 255) for i in range(100)]
+
+    delay = CODEC_DELAY - DECODER_DELAY
+    padding = frame_count * header['samples'] - delay - total_samples
+    tmp = output_path + ".tmp"
+    with open(tmp, 'wb') as out:
+        out.write(bytes(info_length))
+        for path, start, end, _ in kept:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                data = f.read(end - start)
+            out.write(data)
+        out.seek(0)
+        out.write(build_info_frame(header, frame_count, total_bytes, toc, delay, padding))
+    os.replace(tmp, output_path)
+    return frame_count
@@ -0,0 +1,275 @@
+import os
+import heapq
+import shlex
+import shutil
+import subprocess
+
+from src.utils import (discover_project, probe_media, format_duration, content_digest, content_fingerprint,
+                       get_media_analysis, store_media_analysis)
+
+# Rough encode speed (x realtime) for a 1080p30 background, used until the
+# speed history has a measurement for the encoder. Only the relative order
+# matters for scheduling; the absolute values just make the up-front estimate
+# plausible.
+DEFAULT_SPEEDS = {
+    'libx264': 4.0,
+    'nvenc': 15.0,
+    'amf': 12.0,
+    'qsv': 12.0,
+    'videotoolbox': 10.0,
+}
+AUDIO_ONLY_SPEED = 60.0
+REFERENCE_PIXEL_RATE = 1920 * 1080 * 30
+
+# Fixed cost of starting ffmpeg, opening inputs and writing the tracklist
+JOB_OVERHEAD_SECONDS = 2.0
+
+def default_speed(gpu_encoder):
+    for name, speed in DEFAULT_SPEEDS.items():
+        if name in gpu_encoder:
+            return speed
+    return DEFAULT_SPEEDS['libx264']
+
+def speed_profile(gpu_encoder, video_info, preset, mode):
+    """(encoder, width, height, preset, mode) key parts for the speed history."""
+    if video_info is None:
+        return ('libmp3lame', 0, 0, None, 'audio')
+    return (gpu_encoder, video_info.get('width'), video_info.get('height'), preset, mode)
+
+def estimate_speed(gpu_encoder, video_info, speed_history=None, preset=None, mode='combined'):
+    """
+    Expected encode speed (x realtime) for a background video.
+    Uses the measured speed history when it has a comparable entry, otherwise
+    the default encoder speed scaled by pixel rate relative to 1080p30.
+    """
+    if speed_history is not None:
+        measured = speed_history.lookup(*speed_profile(gpu_encoder, video_info, preset, mode))
+        if measured:
+            return measured
+
+    if video_info is None or mode == 'copy':
+        # Stream-copied video: the audio encode is the work
+        return AUDIO_ONLY_SPEED
+
+    width = video_info.get('width') or 1920
+    height = video_info.get('height') or 1080
+    fps = video_info.get('fps') or 30
+
+    pixel_rate = max(width * height * fps, 1)
+    return default_speed(gpu_encoder) * REFERENCE_PIXEL_RATE / pixel_rate
+
+def inspect_project(folder):
+    """
+    Discovers and probes one batch subfolder.
+    Returns a project dict used by the planner and the batch renderer.
+    """
+    video_path, audio_paths = discover_project(folder)
+
+    durations = []
+    for path in audio_paths:
+        info = probe_media(path)
+        durations.append((info.get('duration') or 0.0) if info else 0.0)
+
+    video_info = None
+    if video_path:
+        probed = probe_media(video_path)
+        video_info = probed.get('video') if probed else None
+
+    return {
+        'folder': folder,
+        'name': os.path.basename(folder),
+        'video_path': video_path,
+        'video_info': video_info,
+        'audio_paths': audio_paths,
+        'audio_durations': durations,
+        'audio_duration': sum(durations),
+        'est_seconds': 0.0,
+    }
+
+def background_fingerprint(video_path):
+    """
+    Key under which byte-identical background videos are likely to match:
+    size and a sampled hash of the file, plus its probed stream. Cached per
+    file identity. None if the file cannot be read. share_backgrounds()
+    confirms matches between different files with a full hash.
+    """
+    cached = get_media_analysis(video_path, "fingerprint")
+    if cached:
+        return cached
+    probed = probe_media(video_path)
+    video = (probed.get('video') if probed else None) or {}
+    try:
+        content = content_fingerprint(video_path)
+    except OSError:
+        return None
+    fingerprint = (f"{content}|{video.get('codec')}|{video.get('width')}x{video.get('height')}"
+                   f"@{video.get('fps')}|{probed.get('duration') if probed else None}")
+    store_media_analysis(video_path, "fingerprint", fingerprint)
+    return fingerprint
+
+def share_backgrounds(projects, separate_files):
+    """
+    Finds the background videos several encodes of a batch use (the same
+    clip in many folders, or every track of a folder in separate mode).
+    Their projects get 'background_key' and 'background_users' (the number
+    of encodes sharing it), so the clip is encoded once and copied into
+    each output. Returns the number of shared backgrounds.
+    """
+    groups = {}
+    for project in projects:
+        if project['video_path']:
+            key = background_fingerprint(project['video_path'])
+            if key:
+                groups.setdefault(key, []).append(project)
+
+    # Different files with the same fingerprint only share once their whole
+    # content is known to match
+    confirmed = {}
+    for key, members in groups.items():
+        if len({p['video_path'] for p in members}) < 2:
+            confirmed[key] = members
+            continue
+        for project in members:
+            try:
+                digest = content_digest(project['video_path'])
+            except OSError:
+                continue
+            confirmed.setdefault(f"{key}|{digest}", []).append(project)
+    groups = confirmed
+
+    shared = 0
+    for key, members in groups.items():
+        users = sum(len(p['audio_paths']) if separate_files else 1 for p in members)
+        if users < 2:
+            continue
+        shared += 1
+        for project in members:
+            project['background_key'] = key
+            project['background_users'] = users
+    return shared
+
+def estimate_project_cost(project, gpu_encoder, repeat_count, separate_files, speed_history=None, preset=None):
+    """Estimated wall-clock seconds to render a project."""
+    mode = 'separate' if separate_files else 'combined'
+    if project.get('background_key'):
+        mode = 'copy'
+    speed = estimate_speed(gpu_encoder, project['video_info'], speed_history, preset, mode)
+
+    if separate_files:
+        # One encode per track, repeat does not apply
+        media_seconds = project['audio_duration']
+        jobs = len(project['audio_paths'])
+    else:
+        media_seconds = project['audio_duration'] * repeat_count
+        jobs = 1
+
+    cost = media_seconds / max(speed, 0.01) + jobs * JOB_OVERHEAD_SECONDS
+    if project.get('background_key'):
+        # This folder's share of encoding the clip once
+        clip = (probe_media(project['video_path']) or {}).get('duration') or 0.0
+        video_speed = estimate_speed(gpu_encoder, project['video_info'], speed_history, preset, 'combined')
+        cost += clip / max(video_speed, 0.01) * (jobs / project['background_users'])
+    return cost
+
+def plan_batch(projects, gpu_encoder, repeat_count, separate_files, workers=1, speed_history=None, preset=None):
+    """
+    Orders projects longest-job-first (LPT) and estimates the batch makespan.
+
+    Each project gets its 'est_seconds' filled in. Returns (ordered_projects,
+    makespan_seconds) where the makespan simulates `workers` parallel slots
+    taking jobs in the returned order.
+    """
+    for project in projects:
+        project['est_seconds'] = estimate_project_cost(
+            project, gpu_encoder, repeat_count, separate_files, speed_history, preset
+        )
+
+    ordered = sorted(projects, key=lambda p: p['est_seconds'], reverse=True)
+
+    slots = [0.0] * max(int(workers), 1)
+    for project in ordered:
+        start = heapq.heappop(slots)
+        heapq.heappush(slots, start + project['est_seconds'])
+
+    return ordered, max(slots)
+
+# === DRY RUN REPORT ===
+AUDIO_BITRATE = 192000
+
+def estimate_video_bitrate(video_info):
+    """
+    Bitrate guess (bits/s) for the re-encoded background: the source stream's
+    bitrate when known, otherwise ~0.1 bits per pixel per frame.
+    """
+    if not video_info:
+        return 0
+    if video_info.get('bit_rate'):
+        return video_info['bit_rate']
+    width = video_info.get('width') or 1920
+    height = video_info.get('height') or 1080
+    fps = video_info.get('fps') or 30
+    return int(width * height * fps * 0.1)
+
+def estimate_output_bytes(duration, video_info):
+    """Estimated output size in bytes for `duration` seconds of output."""
+    bitrate = estimate_video_bitrate(video_info) + AUDIO_BITRATE
+    return int((duration or 0) * bitrate / 8)
+
+def format_bytes(num):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(num) < 1024:
+            return f"{num:.1f} {unit}"
+        num /= 1024
+    return f"{num:.1f} TB"
+
+def format_command(cmd):
+    """Shell-ready rendering of an ffmpeg argument list."""
+    if os.name == 'nt':
+        return subprocess.list2cmdline(cmd)
+    return shlex.join(cmd)
+
+def build_dry_run_report(jobs, output_dir, makespan=None):
+    """
+    Formats planned jobs (as recorded by RenderThread in dry-run mode) into a
+    text report. Returns (report_text, summary_line).
+    """
+    total_bytes = sum(job['est_bytes'] for job in jobs)
+    total_duration = sum(job['duration'] or 0 for job in jobs)
+
+    try:
+        free_bytes = shutil.disk_usage(output_dir).free
+    except OSError:
+        free_bytes = None
+
+    lines = ["=== DRY RUN: nothing was encoded ===", ""]
+    for n, job in enumerate(jobs, 1):
+        header = f"[{n}/{len(jobs)}] {os.path.basename(job['output'])}"
+        if job.get('project'):
+            header += f"  (folder: {job['project']})"
+        lines.append(header)
+        lines.append(f"  Output:          {job['output']}")
+        for step in job['strategy']:
+            lines.append(f"  Path:            {step}")
+        lines.append(f"  Output duration: {format_duration(job['duration'])}")
+        lines.append(f"  Estimated size:  {format_bytes(job['est_bytes'])}")
+        if job.get('est_seconds'):
+            lines.append(f"  Estimated time:  {format_duration(job['est_seconds'])}")
+        for cmd in job['commands']:
+            lines.append(f"  $ {format_command(cmd)}")
+        lines.append("")
+
+    lines.append(f"Jobs:                 {len(jobs)}")
+    lines.append(f"Total output length:  {format_duration(total_duration)}")
+    lines.append(f"Estimated disk usage: {format_bytes(total_bytes)}")
+    if makespan is not None:
+        lines.append(f"Estimated batch time: {format_duration(makespan)}")
+    if free_bytes is not None:
+        lines.append(f"Free on output volume: {format_bytes(free_bytes)} ({output_dir})")
+        if total_bytes > free_bytes:
+            lines.append("WARNING: estimated output does NOT fit on the output volume!")
+
+    summary = f"Dry run: {len(jobs)} job(s), ~{format_bytes(total_bytes)} output"
+    if free_bytes is not None:
+        fits = "fits" if total_bytes <= free_bytes else "DOES NOT FIT"
+        summary += f", {format_bytes(free_bytes)} free ({fits})"
+    return "\n".join(lines) + "\n", summary
@@ -0,0 +1,113 @@
+import re
+import time
+import datetime
+
+# Encoder preset ladders, best quality (slowest) first. Each preset has a
+# rough speed relative to the family's default preset; calibration and the
+# speed history replace these guesses with measurements where they can.
+LADDERS = {
+    'libx264': {
+        'default': 'medium',
+        'presets': [('veryslow', 0.22), ('slower', 0.35), ('slow', 0.65), ('medium', 1.0), ('fast', 1.25),
+                    ('faster', 1.6), ('veryfast', 2.6), ('superfast', 4.0), ('ultrafast', 6.0)],
+        # CRF values, best first, with their speed relative to the default (23)
+        'qualities': [(18, 0.85), (20, 0.92), (23, 1.0)],
+    },
+    'nvenc': {
+        'default': 'p4',
+        'presets': [('p7', 0.45), ('p6', 0.6), ('p5', 0.8), ('p4', 1.0), ('p3', 1.2), ('p2', 1.5), ('p1', 1.8)],
+        'qualities': [(19, 0.95), (23, 1.0)],
+    },
+    'amf': {
+        'default': 'balanced',
+        'presets': [('quality', 0.6), ('balanced', 1.0), ('speed', 1.5)],
+        'qualities': [(None, 1.0)],
+    },
+}
+
+# Aim this much faster than strictly needed (speed estimates are noisy)
+SAFETY_MARGIN = 1.15
+# Seconds of the background clip encoded to measure this machine's speed
+CALIBRATION_SECONDS = 20
+
+def family(encoder):
+    if 'nvenc' in encoder:
+        return 'nvenc'
+    if 'amf' in encoder:
+        return 'amf'
+    return 'libx264'
+
+def encoder_args(encoder, preset=None, quality=None):
+    """
+    FFmpeg video codec arguments. Without preset/quality these are the
+    fixed defaults used outside deadline mode.
+    """
+    fam = family(encoder)
+    preset = preset or LADDERS[fam]['default']
+    if fam == 'nvenc':
+        args = ['-c:v', encoder, '-preset', preset, '-tune', 'hq']
+        if quality is not None:
+            args.extend(['-rc', 'vbr', '-cq', str(quality), '-b:v', '0'])
+    elif fam == 'amf':
+        args = ['-c:v', encoder, '-quality', preset]
+    else:
+        args = ['-c:v', 'libx264', '-preset', preset]
+        if quality is not None:
+            args.extend(['-crf', str(quality)])
+    return args
+
+def choose(encoder, required_speed, reference_speed, measured=None):
+    """
+    Picks the slowest preset (and then the lowest CRF) predicted to encode
+    at required_speed x realtime. reference_speed is the expected speed of
+    the default preset; measured(preset) may return a recorded speed for a
+    preset, which wins over the scaled reference.
+    Returns (preset, quality, predicted_speed); the fastest candidate if
+    none is quick enough.
+    """
+    ladder = LADDERS[family(encoder)]
+    target = required_speed * SAFETY_MARGIN
+    choice = None
+    for preset, factor in ladder['presets']:
+        speed = (measured(preset) if measured else None) or reference_speed * factor
+        for quality, q_factor in ladder['qualities']:
+            choice = (preset, quality, speed * q_factor)
+            if speed * q_factor >= target:
+                return choice
+    return choice
+
+def required_speed(media_seconds, seconds_left, workers=1, jobs=0, job_overhead=0.0):
+    """
+    Realtime factor each of `workers` parallel encodes needs so that
+    media_seconds of output are done within seconds_left. None when the
+    deadline has (practically) passed.
+    """
+    usable = seconds_left * max(workers, 1) - jobs * job_overhead
+    if usable <= 0:
+        return None
+    return media_seconds / usable
+
+def parse_deadline(text, now=None):
+    """
+    Unix time for a deadline given as '+90m' / '+2h' / '+45s', 'HH:MM' (the
+    next such time of day) or an ISO date-time. Raises ValueError.
+    """
+    now = time.time() if now is None else now
+    text = text.strip()
+    match = re.fullmatch(r'\+(\d+(?:\.\d+)?)([smh]?)', text)
+    if match:
+        unit = {'s': 1, 'm': 60, 'h': 3600, '': 60}[match.group(2)]
+        return now + float(match.group(1)) * unit
+
+    match = re.fullmatch(r'(\d{1,2}):(\d{2})', text)
+    if match:
+        base = datetime.datetime.fromtimestamp(now)
+        at = base.replace(hour=int(match.group(1)), minute=int(match.group(2)), second=0, microsecond=0)
+        if at.timestamp() <= now:
+            at += datetime.timedelta(days=1)
+        return at.timestamp()
+
+    try:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise ValueError(f"Unrecognized deadline: {text!r} (use +2h, 23:30 or 2024-05-01T08:00)")
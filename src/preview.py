@@ -0,0 +1,129 @@
+import os
+
+# Excerpt of every track: its first seconds, and its last ones so each
+# transition into the next track is heard
+HEAD_SECONDS = 10
+TAIL_SECONDS = 4
+# Small and choppy on purpose: the preview checks order and looks, not quality
+HEIGHT = 180
+FPS = 10
+VIDEO_ARGS = ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '35', '-pix_fmt', 'yuv420p']
+AUDIO_ARGS = ['-c:a', 'aac', '-b:a', '96k']
+MP3_AUDIO_ARGS = ['-c:a', 'libmp3lame', '-b:a', '96k']
+CURVE = 'tri'
+
+def preview_path_for(output_path, separate_files=False):
+    """
+    X.mp4 -> X.preview.mp4 next to it. Separate-file renders go to a
+    folder, whose preview is <folder>/<folder name>.preview.mp4.
+    """
+    if separate_files:
+        return os.path.join(output_path, f"{os.path.basename(os.path.normpath(output_path))}.preview.mp4")
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.preview{ext or '.mp4'}"
+
+def plan_clips(durations, fades=None, head=HEAD_SECONDS, tail=TAIL_SECONDS, head_only_last=False):
+    """
+    Excerpts of the tracks as (track_index, start, length): the first
+    `head` and the last `tail` seconds of each (the whole track if that is
+    barely longer), stretched to hold the crossfades the full render
+    applies there. With head_only_last the last track is just its head
+    (the playlist wrapping around on repeat).
+    """
+    clips = []
+    for i, duration in enumerate(durations):
+        fade_in = fades[i - 1] if fades and i > 0 else 0.0
+        fade_out = fades[i] if fades and i < len(fades) else 0.0
+        head_len = max(head, fade_in)
+        tail_len = max(tail, fade_out)
+        if not duration:
+            # Unknown length: the head only, cut by the input if shorter
+            clips.append((i, 0.0, head_len))
+        elif head_only_last and i == len(durations) - 1:
+            clips.append((i, 0.0, min(head_len, duration)))
+        elif duration <= head_len + tail_len:
+            clips.append((i, 0.0, duration))
+        else:
+            clips.append((i, 0.0, head_len))
+            clips.append((i, duration - tail_len, tail_len))
+    return clips
+
+def _boundary_fade(clips, n, fades):
+    """Crossfade between clip n-1 and clip n (0 inside a track or on hard cuts)."""
+    previous = clips[n - 1][0]
+    if clips[n][0] == previous or not fades or previous >= len(fades):
+        return 0.0
+    return fades[previous]
+
+def timeline(clips, fades=None):
+    """(preview length, start of each clip in the preview) in seconds."""
+    starts = []
+    position = 0.0
+    for n, (_, _, length) in enumerate(clips):
+        if n:
+            position -= _boundary_fade(clips, n, fades)
+        starts.append(position)
+        position += length
+    return position, starts
+
+def build_chapters(clips, fades, titles):
+    """One chapter per track, starting at its first clip, as (start, end, title)."""
+    total, starts = timeline(clips, fades)
+    firsts = []
+    for n, clip in enumerate(clips):
+        if n == 0 or clip[0] != clips[n - 1][0]:
+            firsts.append((starts[n], titles[clip[0]]))
+    return [(start, firsts[k + 1][0] if k + 1 < len(firsts) else total, title)
+            for k, (start, title) in enumerate(firsts)]
+
+def audio_graph(clips, fades, first_input, out_label):
+    """
+    filter_complex parts joining the clip inputs (starting at input index
+    first_input): acrossfade where the full render crossfades, else a cut.
+    """
+    if len(clips) == 1:
+        return [f"[{first_input}:a]anull[{out_label}]"]
+    parts = []
+    current = f"[{first_input}:a]"
+    for n in range(1, len(clips)):
+        label = f"[{out_label}]" if n == len(clips) - 1 else f"[join{n}]"
+        fade = _boundary_fade(clips, n, fades)
+        if fade:
+            parts.append(f"{current}[{first_input + n}:a]acrossfade=d={fade}:c1={CURVE}:c2={CURVE}{label}")
+        else:
+            parts.append(f"{current}[{first_input + n}:a]concat=n=2:v=0:a=1{label}")
+        current = label
+    return parts
+
+def preview_command(paths, clips, fades, video_path, output_path, meta_path=None):
+    """
+    ffmpeg command of the preview: every clip is an input-seeked excerpt,
+    so only those seconds of each track are decoded, over the background
+    scaled down to HEIGHT at FPS.
+    """
+    cmd = ['ffmpeg', '-y']
+    first_audio = 0
+    if video_path:
+        cmd.extend(['-stream_loop', '-1', '-i', video_path])
+        first_audio = 1
+    for index, start, length in clips:
+        if start:
+            cmd.extend(['-ss', f"{start:.3f}"])
+        cmd.extend(['-t', f"{length:.3f}", '-i', paths[index]])
+    meta_index = first_audio + len(clips)
+    if meta_path:
+        cmd.extend(['-f', 'ffmetadata', '-i', meta_path])
+
+    graph = audio_graph(clips, fades, first_audio, "outa")
+    if video_path:
+        graph.append(f"[0:v]fps={FPS},scale=-2:{HEIGHT}:flags=fast_bilinear[outv]")
+    cmd.extend(['-filter_complex', ";".join(graph)])
+    if video_path:
+        cmd.extend(['-map', '[outv]', '-map', '[outa]'])
+        cmd.extend(VIDEO_ARGS + AUDIO_ARGS + ['-shortest'])
+    else:
+        cmd.extend(['-map', '[outa]'] + MP3_AUDIO_ARGS)
+    if meta_path:
+        cmd.extend(['-map_metadata', str(meta_index), '-map_chapters', str(meta_index)])
+    cmd.append(output_path)
+    return cmd
@@ -0,0 +1,93 @@
+import os
+import signal
+import logging
+import subprocess
+
+IS_WINDOWS = os.name == 'nt'
+
+def popen_kwargs():
+    """
+    Extra subprocess.Popen arguments for ffmpeg children: no console window
+    on Windows, and an own process group everywhere so the whole tree can be
+    signalled (and Ctrl+C in a terminal does not hit ffmpeg directly).
+    """
+    if IS_WINDOWS:
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        return {
+            'startupinfo': startupinfo,
+            'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP,
+        }
+    return {'start_new_session': True}
+
+def stop_process_tree(process, grace_seconds=5.0):
+    """
+    Stops ffmpeg gracefully: 'q' on stdin first (lets it finalize cleanly),
+    then a terminate signal to the process group, then a hard kill.
+    """
+    if process.poll() is not None:
+        return
+
+    try:
+        if process.stdin:
+            process.stdin.write('q\n')
+            process.stdin.flush()
+        process.wait(timeout=grace_seconds)
+        return
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        pass
+
+    try:
+        if IS_WINDOWS:
+            subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)],
+                           capture_output=True, **_no_window())
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=grace_seconds)
+        return
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+
+    try:
+        if not IS_WINDOWS:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+        process.wait(timeout=grace_seconds)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.error(f"Could not stop ffmpeg (pid {process.pid}): {e}")
+
+def suspend_process(process):
+    """Pauses a running ffmpeg (and its group) without killing it."""
+    if process.poll() is not None:
+        return
+    try:
+        if IS_WINDOWS:
+            _nt_call('NtSuspendProcess', process)
+        else:
+            os.killpg(process.pid, signal.SIGSTOP)
+    except OSError as e:
+        logging.warning(f"Could not pause ffmpeg (pid {process.pid}): {e}")
+
+def resume_process(process):
+    """Resumes a process paused with suspend_process()."""
+    if process.poll() is not None:
+        return
+    try:
+        if IS_WINDOWS:
+            _nt_call('NtResumeProcess', process)
+        else:
+            os.killpg(process.pid, signal.SIGCONT)
+    except OSError as e:
+        logging.warning(f"Could not resume ffmpeg (pid {process.pid}): {e}")
+
+def _nt_call(name, process):
+    import ctypes
+    status = getattr(ctypes.windll.ntdll, name)(int(process._handle))
+    if status != 0:
+        raise OSError(f"{name} failed with status {status:#x}")
+
+def _no_window():
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return {'startupinfo': startupinfo}
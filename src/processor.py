@@ -1,18 +1,96 @@
 import os
-import subprocess
+import shutil
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PySide6.QtCore import QThread, Signal
 
+# Audio codec settings for each output type (also part of the audio cache key)
+VIDEO_AUDIO_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+MP3_AUDIO_ARGS = ['-c:a', 'libmp3lame', '-b:a', '192k']
+# -shortest stops at the end of the encoded audio, but x264 still flushes
+# its lookahead: a second or two of video past it. The muxer's own shortest
+# mode drops those packets.
+SHORTEST_ARGS = ['-shortest', '-fflags', '+shortest', '-max_interleave_delta', '0']
+# ffmpeg's message when a -moov_size reservation cannot hold the index
+MOOV_TOO_SMALL = "reserved_moov_size is too small"
+# Non-progress ffmpeg output lines kept per run for error checks
+FFMPEG_TAIL_LINES = 50
+
 class RenderThread(QThread):
     progress_update = Signal(str)
     progress_value = Signal(int)       # Current Task (0-100)
     progress_batch = Signal(int)       # Batch Progress (0-100)
+    eta_update = Signal(str)           # "ETA m:ss" text for the status bar / CLI
+    progress_snapshot = Signal(object) # Coalesced per-job table (see src.progress)
     finished = Signal(bool, str)
 
-    def __init__(self, settings):
+    def __init__(self, settings, audio_cache=None, speed_history=None, backend=None):
         super().__init__()
         self.settings = settings
         self.is_running = True
+        self.cancelled = False
+        # Batch folders that rendered successfully (watch mode uses this)
+        self.succeeded_folders = set()
+        # Preview mode: the preview files written, for the UI to open
+        self.preview = settings.get('preview', False)
+        self.preview_paths = []
+        # A long-lived service passes its already opened caches in
+        self._audio_cache = audio_cache
+
+        # Where ffmpeg commands run: the real binary, or the simulator
+        # (src.backends) when benchmarking the scheduler
+        if backend is None:
+            from src.backends import get_backend
+            backend = get_backend(settings.get('backend', 'ffmpeg'))
+        self.backend = backend
+
+        # Running ffmpeg processes, so cancel/pause can reach them
+        self._procs_lock = threading.Lock()
+        self._procs = set()
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        self._paused_at = None
+        self._paused_total = 0.0
+
+        # Dry run: discovery and (cached) probing only, ffmpeg is never started
+        self.dry_run = settings.get('dry_run', False)
+        self.dry_run_jobs = []
+        self._dry_run_makespan = None
+
+        # ETA tracking: remaining seconds per running ffmpeg, plus the
+        # estimated seconds of work that has not started yet
+        self._speed_history = speed_history
+        self._eta_lock = threading.Lock()
+        self._eta_jobs = {}
+        self._eta_pending = 0.0
+        self._eta_workers = 1
+        self._eta_batch = False
+        self._eta_last_emit = 0.0
+
+        # Backgrounds shared by several encodes of a batch: fingerprint ->
+        # one pass of the clip, encoded once and stream-copied by every user
+        self._loops_lock = threading.Lock()
+        self._loops = {}
+
+        # Intermediates go to per-job scratch workspaces; jobs are only
+        # admitted while their output and intermediates fit on disk
+        self._scratch = None
+
+        # Output verification runs on its own pool, overlapping the next encode
+        self._verifier = None
+        self._verify_lock = threading.Lock()
+        self._checks = threading.local()
+        self.verification_results = []
+
+        # Per-job progress goes through the aggregator, which publishes
+        # coalesced snapshots at a fixed rate instead of one signal per line
+        from src.progress import ProgressAggregator, DEFAULT_INTERVAL
+        self.progress = ProgressAggregator(settings.get('progress_interval', DEFAULT_INTERVAL))
+        self.progress.subscribe(self._publish_progress)
+        self._job = threading.local()
 
     def run(self):
         mode = self.settings.get('mode', 'single') # 'single' or 'batch'
@@ -20,11 +98,17 @@ class RenderThread(QThread):
         separate_files = self.settings.get('separate_files', False)
         playlist_repeat = self.settings.get('playlist_repeat', 1)
         
+        self.progress.start()
         try:
             if mode == 'batch':
                 batch_root = self.settings.get('batch_root')
                 output_root = self.settings.get('output_path') # In batch mode, this is a folder
                 self._run_batch_mode(batch_root, output_root, gpu_encoder, separate_files, playlist_repeat)
+            elif mode == 'worker':
+                # One of several nodes sharing a batch through the output root
+                batch_root = self.settings.get('batch_root')
+                output_root = self.settings.get('output_path')
+                self._run_worker_mode(batch_root, output_root, gpu_encoder, separate_files, playlist_repeat)
             else:
                 # Single Mode
                 output_path = self.settings.get('output_path')
@@ -35,101 +119,1057 @@ class RenderThread(QThread):
                     self.finished.emit(False, "No audio files selected.")
                     return
 
+                self._job.id = 'render'
+                if self.preview:
+                    self._run_preview(output_path, video_path, audio_paths, separate_files, playlist_repeat)
+                    return
+                refused = self._admit_job('render', output_path, video_path, audio_paths,
+                                          1 if separate_files else playlist_repeat)
+                if refused:
+                    self.finished.emit(False, f"Not enough disk space: {refused}")
+                    return
+                self.progress.start_job('render', os.path.basename(output_path))
+                self._single_started = self._job_started(os.path.basename(output_path))
+                if self.settings.get('target_speed') or self.settings.get('deadline'):
+                    from src.utils import get_media_duration
+                    media = sum(get_media_duration(p) or 0.0 for p in audio_paths)
+                    self._select_preset(gpu_encoder, video_path, os.path.basename(output_path),
+                                        media * (1 if separate_files else playlist_repeat), 1, 1,
+                                        'separate' if separate_files else 'combined')
+
                 if separate_files:
                     # In single mode, output_path is a Folder if separate_files is True
                     # Repeat not supported in separate files mode
-                    self._render_separate(output_path, video_path, audio_paths, gpu_encoder)
+                    ok = self._render_separate(output_path, video_path, audio_paths, gpu_encoder)
+                    self.progress.finish_job('render', ok and not self.cancelled)
+                    if not self.dry_run:
+                        self._job_finished(os.path.basename(output_path), ok, self._single_started)
+                    if self.dry_run:
+                        self._finish_dry_run(output_path)
+                    elif self.cancelled:
+                        self.finished.emit(False, "Render cancelled.")
+                    elif ok:
+                        self.progress_value.emit(100)
+                        self.finished.emit(True, "Render Complete!")
+                    else:
+                        self.finished.emit(False, "One or more tracks failed to render.")
                 else:
                     # In single mode, output_path is a File
                     self._render_single(output_path, video_path, audio_paths, gpu_encoder, repeat_count=playlist_repeat)
+                    if self.dry_run:
+                        self._finish_dry_run(os.path.dirname(os.path.abspath(output_path)))
 
         except Exception as e:
             self.finished.emit(False, str(e))
+        finally:
+            if self._verifier:
+                self._verifier.shutdown(wait=True)
+            if self._scratch:
+                self._scratch.close()
+            self.progress.finish_job('render', False)
+            self.progress.stop()
+
+    # === JOB CONTROL ===
+    def cancel(self):
+        """
+        Stops the render: no new jobs start, running ffmpeg processes are
+        asked to quit ('q'), then signalled; partial outputs are removed by
+        the render methods once their ffmpeg exits.
+        """
+        self.is_running = False
+        self.cancelled = True
+        with self._procs_lock:
+            procs = list(self._procs)
+        # Paused processes cannot read 'q'
+        for proc in procs:
+            self.backend.resume(proc)
+        self._resume_event.set()
+
+        # Stopping can take a few seconds; never block the caller (GUI)
+        for proc in procs:
+            threading.Thread(target=self.backend.stop, args=(proc,), daemon=True).start()
+
+    def pause(self):
+        """Suspends running ffmpeg processes and holds back new jobs."""
+        if not self._resume_event.is_set():
+            return
+        self._resume_event.clear()
+        self._paused_at = time.monotonic()
+        with self._procs_lock:
+            for proc in self._procs:
+                self.backend.suspend(proc)
+        self.progress_update.emit("Paused.")
+
+    def resume(self):
+        if self._resume_event.is_set():
+            return
+        if self._paused_at is not None:
+            self._paused_total += time.monotonic() - self._paused_at
+            self._paused_at = None
+        with self._procs_lock:
+            for proc in self._procs:
+                self.backend.resume(proc)
+        self._resume_event.set()
+        self.progress_update.emit("Resumed.")
+
+    @property
+    def is_paused(self):
+        return not self._resume_event.is_set()
+
+    def _wait_if_paused(self):
+        """Blocks between jobs while paused. Returns False once cancelled."""
+        self._resume_event.wait()
+        return self.is_running
+
+    def _remove_partial(self, *paths):
+        """Deletes outputs left behind by a cancelled or failed ffmpeg run."""
+        for path in paths:
+            if path and os.path.isfile(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logging.warning(f"Could not remove partial output {path}: {e}")
+
+    def _record_dry_run(self, output_path, commands, strategy, duration, video_path):
+        """Stores what a render would do instead of doing it."""
+        from src.planner import estimate_output_bytes
+        from src.utils import probe_media
+
+        video_info = None
+        if video_path:
+            probed = probe_media(video_path)
+            video_info = probed.get('video') if probed else None
+
+        self.dry_run_jobs.append({
+            'output': output_path,
+            'commands': commands,
+            'strategy': strategy,
+            'duration': duration,
+            'est_bytes': estimate_output_bytes(duration, video_info),
+        })
+
+    def _finish_dry_run(self, output_dir):
+        """Writes the dry-run report next to the outputs and finishes."""
+        from src.planner import build_dry_run_report
+
+        report, summary = build_dry_run_report(self.dry_run_jobs, output_dir, makespan=self._dry_run_makespan)
+        for line in report.splitlines():
+            self.progress_update.emit(line)
+
+        report_path = os.path.join(output_dir, "dry_run_report.txt")
+        try:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                f.write(report)
+            summary += f"\n\nFull report: {report_path}"
+        except OSError as e:
+            logging.warning(f"Could not write dry-run report: {e}")
+
+        self.progress_value.emit(100)
+        self.finished.emit(True, summary)
+
+    # === PROGRESS ===
+    def _report_progress(self, percent):
+        """Records the calling worker's job progress (published later, coalesced)."""
+        job_id = getattr(self._job, 'id', None)
+        if job_id is not None:
+            self.progress.update(job_id, percent=percent)
+
+    def _publish_progress(self, snapshot):
+        """Aggregator subscriber: turns a snapshot into the Qt signals."""
+        if snapshot['jobs']:
+            self.progress_value.emit(snapshot['current'])
+        if self._eta_batch:
+            self.progress_batch.emit(snapshot['overall'])
+        self.progress_snapshot.emit(snapshot)
+
+    # === METRICS ===
+    def _job_started(self, name):
+        """Logs a job_started event. Returns the start time for _job_finished()."""
+        from src.metrics import log_event
+
+        log_event('job_started', job=name, mode=self.settings.get('mode', 'single'))
+        return time.monotonic()
+
+    def _job_finished(self, name, ok, started):
+        from src.metrics import registry, log_event
+
+        result = 'cancelled' if self.cancelled else ('done' if ok else 'failed')
+        registry.inc('loopvideo_jobs_total', result=result)
+        registry.set('loopvideo_last_job_timestamp_seconds', time.time())
+        log_event('job_finished', job=name, result=result, seconds=round(time.monotonic() - started, 2))
+
+    def _record_output(self, path):
+        """Counts a finished output file towards bytes written."""
+        from src.metrics import registry, log_event
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        registry.inc('loopvideo_bytes_written_total', size)
+        log_event('output_written', path=path, bytes=size)
+
+    # === OUTPUT VERIFICATION ===
+    def _verify_output(self, output_path, expected_duration, has_video):
+        """
+        Queues a packet-level check of a finished output; it runs while the
+        next job encodes. Returns a Future of the result, or None if disabled.
+        """
+        if self.dry_run or not self.settings.get('verify_outputs', True):
+            return None
+        with self._verify_lock:
+            if self._verifier is None:
+                workers = max(int(self.settings.get('batch_workers', 1)), 1)
+                self._verifier = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify")
+            return self._verifier.submit(self._check_output, output_path, expected_duration, has_video)
+
+    def _check_output(self, output_path, expected_duration, has_video):
+        from src.metrics import registry, log_event
+        from src.verify import verify_output, quarantine
+
+        result = verify_output(output_path, expected_duration, has_video)
+        if not result['ok']:
+            registry.inc('loopvideo_verification_failures_total')
+            log_event('verification_failed', path=output_path, problems=result['problems'])
+            logging.warning(f"Verification failed: {output_path} ({'; '.join(result['problems'])})")
+            # The check can be wrong (odd containers, probe quirks): the output
+            # stays where it is unless moving failed ones aside was asked for
+            if self.settings.get('quarantine_invalid', False):
+                result['moved_to'] = quarantine(output_path)
+            self.progress_update.emit(
+                f"Verification failed: {os.path.basename(output_path)} ({'; '.join(result['problems'])})"
+            )
+        with self._verify_lock:
+            self.verification_results.append(result)
+        return result
+
+    def _checks_passed(self, futures):
+        """
+        Batch folders hand their checks to the batch worker (which waits for
+        them later); everything else waits here. Returns False on a failed check.
+        """
+        futures = [f for f in futures if f is not None]
+        collector = getattr(self._checks, 'futures', None)
+        if collector is not None:
+            collector.extend(futures)
+            return True
+        return all(f.result()['ok'] for f in futures)
+
+    def _write_batch_report(self, output_root, lines):
+        """Writes render_report.txt (per-folder status + verification) to the output root."""
+        from src.verify import format_report
+
+        report = "\n".join(lines) + "\n\n" + format_report(self.verification_results) + "\n"
+        try:
+            with open(os.path.join(output_root, "render_report.txt"), 'w', encoding='utf-8') as f:
+                f.write(report)
+        except OSError as e:
+            logging.warning(f"Could not write render report: {e}")
+
+    def _get_audio_cache(self):
+        """Lazily opens the mixed-audio cache, or returns None if disabled."""
+        if not self.settings.get('audio_cache', True):
+            return None
+        if self._audio_cache is None:
+            from src.audio_cache import AudioCache, DEFAULT_MAX_MB
+            self._audio_cache = AudioCache(
+                cache_dir=self.settings.get('audio_cache_dir'),
+                max_mb=self.settings.get('audio_cache_max_mb', DEFAULT_MAX_MB)
+            )
+        return self._audio_cache
+
+    def _get_speed_history(self):
+        """Lazily opens the encode speed history, or returns None if disabled."""
+        if not self.settings.get('speed_history', True):
+            return None
+        if self._speed_history is None:
+            from src.history import SpeedHistory
+            self._speed_history = SpeedHistory(self.settings.get('speed_history_path'))
+        return self._speed_history
+
+    def _get_scratch(self):
+        """Lazily creates the scratch manager (and sweeps up crashed runs)."""
+        if self._scratch is None:
+            from src.scratch import ScratchManager, DEFAULT_RESERVE_MB
+            self._scratch = ScratchManager(
+                root=self.settings.get('scratch_dir'),
+                reserve_mb=self.settings.get('scratch_reserve_mb', DEFAULT_RESERVE_MB),
+                strict=self.settings.get('strict_disk_admission', False)
+            )
+            self._scratch.cleanup_stale()
+        return self._scratch
+
+    def _job_scratch(self):
+        """The current job's scratch workspace (only named, not created, in dry runs)."""
+        return self._get_scratch().workspace(getattr(self._job, 'id', None) or 'render', create=not self.dry_run)
+
+    def _admit_job(self, job_id, output_path, video_path, audio_paths, repeat_count):
+        """
+        Waits until the job's predicted output and intermediates fit on
+        disk next to those of the running jobs. Returns None once admitted,
+        or the reason it was refused.
+        """
+        from src.planner import AUDIO_BITRATE, estimate_output_bytes, format_bytes
+        from src.utils import probe_media
+
+        if self.dry_run or self.preview or not self.settings.get('disk_admission', True):
+            return None
+
+        duration = 0.0
+        for path in audio_paths:
+            info = probe_media(path)
+            duration += (info.get('duration') or 0.0) if info else 0.0
+        duration *= repeat_count
+        video_info = None
+        if video_path:
+            probed = probe_media(video_path)
+            video_info = (probed.get('video') if probed else None) or {}
+
+        scratch = self._get_scratch()
+        needs = [(output_path, estimate_output_bytes(duration, video_info))]
+        crossfade = float(self.settings.get('crossfade_seconds', 0) or 0)
+        if crossfade > 0 and len(audio_paths) * repeat_count > 1:
+            # 16-bit stereo PCM overlaps at 48 kHz
+            needs.append((scratch.workspace(job_id), crossfade * (len(audio_paths) * repeat_count - 1) * 48000 * 4))
+        if not video_path and self.settings.get('chunked_audio', True):
+            # Chunked MP3 encodes: the inputs decoded to PCM (48 kHz stereo
+            # at most) plus the chunk encodes
+            needs.append((scratch.workspace(job_id), duration / repeat_count * 48000 * 4 + duration * AUDIO_BITRATE / 8))
+        cache = self._get_audio_cache()
+        if cache:
+            # The mix is also written into the audio cache
+            needs.append((cache.cache_dir, duration * AUDIO_BITRATE / 8))
+
+        def waiting(missing):
+            self.progress_update.emit(
+                f"Waiting for disk space: {os.path.basename(output_path)} needs {format_bytes(missing)} more"
+            )
+
+        def short(reason):
+            self.progress_update.emit(f"Low disk space: {os.path.basename(output_path)} {reason}, starting anyway")
+
+        return scratch.admit(job_id, needs, should_stop=lambda: not self.is_running, on_wait=waiting, on_short=short)
+
+    def _release_job(self, job_id):
+        """Frees the job's disk admission and deletes its intermediates."""
+        if self._scratch:
+            self._scratch.release(job_id)
+
+    def _video_preset(self, gpu_encoder):
+        """The preset/quality value from the encoder args (history key part)."""
+        args = self._video_encoder_args(gpu_encoder)
+        for flag in ('-preset', '-quality'):
+            if flag in args:
+                return args[args.index(flag) + 1]
+        return None
+
+    def _speed_profile(self, gpu_encoder, video_path, mode):
+        """Returns (history_key, predicted_speed) for an encode."""
+        from src.history import SpeedHistory
+        from src.planner import estimate_speed, speed_profile
+        from src.utils import probe_media
+
+        video_info = None
+        if video_path:
+            probed = probe_media(video_path)
+            video_info = (probed.get('video') if probed else None) or {}
+
+        preset = self._video_preset(gpu_encoder) if video_path else None
+        if video_path and self._video_copied():
+            mode = 'copy'
+        history = self._get_speed_history()
+        predicted = estimate_speed(gpu_encoder, video_info, history, preset, mode)
+        key = SpeedHistory.make_key(*speed_profile(gpu_encoder, video_info, preset, mode))
+        return key, predicted
+
+    def _set_job_eta(self, remaining):
+        """Updates this worker's remaining seconds (None = job done)."""
+        from src.utils import format_duration
+
+        with self._eta_lock:
+            ident = threading.get_ident()
+            if remaining is None:
+                self._eta_jobs.pop(ident, None)
+                return
+            self._eta_jobs[ident] = remaining
+            job_id = getattr(self._job, 'id', None)
+            if job_id is not None:
+                self.progress.update(job_id, eta=format_duration(remaining))
+
+            # Throttle to one update per second
+            now = time.monotonic()
+            if now - self._eta_last_emit < 1.0:
+                return
+            self._eta_last_emit = now
+
+            text = f"ETA {format_duration(remaining)}"
+            total = (self._eta_pending + sum(self._eta_jobs.values())) / self._eta_workers
+            if self._eta_batch or self._eta_pending:
+                text += f" | Total {format_duration(total)}"
+        self.eta_update.emit(text)
+
+    def _video_encoder_args(self, gpu_encoder):
+        """
+        FFmpeg video codec arguments for the chosen encoder: the preset and
+        CRF picked for the current job in deadline mode, else the defaults.
+        """
+        from src.presets import encoder_args
+        if self._video_copied():
+            return ['-c:v', 'copy']
+        return encoder_args(gpu_encoder, *(getattr(self._job, 'preset', None) or ()))
+
+    def _video_copied(self):
+        """True while the current job loops an already encoded shared background."""
+        return getattr(self._job, 'video_copy', False)
+
+    def _video_strategy(self, gpu_encoder):
+        """Dry-run report line for the background video."""
+        if self._video_copied():
+            return "video: loop of the shared background (encoded once, see its job), stream copy"
+        return f"video: loop + re-encode ({' '.join(self._video_encoder_args(gpu_encoder)[1:])})"
+
+    # === DEADLINE MODE ===
+    def _select_preset(self, gpu_encoder, video_path, label, media_remaining, jobs_remaining, workers, mode):
+        """
+        With a target realtime factor or a finish-by deadline set, picks the
+        slowest preset/CRF for the current job that still keeps up, from a
+        calibration encode of its background clip and the speed history.
+        Called before every job, so the choice follows the actual progress.
+        """
+        from src.planner import JOB_OVERHEAD_SECONDS, estimate_speed, speed_profile
+        from src.presets import LADDERS, choose, family, required_speed
+        from src.utils import format_duration, probe_media
+
+        self._job.preset = None
+        target = self.settings.get('target_speed')
+        deadline = self.settings.get('deadline')
+        if not video_path or not (target or deadline) or self.preview:
+            return
+
+        if target:
+            needed = float(target)
+            reason = f"target {needed:g}x"
+        else:
+            left = deadline - time.time()
+            needed = required_speed(media_remaining, left, workers, jobs_remaining, JOB_OVERHEAD_SECONDS)
+            if needed is None:
+                needed = float('inf')
+                reason = "deadline passed"
+            else:
+                reason = f"{format_duration(media_remaining)} of media in {format_duration(left)}"
+
+        probed = probe_media(video_path)
+        video_info = (probed.get('video') if probed else None) or {}
+        history = self._get_speed_history()
+        default = LADDERS[family(gpu_encoder)]['default']
+        reference = self._calibrate(gpu_encoder, video_path) or \
+            estimate_speed(gpu_encoder, video_info, history, default, mode)
+
+        def measured(preset):
+            return history.lookup(*speed_profile(gpu_encoder, video_info, preset, mode)) if history else None
+
+        preset, quality, speed = choose(gpu_encoder, needed, reference, measured)
+        self._job.preset = (preset, quality)
+        quality_text = f", quality {quality}" if quality is not None else ""
+        needed_text = f"{needed:.2f}x" if needed != float('inf') else "max speed"
+        self.progress_update.emit(
+            f"{label}: preset {preset}{quality_text} (needs {needed_text} for {reason}, expected {speed:.2f}x)"
+        )
+
+    def _calibrate(self, gpu_encoder, video_path):
+        """
+        Speed (x realtime) of the default preset on this background clip,
+        from a short encode to the null muxer. Cached per clip and encoder;
+        None in dry runs or if the encode failed.
+        """
+        from src.presets import CALIBRATION_SECONDS, encoder_args
+        from src.utils import get_media_analysis, store_media_analysis
+
+        name = f"calibration|{gpu_encoder}"
+        cached = get_media_analysis(video_path, name)
+        if cached or self.dry_run:
+            return cached
+
+        cmd = ['ffmpeg', '-y', '-stream_loop', '-1', '-t', str(CALIBRATION_SECONDS), '-i', video_path,
+               '-map', '0:v:0', '-an'] + encoder_args(gpu_encoder) + ['-f', 'null', '-']
+        self.progress_update.emit(f"Calibrating {gpu_encoder} on {os.path.basename(video_path)}...")
+        started = time.monotonic()
+        # progress_scale=0: the calibration does not move the job's progress
+        if not self._run_ffmpeg(cmd, total_duration=CALIBRATION_SECONDS, progress_scale=0):
+            return None
+        speed = CALIBRATION_SECONDS / max(time.monotonic() - started, 0.01)
+        store_media_analysis(video_path, name, speed)
+        return speed
+
+    def _project_media(self, project, separate_files, repeat_count):
+        """Seconds of output a batch folder renders."""
+        return project['audio_duration'] * (1 if separate_files else repeat_count)
+
+    def _loudness_target(self):
+        """EBU R128 target when normalization is on, else None."""
+        if not self.settings.get('normalize_loudness', False):
+            return None
+        from src.loudness import DEFAULT_TARGET
+        return dict(DEFAULT_TARGET, **self.settings.get('loudness_target', {}))
+
+    def _loudness_filters(self, audio_paths):
+        """
+        Measures (or loads cached measurements of) every unique input and
+        returns ({path: loudnorm filter}, unmeasured_paths). Dry runs never
+        measure; their inputs without a cached measurement are listed instead.
+        """
+        from src.loudness import measure_all, loudnorm_filter
+
+        target = self._loudness_target()
+        if target is None:
+            return {}, []
+
+        if not self.dry_run:
+            self.progress_update.emit(f"Measuring loudness of {len(set(audio_paths))} file(s)...")
+        measured = measure_all(audio_paths, target, cached_only=self.dry_run,
+                               should_stop=lambda: not self.is_running)
+        filters = {p: loudnorm_filter(measured.get(p), target) for p in audio_paths}
+        unmeasured = [p for p in dict.fromkeys(audio_paths) if measured.get(p) is None]
+        return filters, unmeasured
+
+    def _loudness_strategy(self, audio_paths, unmeasured):
+        """Dry-run report line for loudness normalization."""
+        pending = len([p for p in dict.fromkeys(audio_paths) if p in unmeasured])
+        if pending:
+            return f"audio: two-pass loudnorm, {pending} file(s) need a measurement pass first"
+        return "audio: two-pass loudnorm (all measurements cached)"
 
     def _run_batch_mode(self, batch_root, output_root, gpu_encoder, separate_files, repeat_count):
-        # Scan Input Folders
-        subfolders = [f.path for f in os.scandir(batch_root) if f.is_dir()]
+        from src.planner import inspect_project, plan_batch, share_backgrounds
+        from src.utils import flush_probe_cache, format_duration
+
+        # Scan Input Folders (or just the ones given, e.g. by watch mode)
+        subfolders = self.settings.get('batch_folders') or [f.path for f in os.scandir(batch_root) if f.is_dir()]
         total_folders = len(subfolders)
         
         if total_folders == 0:
             self.finished.emit(False, "No subfolders found in the selected batch root.")
             return
 
-        video_exts = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
-        audio_exts = ('.mp3', '.wav', '.aac', '.m4a', '.flac', '.ogg')
-
-        success_count = 0
-        
+        # Discovery & Probing (cached)
+        projects = []
         for i, folder in enumerate(subfolders):
-            folder_name = os.path.basename(folder)
-            self.progress_update.emit(f"Processing Folder {i+1}/{total_folders}: {folder_name}")
-            self.progress_batch.emit(int(((i) / total_folders) * 100)) # Start of this folder
-            
-            # Discovery
-            video_path = None
-            audio_paths = []
-            
-            for root, dirs, files in os.walk(folder):
-                for f in files:
-                    f_lower = f.lower()
-                    path = os.path.join(root, f)
-                    if not video_path and f_lower.endswith(video_exts):
-                        video_path = path
-                    elif f_lower.endswith(audio_exts):
-                        audio_paths.append(path)
-            
-            if not audio_paths:
-                self.progress_update.emit(f"Skipping {folder_name}: No audio found.")
+            self.progress_update.emit(f"Scanning Folder {i+1}/{total_folders}: {os.path.basename(folder)}")
+            project = inspect_project(folder)
+
+            if not project['audio_paths']:
+                self.progress_update.emit(f"Skipping {project['name']}: No audio found.")
                 continue
-            
-            # Sort Audio
-            audio_paths.sort(key=lambda p: os.path.basename(p).lower())
-            
-            # Process
-            if separate_files:
-                if not video_path:
-                     # This should have been caught by UI validation if Separate Files is ON.
-                     # But as a fallback/safety, we skip or error.
-                     self.progress_update.emit(f"Skipping {folder_name}: No video for separate file mode.")
-                     continue
-
-                # Create subfolder in output for this project
-                project_out_dir = os.path.join(output_root, folder_name)
-                os.makedirs(project_out_dir, exist_ok=True)
-                
-                # Render Separate Tracks
-                self._render_separate(project_out_dir, video_path, audio_paths, gpu_encoder, batch_prefix=f"[{i+1}/{total_folders}] ")
+
+            if separate_files and not project['video_path']:
+                # This should have been caught by UI validation if Separate Files is ON.
+                # But as a fallback/safety, we skip or error.
+                self.progress_update.emit(f"Skipping {project['name']}: No video for separate file mode.")
+                continue
+
+            projects.append(project)
+        # Backgrounds several encodes use are encoded once per batch
+        if self.settings.get('shared_backgrounds', True) and not self.preview:
+            shared = share_backgrounds(projects, separate_files)
+            if shared:
+                users = sum(1 for p in projects if p.get('background_key'))
+                self.progress_update.emit(f"{users} folders share {shared} background video(s): each is encoded once")
+        flush_probe_cache()
+
+        # Longest-job-first ordering: with parallel workers, starting the
+        # most expensive folders first keeps one giant folder from running
+        # alone at the end of the batch.
+        workers = max(int(self.settings.get('batch_workers', 1)), 1)
+        projects, makespan = plan_batch(
+            projects, gpu_encoder, repeat_count, separate_files, workers=workers,
+            speed_history=self._get_speed_history(), preset=self._video_preset(gpu_encoder)
+        )
+        self.progress_update.emit(
+            f"Planned {len(projects)} folders on {workers} worker(s). Estimated time: {format_duration(makespan)}"
+        )
+
+        if self.dry_run:
+            self._dry_run_makespan = makespan
+            unfinished = sum(self._project_media(p, separate_files, repeat_count) for p in projects)
+            for i, project in enumerate(projects):
+                first_job = len(self.dry_run_jobs)
+                if not project.get('background_key'):
+                    self._select_preset(gpu_encoder, project['video_path'], project['name'], unfinished,
+                                        len(projects) - i, workers, 'separate' if separate_files else 'combined')
+                unfinished -= self._project_media(project, separate_files, repeat_count)
+                self._render_project(self._shared_background(project, gpu_encoder), i, total_folders,
+                                     output_root, gpu_encoder, separate_files, repeat_count)
+                self._job.video_copy = False
+                for job in self.dry_run_jobs[first_job:]:
+                    job['project'] = project['name']
+                # Attribute the folder estimate to its first job only
+                if len(self.dry_run_jobs) > first_job:
+                    self.dry_run_jobs[first_job]['est_seconds'] = project['est_seconds']
+            self._finish_dry_run(output_root)
+            return
+
+        success_count = 0
+        lock = threading.Lock()
+
+        self._eta_batch = True
+        self._eta_workers = workers
+        self._eta_pending = sum(p['est_seconds'] for p in projects)
+        # Batch progress is weighted by each folder's estimated cost
+        for project in projects:
+            self.progress.add_job(project['name'], project['name'], project['est_seconds'])
+        from src.metrics import registry
+        queued = len(projects)
+        registry.set('loopvideo_queue_depth', queued)
+        started_at = {}
+
+        rendered = []   # (project, verification futures) of folders ffmpeg finished
+        # Deadline mode: media seconds of the folders not finished yet
+        unfinished = {p['name']: self._project_media(p, separate_files, repeat_count) for p in projects}
+        # Inputs on network shares are read ahead into local scratch
+        stager = self._input_stager(projects)
+
+        def process(i, project):
+            nonlocal queued
+            # Cancelled jobs return at once, freeing the worker
+            if not self._wait_if_paused():
+                return
+            with lock:
+                queued -= 1
+                registry.set('loopvideo_queue_depth', queued)
+            started_at[project['name']] = self._job_started(project['name'])
+            with self._eta_lock:
+                self._eta_pending = max(self._eta_pending - project['est_seconds'], 0.0)
+            # Checks of this folder's outputs are collected, not awaited
+            self._checks.futures = []
+            self._job.id = project['name']
+            self.progress.start_job(project['name'])
+            try:
+                staged = project
+                if stager:
+                    staged = stager.acquire(project, on_wait=lambda: self.progress_update.emit(
+                        f"Waiting for {project['name']}'s inputs to be copied locally"))
+                refused = self._admit_job(project['name'], self._project_output(project, output_root, separate_files),
+                                          staged['video_path'], staged['audio_paths'],
+                                          1 if separate_files else repeat_count)
+                if refused:
+                    self.progress_update.emit(f"Skipping {project['name']}: not enough disk space ({refused})")
+                    ok = False
+                else:
+                    with lock:
+                        media, jobs = sum(unfinished.values()), len(unfinished)
+                    if not project.get('background_key'):
+                        self._select_preset(gpu_encoder, staged['video_path'], project['name'], media, jobs,
+                                            min(self._eta_workers, jobs), 'separate' if separate_files else 'combined')
+                    staged = self._shared_background(staged, gpu_encoder)
+                    ok = self._render_project(staged, i, total_folders, output_root, gpu_encoder, separate_files, repeat_count)
+            except Exception as e:
+                # Keep the rest of the batch going
+                logging.exception(f"Batch folder {project['name']} failed")
+                self.progress_update.emit(f"Failed to render {project['name']}: {e}")
+                ok = False
+            finally:
+                self._release_job(project['name'])
+                if stager:
+                    stager.release(project)
+                with lock:
+                    unfinished.pop(project['name'], None)
+            futures, self._checks.futures = self._checks.futures, None
+            self._job.id = None
+            self._job.preset = None
+            self._job.video_copy = False
+            self.progress.finish_job(project['name'], ok)
+            with lock:
+                if ok:
+                    rendered.append((project, futures))
+
+        adaptive = self._adaptive_concurrency(workers)
+        try:
+            if adaptive:
+                # Folders are handed out in planned order as the load-controlled
+                # slots free up; the pool itself is sized for the upper bound
+                slots = adaptive.slots
+
+                def run_slot(i, project):
+                    try:
+                        process(i, project)
+                    finally:
+                        slots.release()
+
+                adaptive.start()
+                try:
+                    with ThreadPoolExecutor(max_workers=adaptive.controller.maximum) as pool:
+                        for i, project in enumerate(projects):
+                            if not slots.acquire(lambda: not self.is_running):
+                                break
+                            pool.submit(run_slot, i, project)
+                finally:
+                    adaptive.stop()
+            elif workers == 1:
+                for i, project in enumerate(projects):
+                    process(i, project)
             else:
-                # Combined Mode -> One file named FolderName.mp4 OR FolderName.mp3
-                ext = ".mp4" if video_path else ".mp3"
-                output_file = os.path.join(output_root, f"{folder_name}{ext}")
-                
-                # For combined mode, this single file represents 100% of the CURRENT task
-                # Passed repeat_count
-                self._render_single(output_file, video_path, audio_paths, gpu_encoder, batch_mode=True, progress_scale=100, repeat_count=repeat_count)
-            
-            success_count += 1
-            
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    for i, project in enumerate(projects):
+                        pool.submit(process, i, project)
+        finally:
+            if stager:
+                stager.close()
+                if stager.copied:
+                    from src.planner import format_bytes
+                    self.progress_update.emit(
+                        f"Staged {stager.copied} input file(s) ({format_bytes(stager.copied_bytes)}) locally, "
+                        f"{stager.reused} reused"
+                    )
+
+        # A folder only counts (and is skipped by watch mode next time) once
+        # all of its outputs passed verification
+        report = []
+        rendered_names = set()
+        for project, futures in rendered:
+            rendered_names.add(project['name'])
+            verified = all(f.result()['ok'] for f in futures)
+            self._job_finished(project['name'], verified, started_at[project['name']])
+            if verified:
+                success_count += 1
+                if not self.preview:
+                    self.succeeded_folders.add(project['folder'])
+                report.append(f"OK      {project['name']}")
+            else:
+                report.append(f"INVALID {project['name']}")
+        for project in projects:
+            if project['name'] not in rendered_names:
+                report.append(f"FAILED  {project['name']}")
+                if project['name'] in started_at:
+                    self._job_finished(project['name'], False, started_at[project['name']])
+        registry.set('loopvideo_queue_depth', 0)
+        self._write_batch_report(output_root, sorted(report, key=lambda line: line[8:]))
+
+        if self.cancelled:
+            self.finished.emit(False, f"Batch cancelled. Processed {success_count}/{total_folders} folders.")
+            return
+
+        failed_checks = sum(1 for r in self.verification_results if not r['ok'])
+        message = f"Batch Processing Complete! Processed {success_count}/{total_folders} folders."
+        if failed_checks:
+            message += f" {failed_checks} output(s) failed verification (see render_report.txt)."
         self.progress_batch.emit(100)
-        self.finished.emit(True, f"Batch Processing Complete! Processed {success_count}/{total_folders} folders.")
+        self.finished.emit(True, message)
 
-    def _run_ffmpeg(self, cmd, total_duration=None, progress_offset=0, progress_scale=100):
-        # Startup info to hide console window
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            startupinfo=startupinfo
+    def _shared_background(self, project, gpu_encoder):
+        """
+        For a project whose background other encodes of the batch share
+        (src.planner.share_backgrounds): the project with its video swapped
+        for one pass of the clip, encoded once per batch, which the job's
+        renders then loop by stream copy. The project as it was if the clip
+        is not shared or its encode failed.
+        """
+        key = project.get('background_key')
+        if not key or not project['video_path']:
+            return project
+        with self._loops_lock:
+            entry = self._loops.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._loops[key] = {'ready': threading.Event(), 'path': None}
+        if owner:
+            try:
+                entry['path'] = self._encode_loop(key, project, gpu_encoder)
+            finally:
+                entry['ready'].set()
+        # Folders sharing the clip wait for its one encode
+        entry['ready'].wait()
+        if not entry['path']:
+            return project
+        self._job.video_copy = True
+        if self.dry_run:
+            # The loop is not there to probe: plan with the source clip
+            return project
+        return dict(project, video_path=entry['path'])
+
+    def _encode_loop(self, key, project, gpu_encoder):
+        """Encodes one pass of a shared background into scratch. Returns its path, or None."""
+        import hashlib
+        from src.utils import get_media_duration
+
+        loop_dir = os.path.join(self._get_scratch().run_dir, "loops")
+        output = os.path.join(loop_dir, f"{hashlib.sha1(key.encode()).hexdigest()[:16]}.mp4")
+        cmd = ['ffmpeg', '-y', '-i', project['video_path'], '-map', '0:v:0', '-an']
+        cmd.extend(self._video_encoder_args(gpu_encoder))
+        if self.settings.get('progressive_output'):
+            from src.progressive import keyframe_args
+            # Stream copies can only be cut at keyframes: put them on the segment grid
+            cmd.extend(keyframe_args())
+        cmd.append(output)
+        duration = get_media_duration(project['video_path'])
+        users = project['background_users']
+
+        if self.dry_run:
+            self._record_dry_run(output, [cmd], [f"video: shared background, encoded once for {users} encodes"],
+                                 duration, project['video_path'])
+            return output
+        os.makedirs(loop_dir, exist_ok=True)
+        self.progress_update.emit(
+            f"Encoding shared background {os.path.basename(project['video_path'])} once for {users} encodes"
         )
+        if self._run_ffmpeg(cmd, total_duration=duration, progress_scale=0):
+            return output
+        self._remove_partial(output)
+        if self.is_running:
+            self.progress_update.emit(f"Encoding the shared background failed; {project['name']} encodes its own")
+        return None
+
+    def _input_stager(self, projects):
+        """
+        With stage_inputs set ('auto': files on network shares, 'always'),
+        the stager (src.staging) copying the inputs of the next folders
+        into this run's scratch dir while the current ones encode. None if
+        off, and for previews (they only read a few seconds per track).
+        """
+        from src.staging import InputStager, DEFAULT_DEPTH
+
+        mode = self.settings.get('stage_inputs', 'off')
+        if mode == 'off' or self.preview:
+            return None
+        scratch = self._get_scratch()
+        stager = InputStager(os.path.join(scratch.run_dir, "staging"), mode,
+                             depth=self.settings.get('stage_depth', DEFAULT_DEPTH),
+                             reserve_bytes=scratch.reserve_bytes)
+        stager.plan(projects)
+        return stager
+
+    def _adaptive_concurrency(self, workers):
+        """
+        With adaptive_workers set, the loop (src.concurrency) that grows or
+        shrinks the number of folders rendered at once with the machine's
+        load, starting at `workers` and capped at max_workers. None if off,
+        or without Linux /proc to sample.
+        """
+        from src.concurrency import AdaptiveConcurrency, ConcurrencyController, JobSlots, LoadSampler
+        from src.metrics import registry, log_event
+
+        if not self.settings.get('adaptive_workers', False):
+            return None
+        sampler = LoadSampler()
+        if not sampler.available():
+            self.progress_update.emit(f"Adaptive workers need /proc to sample the load; using {workers} worker(s)")
+            return None
+        controller = ConcurrencyController(workers, maximum=self.settings.get('max_workers'))
+        slots = JobSlots(controller.limit)
+        self._eta_workers = controller.limit
+        registry.set('loopvideo_concurrency_limit', controller.limit)
+
+        def pids():
+            # Simulated processes have made-up pids
+            if self.backend.name != 'ffmpeg':
+                return []
+            with self._procs_lock:
+                return [p.pid for p in self._procs]
+
+        def on_change(limit, reason):
+            self._eta_workers = limit
+            registry.set('loopvideo_concurrency_limit', limit)
+            log_event('concurrency_changed', limit=limit, reason=reason)
+            self.progress_update.emit(f"Parallel renders: {limit} ({reason})")
+
+        return AdaptiveConcurrency(slots, controller, sampler, pids, on_change)
+
+    def _run_worker_mode(self, batch_root, output_root, gpu_encoder, separate_files, repeat_count):
+        """
+        Distributed batch: claims folders from the shared work queue in
+        output_root until none are left. Results are rendered into a private
+        staging dir and only moved into place while this worker still holds
+        the folder's lease, so every folder is published exactly once.
+        """
+        from src.planner import inspect_project, plan_batch
+        from src.utils import flush_probe_cache
+        from src.workqueue import WorkQueue, DEFAULT_LEASE_SECONDS, default_worker_id
+
+        worker_id = self.settings.get('worker_id') or default_worker_id()
+        lease = self.settings.get('lease_seconds', DEFAULT_LEASE_SECONDS)
+        os.makedirs(output_root, exist_ok=True)
+        queue = WorkQueue(output_root, lease_seconds=lease)
+
+        # Every worker plans the same folders; populate() ignores known ones
+        projects = {}
+        for entry in os.scandir(batch_root):
+            if entry.is_dir():
+                project = inspect_project(entry.path)
+                if project['audio_paths'] and (project['video_path'] or not separate_files):
+                    projects[project['name']] = project
+        flush_probe_cache()
+        plan_batch(list(projects.values()), gpu_encoder, repeat_count, separate_files,
+                   speed_history=self._get_speed_history(), preset=self._video_preset(gpu_encoder))
+        queue.populate(projects.values())
+        self.progress_update.emit(f"Worker {worker_id}: {len(projects)} folders in the shared queue.")
+
+        # Heartbeat: renew the lease and publish progress while rendering
+        state = {'name': None, 'progress': 0, 'lost': False}
+        stop_heartbeat = threading.Event()
+        self.progress_value.connect(lambda v: state.update(progress=v))
+
+        def heartbeat():
+            while not stop_heartbeat.wait(max(lease / 3, 1)):
+                name = state['name']
+                if name and not queue.renew(name, worker_id, progress=state['progress']):
+                    state['lost'] = True
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+
+        done = failed = 0
+        try:
+            while self._wait_if_paused():
+                name = queue.claim(worker_id)
+                if name is None:
+                    if not queue.has_unfinished():
+                        break
+                    # Others hold the remaining leases; wait in case one expires
+                    time.sleep(min(lease / 4, 15))
+                    continue
+
+                project = projects.get(name)
+                if project is None:
+                    # Listed by another node but not visible (or empty) here
+                    queue.complete(name, worker_id, False, message=f"Not renderable on {worker_id}")
+                    continue
+
+                state.update(name=name, progress=0, lost=False)
+                self._job.id = name
+                self.progress.start_job(name, name, project['est_seconds'])
+                started = self._job_started(name)
+                staging = os.path.join(output_root, ".parts", f"{name}.{worker_id}")
+                shutil.rmtree(staging, ignore_errors=True)
+                os.makedirs(staging)
+
+                try:
+                    refused = self._admit_job(name, self._project_output(project, staging, separate_files),
+                                              project['video_path'], project['audio_paths'],
+                                              1 if separate_files else repeat_count)
+                    if refused:
+                        self.progress_update.emit(f"{name}: not enough disk space ({refused})")
+                        ok = False
+                    else:
+                        if self.settings.get('target_speed') or self.settings.get('deadline'):
+                            media, jobs, nodes = self._queue_remaining(queue, projects, separate_files, repeat_count)
+                            self._select_preset(gpu_encoder, project['video_path'], name, media, jobs, nodes,
+                                                'separate' if separate_files else 'combined')
+                        # Outputs are verified before they may be published
+                        ok = self._render_project(project, done + failed, len(projects), staging,
+                                                  gpu_encoder, separate_files, repeat_count)
+                except Exception:
+                    logging.exception(f"Worker {worker_id} failed on {name}")
+                    ok = False
+                finally:
+                    self._release_job(name)
+                    self._job.preset = None
+
+                def publish():
+                    for entry in os.scandir(staging):
+                        target = os.path.join(output_root, entry.name)
+                        if os.path.isdir(target) and entry.is_dir():
+                            shutil.rmtree(target)
+                        os.replace(entry.path, target)
+
+                if self.cancelled:
+                    ok = False
+                owned = not state['lost'] and queue.complete(
+                    name, worker_id, ok, message="ok" if ok else "render failed", publish=publish
+                )
+                state['name'] = None
+                self.progress.finish_job(name, ok and owned)
+                self._job_finished(name, ok and owned, started)
+                shutil.rmtree(staging, ignore_errors=True)
+
+                if not owned:
+                    self.progress_update.emit(f"Lease on {name} was lost; result discarded.")
+                elif ok:
+                    done += 1
+                else:
+                    failed += 1
+                    self.progress_update.emit(f"{name} failed on this node; it will be retried.")
+        finally:
+            stop_heartbeat.set()
+            try:
+                os.rmdir(os.path.join(output_root, ".parts"))
+            except OSError:
+                pass  # Other workers are still staging
+
+        if self.cancelled:
+            self.finished.emit(False, f"Worker {worker_id} cancelled after {done} folder(s).")
+        else:
+            self.finished.emit(True, f"Worker {worker_id} finished: {done} rendered, {failed} failed.")
+
+    def _queue_remaining(self, queue, projects, separate_files, repeat_count):
+        """(media seconds, folders, active nodes) still open in the shared queue."""
+        from src.workqueue import MAX_ATTEMPTS
+
+        counts, folders, workers = queue.status()
+        open_names = [f['name'] for f in folders
+                      if f['state'] != 'done' and f['attempts'] < MAX_ATTEMPTS and f['name'] in projects]
+        media = sum(self._project_media(projects[n], separate_files, repeat_count) for n in open_names)
+        # Nodes seen recently; every one works on the same deadline
+        recent = [w for w in workers if time.time() - (w['last_seen'] or 0) < queue.lease_seconds]
+        return media, len(open_names), max(len(recent), 1)
+
+    def _render_project(self, project, i, total_folders, output_root, gpu_encoder, separate_files, repeat_count):
+        """Renders one discovered batch folder. Returns True on success."""
+        folder_name = project['name']
+        video_path = project['video_path']
+        audio_paths = project['audio_paths']
+        self.progress_update.emit(f"Processing Folder {i+1}/{total_folders}: {folder_name}")
+
+        if self.preview:
+            output = self._project_output(project, output_root, separate_files)
+            return bool(self._render_preview(output, video_path, audio_paths, separate_files, repeat_count))
+
+        # Process
+        if separate_files:
+            # Create subfolder in output for this project
+            project_out_dir = self._project_output(project, output_root, separate_files)
+            if not self.dry_run:
+                os.makedirs(project_out_dir, exist_ok=True)
+            
+            # Render Separate Tracks
+            return self._render_separate(project_out_dir, video_path, audio_paths, gpu_encoder, batch_prefix=f"[{i+1}/{total_folders}] ")
+        else:
+            # Combined Mode -> One file named FolderName.mp4 OR FolderName.mp3
+            output_file = self._project_output(project, output_root, separate_files)
+            
+            # For combined mode, this single file represents 100% of the CURRENT task
+            # Passed repeat_count
+            return self._render_single(output_file, video_path, audio_paths, gpu_encoder, batch_mode=True, progress_scale=100, repeat_count=repeat_count)
+
+    def _project_output(self, project, output_root, separate_files):
+        """A batch folder's output: a subfolder (separate files) or FolderName.mp4/.mp3."""
+        if separate_files:
+            return os.path.join(output_root, project['name'])
+        ext = ".mp4" if project['video_path'] else ".mp3"
+        return os.path.join(output_root, f"{project['name']}{ext}")
+
+    def _run_ffmpeg(self, cmd, total_duration=None, progress_offset=0, progress_scale=100, speed_key=None, predicted_speed=None):
+        if not self._wait_if_paused():
+            return False
+
+        started = time.monotonic()
+        paused_before = self._paused_total
+        # The backend keeps stdin open so cancel() can ask ffmpeg to quit
+        # with 'q'; the simulator uses the duration and speed hints to pace
+        # its fake progress
+        process = self.backend.start(cmd, duration=total_duration, speed_key=speed_key, speed=predicted_speed)
+        with self._procs_lock:
+            self._procs.add(process)
+            if not self.is_running:
+                # cancel() ran between the check above and registration
+                threading.Thread(target=self.backend.stop, args=(process,), daemon=True).start()
+            elif self.is_paused:
+                self.backend.suspend(process)
         
+        tail = deque(maxlen=FFMPEG_TAIL_LINES)
         while True:
             line = process.stdout.readline()
             if not line and process.poll() is not None:
                 break
+            if line and "time=" not in line:
+                tail.append(line)
             if line:
                 # Parse time=00:00:00.00
                 if total_duration and "time=" in line:
@@ -147,13 +1187,83 @@ class RenderThread(QThread):
                         # Scale to global progress
                         # global = offset + (relative * scale / 100)
                         final_percent = progress_offset + (relative_percent * progress_scale / 100)
-                        self.progress_value.emit(int(final_percent))
+                        self._report_progress(final_percent)
+
+                        self._update_eta(line, current_seconds, total_duration, started, predicted_speed)
                     except:
                         pass
         
-        return process.returncode == 0
+        process.wait()
+        with self._procs_lock:
+            self._procs.discard(process)
+        self._set_job_eta(None)
+        self._job.ffmpeg_tail = list(tail)
+        success = process.returncode == 0 and not self.cancelled
+
+        # Remember how fast this kind of encode really was (minus pauses)
+        if success and total_duration:
+            from src.metrics import registry, log_event
+
+            wall = time.monotonic() - started - (self._paused_total - paused_before)
+            history = self._get_speed_history() if speed_key else None
+            if history:
+                history.record(speed_key, total_duration, wall)
+            registry.inc('loopvideo_encode_seconds_total', wall)
+            registry.inc('loopvideo_media_seconds_total', total_duration)
+            if wall > 0:
+                registry.set('loopvideo_realtime_factor', total_duration / wall)
+            log_event('encode_finished', output=cmd[-1], media_seconds=round(total_duration, 2),
+                      wall_seconds=round(wall, 2), profile=speed_key)
+
+        return success
+
+    def _run_mp4(self, cmd, **kwargs):
+        """
+        _run_ffmpeg() for a command writing an MP4 with a -moov_size
+        reservation (see _faststart_args). If the estimate was too small,
+        ffmpeg only fails when writing the trailer; the render is then
+        redone with the +faststart rewrite instead.
+        """
+        success = self._run_ffmpeg(cmd, **kwargs)
+        if success or self.cancelled or '-moov_size' not in cmd:
+            return success
+        if not any(MOOV_TOO_SMALL in line for line in getattr(self._job, 'ffmpeg_tail', ())):
+            return False
+        i = cmd.index('-moov_size')
+        output_path = cmd[i + 2]
+        logging.warning(f"moov reservation of {cmd[i + 1]} bytes too small for {output_path}, retrying with +faststart")
+        self.progress_update.emit(f"Rendering {os.path.basename(output_path)} again with faststart (index did not fit)")
+        return self._run_ffmpeg(cmd[:i] + ['-movflags', '+faststart'] + cmd[i + 2:], **kwargs)
+
+    def _update_eta(self, line, current_seconds, total_duration, started, predicted_speed):
+        """
+        Refines the job ETA from ffmpeg's reported speed. Early on the
+        prediction from history dominates; after ~20s the live speed does.
+        """
+        live_speed = None
+        idx = line.find("speed=")
+        if idx != -1:
+            try:
+                live_speed = float(line[idx+6:].strip().split('x')[0])
+            except ValueError:
+                live_speed = None
+
+        if live_speed and live_speed > 0:
+            if predicted_speed:
+                weight = min((time.monotonic() - started) / 20.0, 1.0)
+                speed = (1 - weight) * predicted_speed + weight * live_speed
+            else:
+                speed = live_speed
+        elif predicted_speed:
+            speed = predicted_speed
+        else:
+            return
+
+        remaining = max(total_duration - current_seconds, 0) / speed
+        self._set_job_eta(remaining)
 
     def _render_separate(self, output_dir, video_path, audio_paths, gpu_encoder, batch_prefix=""):
+        from src.chapters import track_title
         from src.utils import get_media_duration
         
         if not video_path:
@@ -166,6 +1276,17 @@ class RenderThread(QThread):
         total_tracks = len(audio_paths)
         # We divide the 100% progress bar into chunks for each track
         chunk_size = 100 / total_tracks
+        all_ok = True
+        checks = []
+
+        loudness, unmeasured = self._loudness_filters(audio_paths)
+        if not self.is_running:
+            return False
+
+        speed_key, predicted_speed = self._speed_profile(gpu_encoder, video_path, 'separate')
+        if not self._eta_batch and predicted_speed:
+            # Single-mode total ETA also covers the tracks still to come
+            remaining_media = sum(get_media_duration(p) or 0 for p in audio_paths)
         
         for i, audio_path in enumerate(audio_paths):
             track_name = os.path.splitext(os.path.basename(audio_path))[0]
@@ -185,27 +1306,63 @@ class RenderThread(QThread):
                 cmd.extend(['-i', audio_path])
                 cmd.extend(['-map', '0:v', '-map', '1:a'])
                 
-                if 'nvenc' in gpu_encoder:
-                    cmd.extend(['-c:v', gpu_encoder, '-preset', 'p4', '-tune', 'hq'])
-                elif 'amf' in gpu_encoder:
-                    cmd.extend(['-c:v', gpu_encoder, '-quality', 'balanced'])
-                else:
-                    cmd.extend(['-c:v', 'libx264', '-preset', 'medium'])
-                    
-                cmd.extend(['-c:a', 'aac', '-b:a', '192k'])
-                cmd.extend(['-shortest'])
+                cmd.extend(self._video_encoder_args(gpu_encoder))
+                cmd.extend(VIDEO_AUDIO_ARGS)
+                cmd.extend(SHORTEST_ARGS)
             else:
                 # Audio Only
                 cmd.extend(['-i', audio_path])
-                cmd.extend(['-c:a', 'libmp3lame', '-b:a', '192k'])
+                cmd.extend(MP3_AUDIO_ARGS)
+
+            if audio_path in loudness:
+                cmd.extend(['-af', loudness[audio_path]])
+            if self.settings.get('embed_chapters', True):
+                cmd.extend(['-metadata', f"title={track_title(audio_path)}"])
+            if video_path:
+                cmd.extend(self._faststart_args(video_path, duration))
             
             cmd.append(output_file)
+
+            if self.dry_run:
+                if video_path:
+                    strategy = [self._video_strategy(gpu_encoder), "audio: single input, re-encode (aac 192k)"]
+                else:
+                    strategy = ["audio: single input, re-encode (libmp3lame 192k)"]
+                if loudness:
+                    strategy.append(self._loudness_strategy([audio_path], unmeasured))
+                self._record_dry_run(output_file, [cmd], strategy, duration, video_path)
+                continue
             
+            if not self._eta_batch and predicted_speed:
+                remaining_media -= duration or 0
+                self._eta_pending = max(remaining_media, 0) / predicted_speed
+
             # Pass duration and offsets to run_ffmpeg
             current_offset = i * chunk_size
-            self._run_ffmpeg(cmd, total_duration=duration, progress_offset=current_offset, progress_scale=chunk_size)
+            if not self._run_mp4(cmd, total_duration=duration, progress_offset=current_offset, progress_scale=chunk_size,
+                                 speed_key=speed_key, predicted_speed=predicted_speed):
+                if self.cancelled:
+                    self._remove_partial(output_file)
+                    return False
+                self.progress_update.emit(f"{batch_prefix}Failed to render: {os.path.basename(output_file)}")
+                all_ok = False
+            else:
+                self._record_output(output_file)
+                checks.append(self._verify_output(output_file, duration, bool(video_path)))
+
+        return self._checks_passed(checks) and all_ok
 
     def _render_single(self, output_path, video_path, audio_paths, gpu_encoder, batch_mode=False, progress_offset=0, progress_scale=100, repeat_count=1):
+        # Audio cache entries the render reads stay pinned until it is done
+        pinned = []
+        try:
+            return self._render_combined(output_path, video_path, audio_paths, gpu_encoder, batch_mode,
+                                         progress_offset, progress_scale, repeat_count, pinned)
+        finally:
+            for path in pinned:
+                self._audio_cache.release(path)
+
+    def _render_combined(self, output_path, video_path, audio_paths, gpu_encoder, batch_mode, progress_offset, progress_scale, repeat_count, pinned):
         from src.utils import get_media_duration
         
         # Apply Repetition
@@ -215,94 +1372,671 @@ class RenderThread(QThread):
         
         # Calculate total duration for progress
         total_duration = 0
+        durations = []
         for p in final_audio_paths:
             d = get_media_duration(p)
+            durations.append(d)
             if d: total_duration += d
 
+        # Crossfades shorten the output by the overlapped seconds
+        crossfade = float(self.settings.get('crossfade_seconds', 0) or 0)
+        fades = None
+        if crossfade > 0 and len(final_audio_paths) > 1:
+            from src.crossfade import plan_fades
+            fades = plan_fades(durations, crossfade)
+            total_duration -= sum(fades)
+
+        # Loudness normalization (first pass, cached per input file)
+        loudness, unmeasured = self._loudness_filters(audio_paths)
+        if not self.is_running:
+            return self._finish_single(output_path, audio_paths, False, batch_mode, fades)
+
+        # Mixed Audio Cache
+        # The concatenated playlist audio only depends on the inputs, the
+        # repeat count and the codec settings, so it can be reused when only
+        # the background video changes.
+        audio_args = VIDEO_AUDIO_ARGS if video_path else MP3_AUDIO_ARGS
+        cache_ext = ".m4a" if video_path else ".mp3"
+        cache = self._get_audio_cache()
+        cache_key = None
+        cached_audio = None
+        if cache:
+            try:
+                key_args = list(audio_args)
+                if loudness:
+                    from src.loudness import target_name
+                    key_args.append(target_name(self._loudness_target()))
+                if fades:
+                    key_args.append(f"crossfade={crossfade}")
+                cache_key = cache.make_key(audio_paths, repeat_count, key_args)
+                cached_audio = cache.get(cache_key, cache_ext)
+                if cached_audio:
+                    pinned.append(cached_audio)
+            except OSError as e:
+                logging.warning(f"Audio cache unavailable: {e}")
+                cache_key = None
+
+        # Chapters and titles, muxed by the render itself (no rewrite afterwards).
+        # Progressive output cannot carry them; its optional remux adds them.
+        progressive = self.settings.get('progressive_output') if video_path else None
+        meta_path, chapter_count = self._chapter_metadata(output_path, final_audio_paths, durations, fades)
+        meta_input = ['-f', 'ffmetadata', '-i', meta_path] if meta_path and not progressive else []
+
+        if cached_audio and not video_path:
+            # Audio-only output is exactly the cached mix
+            if meta_path:
+                # Stream-copy remux just to add the chapters
+                cmd = ['ffmpeg', '-y', '-i', cached_audio] + meta_input
+                cmd.extend(['-map', '0:a', '-c', 'copy', '-map_metadata', '1', '-map_chapters', '1', output_path])
+            if self.dry_run:
+                commands = [cmd] if meta_path else []
+                self._record_dry_run(output_path, commands, [f"audio: copy cached mix ({cached_audio})"], total_duration, None)
+                return True
+            self.progress_update.emit(f"Using cached audio mix: {os.path.basename(output_path)}")
+            if meta_path:
+                success = self._run_ffmpeg(cmd)
+                self._remove_partial(meta_path)
+                if not success:
+                    self._remove_partial(output_path)
+                else:
+                    success = self._checks_passed([self._verify_output(output_path, total_duration, False)])
+                return self._finish_single(output_path, audio_paths, success, batch_mode, fades)
+            shutil.copyfile(cached_audio, output_path)
+            return self._finish_single(output_path, audio_paths, True, batch_mode, fades)
+
+        # Audio inputs: (input args, per-input filter or None)
+        audio_inputs = [(['-i', p], loudness.get(p)) for p in final_audio_paths]
+        overlap_cmds = []
+        scratch_dir = None
+        if fades and any(fades) and not cached_audio:
+            audio_inputs, overlap_cmds, scratch_dir = self._prepare_crossfades(
+                final_audio_paths, durations, fades, loudness, output_path
+            )
+
+        # Audio-only: encode chunks of the playlist in parallel and join
+        # their frames, instead of one serial LAME run
+        chunked = None
+        if not video_path and not cached_audio:
+            chunked = self._chunked_audio_format(final_audio_paths, loudness, total_duration)
+        # Repeated passes are cut alike (and encoded once) unless crossfades span them
+        pass_inputs = len(audio_paths) if repeat_count > 1 and len(audio_inputs) == len(final_audio_paths) else None
+
         # Construct FFmpeg command
         cmd = ['ffmpeg', '-y']
+        cache_tmp = None
         
-        if video_path:
+        if video_path and cached_audio:
+            # Input 0: Video (Looped), Input 1: Cached audio mix (stream copied)
+            cmd.extend(['-stream_loop', '-1', '-i', video_path])
+            cmd.extend(['-i', cached_audio])
+            cmd.extend(meta_input)
+            meta_index = 2
+            cmd.extend(['-map', '0:v', '-map', '1:a'])
+            cmd.extend(self._video_encoder_args(gpu_encoder))
+            cmd.extend(['-c:a', 'copy'])
+            # Copied audio packets are all there from the start: plain
+            # -shortest ends both streams together (the muxer flag would cut
+            # the audio's tail instead)
+            cmd.extend(['-shortest'])
+            self.progress_update.emit(f"Using cached audio mix: {os.path.basename(output_path)}")
+
+        elif video_path:
             # Input 0: Video (Looped)
             cmd.extend(['-stream_loop', '-1', '-i', video_path])
             
             # Inputs 1..N: Audio files (Multiplied)
-            for audio in final_audio_paths:
-                cmd.extend(['-i', audio])
+            for input_args, _ in audio_inputs:
+                cmd.extend(input_args)
+            cmd.extend(meta_input)
+            meta_index = 1 + len(audio_inputs)
             
             # Build Filter Complex
             filter_complex = []
             
             # Audio Concatenation
             # Note: Input 0 is video. Audio inputs start at 1.
-            audio_inputs = "".join([f"[{i+1}:a]" for i in range(len(final_audio_paths))])
-            filter_complex.append(f"{audio_inputs}concat=n={len(final_audio_paths)}:v=0:a=1[outa]")
+            if cache_key:
+                # Split the mix so the same decode feeds the cache entry
+                filter_complex.extend(self._audio_mix_filter([f for _, f in audio_inputs], 1, "mix"))
+                filter_complex.append("[mix]asplit=2[outa][cachea]")
+            else:
+                filter_complex.extend(self._audio_mix_filter([f for _, f in audio_inputs], 1, "outa"))
             
             # Map video and audio
             cmd.extend(['-filter_complex', ";".join(filter_complex)])
             cmd.extend(['-map', '0:v', '-map', '[outa]'])
             
             # Encoding settings
-            if 'nvenc' in gpu_encoder:
-                cmd.extend(['-c:v', gpu_encoder, '-preset', 'p4', '-tune', 'hq'])
-            elif 'amf' in gpu_encoder:
-                cmd.extend(['-c:v', gpu_encoder, '-quality', 'balanced'])
-            else:
-                cmd.extend(['-c:v', 'libx264', '-preset', 'medium'])
-                
-            cmd.extend(['-c:a', 'aac', '-b:a', '192k'])
+            cmd.extend(self._video_encoder_args(gpu_encoder))
+            cmd.extend(audio_args)
             
             # Cut video to shortest stream
-            cmd.extend(['-shortest'])
+            cmd.extend(SHORTEST_ARGS)
         
         else:
             # === AUDIO ONLY MODE ===
             # Inputs 0..N: Audio files
-            for audio in final_audio_paths:
-                cmd.extend(['-i', audio])
+            for input_args, _ in audio_inputs:
+                cmd.extend(input_args)
+            cmd.extend(meta_input)
+            meta_index = len(audio_inputs)
             
             # Audio Only Filter Complex
-            if len(final_audio_paths) > 1:
-                audio_inputs = "".join([f"[{i}:a]" for i in range(len(final_audio_paths))])
-                cmd.extend(['-filter_complex', f"{audio_inputs}concat=n={len(final_audio_paths)}:v=0:a=1[outa]"])
+            if len(audio_inputs) > 1 or loudness:
+                filter_complex = self._audio_mix_filter([f for _, f in audio_inputs], 0, "outa")
+                cmd.extend(['-filter_complex', ";".join(filter_complex)])
                 cmd.extend(['-map', '[outa]'])
             else:
                 # Single audio file, no complex filter needed really, but kept for consistency
                 pass 
                 
-            cmd.extend(['-c:a', 'libmp3lame', '-b:a', '192k'])
+            cmd.extend(audio_args)
+
+        if meta_input:
+            cmd.extend(['-map_metadata', str(meta_index), '-map_chapters', str(meta_index)])
 
         # Output
-        cmd.append(output_path)
+        segment_dir = None
+        if progressive:
+            from src.progressive import keyframe_args, output_args, segment_dir_for
+            # Segments the uploader can take while the encode is still running
+            segment_dir = segment_dir_for(output_path)
+            if not self._video_copied():
+                # (A shared loop got these when it was encoded)
+                cmd.extend(keyframe_args())
+            cmd.extend(output_args(progressive, segment_dir))
+        else:
+            if video_path:
+                cmd.extend(self._faststart_args(video_path, total_duration, chapter_count))
+            cmd.append(output_path)
+
+        if video_path and cache_key and not cached_audio:
+            # Second output: the encoded mix, written straight into the cache
+            cache_tmp = cache.temp_path(cache_key, cache_ext)
+            cmd.extend(['-map', '[cachea]'])
+            cmd.extend(audio_args)
+            cmd.extend(['-map_metadata', '-1', '-map_chapters', '-1'])
+            cmd.append(cache_tmp)
         
+        if self.dry_run:
+            strategy = []
+            if video_path:
+                strategy.append(self._video_strategy(gpu_encoder))
+            main_cmds = [cmd]
+            if cached_audio:
+                strategy.append("audio: cached mix, stream copy")
+            elif chunked:
+                main_cmds, _ = self._audio_decode_commands(audio_inputs, chunked, self._audio_chunk_dir(output_path))
+                strategy.append(f"audio: {len(main_cmds)} input(s) decoded to PCM, then ~{self._audio_chunk_seconds():g}s chunks "
+                                f"({' '.join(audio_args[1:])}) encoded on {self._audio_workers()} worker(s) "
+                                f"and joined frame by frame" + (", repeats reuse the first pass" if pass_inputs else ""))
+            elif len(final_audio_paths) > 1:
+                strategy.append(f"audio: concat filter over {len(final_audio_paths)} inputs, re-encode ({' '.join(audio_args[1:])})")
+            else:
+                strategy.append(f"audio: single input, re-encode ({' '.join(audio_args[1:])})")
+            if overlap_cmds:
+                strategy.append(f"audio: {len([f for f in fades if f])} crossfade(s) of up to {crossfade:g}s, "
+                                f"{len(overlap_cmds)} overlap region(s) pre-rendered, rest stream-joined")
+            if loudness and not cached_audio:
+                strategy.append(self._loudness_strategy(audio_paths, unmeasured))
+            if cache_key and not cached_audio:
+                strategy.append("audio: mix will be stored in the audio cache")
+            extra_cmds = []
+            if progressive:
+                strategy.append(f"output: {progressive} segments + manifest in {segment_dir}")
+                if self.settings.get('progressive_remux', False):
+                    from src.progressive import remux_command
+                    extra_cmds.append(remux_command(progressive, segment_dir, output_path, meta_path))
+                    strategy.append("output: stream-copy remux to a regular MP4 at the end")
+            self._record_dry_run(output_path, overlap_cmds + main_cmds + extra_cmds, strategy, total_duration, video_path)
+            return True
+
+        if overlap_cmds and not self._render_overlaps(overlap_cmds, scratch_dir):
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            self._remove_partial(meta_path)
+            if cache_tmp:
+                cache.discard(cache_tmp)
+            return self._finish_single(output_path, audio_paths, False, batch_mode)
+
         log_msg = f"Starting render: {os.path.basename(output_path)}"
         self.progress_update.emit(log_msg)
         
-        success = self._run_ffmpeg(cmd, total_duration=total_duration, progress_offset=progress_offset, progress_scale=progress_scale)
-        
+        mirror = self._start_progressive(progressive, segment_dir) if progressive else None
+        speed_key, predicted_speed = self._speed_profile(gpu_encoder, video_path, 'combined')
+        if chunked:
+            success = self._encode_audio_chunks(output_path, audio_inputs, pass_inputs, chunked, meta_path,
+                                                total_duration, speed_key, progress_offset, progress_scale)
+        else:
+            success = self._run_mp4(cmd, total_duration=total_duration, progress_offset=progress_offset, progress_scale=progress_scale,
+                                    speed_key=speed_key, predicted_speed=predicted_speed)
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        verify_path = output_path
+        if progressive:
+            success, verify_path = self._finish_progressive(progressive, segment_dir, output_path, meta_path,
+                                                            success, mirror)
+        self._remove_partial(meta_path)
+
+        if self.cancelled:
+            self._remove_partial(output_path)
+            if segment_dir:
+                shutil.rmtree(segment_dir, ignore_errors=True)
+
+        if success:
+            success = self._checks_passed([self._verify_output(verify_path, total_duration, bool(video_path))])
+
+        if cache_tmp and not success:
+            cache.discard(cache_tmp)
+        elif cache_key and not cached_audio and success:
+            if cache_tmp:
+                cache.put(cache_key, cache_ext, cache_tmp)
+            else:
+                # Audio-only: the output itself is the mix
+                cache.put(cache_key, cache_ext, output_path, move=False)
+
+        return self._finish_single(output_path, audio_paths, success, batch_mode, fades)
+
+    # === PREVIEW ===
+    def _run_preview(self, output_path, video_path, audio_paths, separate_files, repeat_count):
+        """Single-mode preview render, reported like a regular render."""
+        name = os.path.basename(output_path)
+        self.progress.start_job('render', name)
+        started = self._job_started(name)
+        preview_path = self._render_preview(output_path, video_path, audio_paths, separate_files, repeat_count)
+        self.progress.finish_job('render', bool(preview_path) and not self.cancelled)
+        if self.dry_run:
+            self._finish_dry_run(os.path.dirname(preview_path))
+            return
+        self._job_finished(name, bool(preview_path), started)
+        if self.cancelled:
+            self.finished.emit(False, "Preview cancelled.")
+        elif preview_path:
+            self.progress_value.emit(100)
+            self.finished.emit(True, f"Preview ready: {preview_path}")
+        else:
+            self.finished.emit(False, "Preview render failed.")
+
+    def _render_preview(self, output_path, video_path, audio_paths, separate_files=False, repeat_count=1):
+        """
+        Renders a small, low-fps, ultrafast preview next to the output: the
+        head of every track and every transition (crossfaded as in the full
+        render), with chapters. Loudness normalization, the audio cache and
+        verification are skipped. Returns the preview path, or None.
+        """
+        from src.chapters import format_ffmetadata, metadata_path_for, track_title
+        from src.crossfade import plan_fades
+        from src.preview import build_chapters, plan_clips, preview_command, preview_path_for, timeline
+        from src.utils import get_media_duration
+
+        if separate_files and not self.dry_run:
+            os.makedirs(output_path, exist_ok=True)
+        preview_path = preview_path_for(output_path, separate_files)
+        paths = list(audio_paths)
+        # A repeated playlist also wraps from its last track back to the first
+        wraps = repeat_count > 1 and not separate_files and len(paths) > 1
+        if wraps:
+            paths.append(paths[0])
+
+        durations = [get_media_duration(p) for p in paths]
+        crossfade = float(self.settings.get('crossfade_seconds', 0) or 0)
+        fades = plan_fades(durations, crossfade) if crossfade > 0 and not separate_files else None
+        clips = plan_clips(durations, fades, head_only_last=wraps)
+        length, _ = timeline(clips, fades)
+
+        meta_path = None
+        if self.settings.get('embed_chapters', True):
+            meta_path = metadata_path_for(preview_path, self._job_scratch())
+            if not self.dry_run:
+                chapters = build_chapters(clips, fades, [track_title(p) for p in paths])
+                title = os.path.splitext(os.path.basename(preview_path))[0]
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    f.write(format_ffmetadata(chapters, title=title))
+
+        cmd = preview_command(paths, clips, fades, video_path, preview_path, meta_path)
+        if self.dry_run:
+            strategy = [f"preview: {len(clips)} excerpt(s) of {len(audio_paths)} track(s)"]
+            if video_path:
+                strategy.append("video: loop, downscaled, libx264 ultrafast")
+            self._record_dry_run(preview_path, [cmd], strategy, length, None)
+            return preview_path
+
+        self.progress_update.emit(f"Rendering preview: {os.path.basename(preview_path)}")
+        # No speed key: preview encodes would skew the recorded speeds
+        success = self._run_ffmpeg(cmd, total_duration=length)
+        self._remove_partial(meta_path)
+        if not success:
+            self._remove_partial(preview_path)
+            if not self.cancelled:
+                self.progress_update.emit(f"Failed to render preview: {os.path.basename(preview_path)}")
+            return None
+        self._record_output(preview_path)
+        with self._procs_lock:
+            self.preview_paths.append(preview_path)
+        return preview_path
+
+    def _start_progressive(self, mode, segment_dir):
+        """Prepares the segment dir; returns the running upload mirror, if configured."""
+        from src.progressive import SegmentMirror
+
+        shutil.rmtree(segment_dir, ignore_errors=True)
+        os.makedirs(segment_dir)
+        upload_dir = self.settings.get('upload_dir')
+        if not upload_dir:
+            return None
+        mirror = SegmentMirror(segment_dir, mode, os.path.join(upload_dir, os.path.basename(segment_dir)))
+        mirror.start()
+        return mirror
+
+    def _finish_progressive(self, mode, segment_dir, output_path, meta_path, success, mirror):
+        """
+        Marks the segments complete and optionally remuxes them into a
+        regular MP4 (stream copy, chapters added). Returns (success, path
+        to verify): the MP4 if remuxed, else the manifest.
+        """
+        from src.progressive import manifest_path, mark_complete, remux_command
+
+        verify_path = manifest_path(segment_dir, mode)
+        try:
+            if not success:
+                return False, verify_path
+            mark_complete(segment_dir)
+            if self.settings.get('progressive_remux', False):
+                self.progress_update.emit(f"Remuxing segments: {os.path.basename(output_path)}")
+                if not self._run_ffmpeg(remux_command(mode, segment_dir, output_path, meta_path)):
+                    self._remove_partial(output_path)
+                    return False, verify_path
+                verify_path = output_path
+            return True, verify_path
+        finally:
+            if mirror:
+                mirror.stop()
+
+    def _chapter_metadata(self, output_path, final_audio_paths, durations, fades):
+        """
+        Writes the ffmetadata input (title + one chapter per track) for a
+        render. Returns (path, chapter_count), or (None, 0) when disabled.
+        Dry runs only compute the path.
+        """
+        from src.chapters import build_chapters, format_ffmetadata, metadata_path_for
+
+        if not self.settings.get('embed_chapters', True):
+            return None, 0
+        chapters = build_chapters(final_audio_paths, durations, fades)
+        meta_path = metadata_path_for(output_path, self._job_scratch())
+        if not self.dry_run:
+            title = os.path.splitext(os.path.basename(output_path))[0]
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                f.write(format_ffmetadata(chapters, title=title))
+        return meta_path, len(chapters)
+
+    def _faststart_args(self, video_path, duration, chapter_count=0):
+        """
+        Reserves room for the moov atom at the start of the MP4, so it is
+        streamable as written instead of being rewritten by +faststart.
+        """
+        from src.chapters import estimate_moov_size
+        from src.utils import probe_media
+
+        if not self.settings.get('faststart', True):
+            return []
+        probed = probe_media(video_path)
+        fps = ((probed.get('video') if probed else None) or {}).get('fps')
+        return ['-moov_size', str(estimate_moov_size(duration, fps, chapter_count))]
+
+    def _prepare_crossfades(self, final_audio_paths, durations, fades, loudness, output_path):
+        """
+        Plans a crossfaded join without a chain of crossfade filters: each
+        distinct transition is rendered once as a short PCM overlap, and
+        the main encode concatenates track bodies and overlaps. Returns
+        (audio_inputs, overlap_commands, scratch_dir).
+        """
+        from src.crossfade import (build_segments, overlap_command, overlap_file_name,
+                                   overlap_key, scratch_dir_for)
+        from src.loudness import OUTPUT_SAMPLE_RATE
+        from src.utils import probe_media
+
+        scratch_dir = scratch_dir_for(output_path, self._job_scratch())
+        overlaps = {}
+        commands = []
+        for i, fade in enumerate(fades):
+            if not fade:
+                continue
+            path_a, path_b = final_audio_paths[i], final_audio_paths[i + 1]
+            key = overlap_key(path_a, path_b, fade)
+            if key in overlaps:
+                continue
+            overlaps[key] = os.path.join(scratch_dir, overlap_file_name(len(overlaps)))
+            # The overlap continues track A, at its rate
+            if loudness.get(path_a):
+                rate = OUTPUT_SAMPLE_RATE
+            else:
+                rate = ((probe_media(path_a) or {}).get('audio') or {}).get('sample_rate')
+            commands.append(overlap_command(path_a, durations[i], path_b, fade, overlaps[key],
+                                            loudness.get(path_a), loudness.get(path_b), sample_rate=rate))
+
+        segments = build_segments(final_audio_paths, durations, fades, overlaps)
+        audio_inputs = [(args, loudness.get(path) if path else None) for args, path in segments]
+        return audio_inputs, commands, scratch_dir
+
+    def _render_overlaps(self, commands, scratch_dir):
+        """Renders the crossfade overlaps in parallel. Returns True if all succeeded."""
+        os.makedirs(scratch_dir, exist_ok=True)
+        self.progress_update.emit(f"Rendering {len(commands)} crossfade overlap(s)...")
+        workers = min(max((os.cpu_count() or 2) // 2, 1), 4)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(self._run_ffmpeg, commands))
+        return all(results)
+
+    # === CHUNKED AUDIO ===
+    def _audio_workers(self):
+        """Parallel ffmpeg processes one job may run (batch workers share the CPUs)."""
+        if self.settings.get('audio_workers'):
+            return max(int(self.settings['audio_workers']), 1)
+        return max((os.cpu_count() or 2) // max(self._eta_workers, 1), 1)
+
+    def _audio_chunk_seconds(self):
+        from src.mp3join import CHUNK_SECONDS
+        return float(self.settings.get('audio_chunk_seconds') or CHUNK_SECONDS)
+
+    def _audio_chunk_dir(self, output_path):
+        return os.path.join(self._job_scratch(), f"{os.path.basename(output_path)}.chunks")
+
+    def _chunked_audio_format(self, final_audio_paths, loudness, total_duration):
+        """
+        (sample_rate, channels) if an audio-only render is worth encoding as
+        parallel chunks, else None (one serial encode).
+        """
+        from src.loudness import OUTPUT_SAMPLE_RATE
+        from src.mp3join import SAMPLE_RATES
+        from src.utils import probe_media
+
+        if not self.settings.get('chunked_audio', True) or self._audio_workers() < 2:
+            return None
+        if not total_duration or total_duration < 2 * self._audio_chunk_seconds():
+            return None
+        streams = [((probe_media(p) or {}).get('audio') or {}) for p in dict.fromkeys(final_audio_paths)]
+        rate = OUTPUT_SAMPLE_RATE if loudness else streams[0].get('sample_rate')
+        if rate not in SAMPLE_RATES:
+            rate = 44100
+        channels = 1 if all(s.get('channels') == 1 for s in streams) else 2
+        return rate, channels
+
+    def _audio_decode_commands(self, audio_inputs, audio_format, work_dir):
+        """
+        Commands decoding every distinct audio input (repeats share one) to
+        raw PCM. Returns (commands, PCM path of each input in order).
+        """
+        from src.mp3join import PCM_FORMAT_ARGS
+
+        rate, channels = audio_format
+        decoded = {}
+        commands = []
+        paths = []
+        for input_args, input_filter in audio_inputs:
+            key = (tuple(input_args), input_filter)
+            if key not in decoded:
+                decoded[key] = os.path.join(work_dir, f"pcm_{len(decoded):04d}.raw")
+                cmd = ['ffmpeg', '-y'] + list(input_args) + ['-map', '0:a:0']
+                if input_filter:
+                    cmd.extend(['-af', input_filter])
+                cmd.extend(['-ac', str(channels), '-ar', str(rate)] + PCM_FORMAT_ARGS + [decoded[key]])
+                commands.append(cmd)
+            paths.append(decoded[key])
+        return commands, paths
+
+    def _run_parallel(self, run, items, workers, progress_offset, progress_scale):
+        """Runs run(item) for all items on `workers` threads. Returns True if all succeeded."""
+        from concurrent.futures import as_completed
+
+        done = 0
+        ok = True
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in as_completed([pool.submit(run, item) for item in items]):
+                ok = future.result() and ok
+                done += 1
+                self._report_progress(progress_offset + progress_scale * done / len(items))
+        return ok and not self.cancelled
+
+    def _encode_audio_chunks(self, output_path, audio_inputs, pass_inputs, audio_format, meta_path,
+                             total_duration, speed_key=None, progress_offset=0, progress_scale=100):
+        """
+        Audio-only render as parallel work (see src.mp3join): decodes the
+        inputs to PCM, encodes frame-aligned chunks of the timeline side by
+        side and joins their frames into output_path, adding the chapters.
+        With pass_inputs (inputs per pass of a repeated playlist) every pass
+        is padded to whole frames, under one frame of silence, so the passes
+        cut into the same chunks and reuse the first pass's encodes.
+        """
+        from src.mp3join import (BYTES_PER_SAMPLE, CHUNK_MUXER_ARGS, join_chunks, plan_chunks,
+                                 samples_per_frame, window_spans, write_window)
+
+        rate, channels = audio_format
+        work_dir = self._audio_chunk_dir(output_path)
+        workers = self._audio_workers()
+        started = time.monotonic()
+        paused_before = self._paused_total
+        os.makedirs(work_dir, exist_ok=True)
+        try:
+            decode_cmds, pcm_paths = self._audio_decode_commands(audio_inputs, audio_format, work_dir)
+            self.progress_update.emit(f"Decoding {len(decode_cmds)} audio input(s) on {workers} worker(s)...")
+            if not self._run_parallel(self._run_ffmpeg, decode_cmds, workers, progress_offset, progress_scale * 0.2):
+                return False
+
+            frame_bytes = channels * BYTES_PER_SAMPLE
+            pieces = [(path, os.path.getsize(path) // frame_bytes) for path in pcm_paths]
+            period = None
+            if pass_inputs and len(pieces) > pass_inputs:
+                pass_samples = sum(samples for _, samples in pieces[:pass_inputs])
+                pad = -pass_samples % samples_per_frame(rate)
+                period = pass_samples + pad
+                padded = []
+                for i, piece in enumerate(pieces):
+                    padded.append(piece)
+                    if pad and (i + 1) % pass_inputs == 0 and i + 1 < len(pieces):
+                        padded.append((None, pad))
+                pieces = padded
+            total = sum(samples for _, samples in pieces)
+            chunks = plan_chunks(total, rate, period, self._audio_chunk_seconds())
+
+            # Chunks over the same audio (repeated passes) encode once
+            encodes = {}
+            chunk_paths = []
+            for chunk in chunks:
+                spans = tuple(window_spans(pieces, chunk['start'], chunk['count']))
+                if spans not in encodes:
+                    encodes[spans] = os.path.join(work_dir, f"chunk_{len(encodes):04d}.mp3")
+                chunk_paths.append(encodes[spans])
+
+            def encode(item):
+                spans, chunk_path = item
+                window = os.path.splitext(chunk_path)[0] + ".raw"
+                try:
+                    write_window(spans, channels, window)
+                    cmd = ['ffmpeg', '-y', '-f', 's16le', '-ar', str(rate), '-ac', str(channels), '-i', window]
+                    return self._run_ffmpeg(cmd + MP3_AUDIO_ARGS + CHUNK_MUXER_ARGS + [chunk_path])
+                finally:
+                    self._remove_partial(window)
+
+            self.progress_update.emit(f"Encoding {len(encodes)} audio chunk(s) on {workers} worker(s)"
+                                      f" ({len(chunks) - len(encodes)} reused)...")
+            if not self._run_parallel(encode, list(encodes.items()), workers,
+                                      progress_offset + progress_scale * 0.2, progress_scale * 0.75):
+                return False
+
+            joined = os.path.join(work_dir, "joined.mp3") if meta_path else output_path
+            try:
+                join_chunks(chunk_paths, chunks, total, joined)
+            except (OSError, ValueError) as e:
+                logging.error(f"Joining audio chunks of {os.path.basename(output_path)} failed: {e}")
+                return False
+            if meta_path:
+                # Stream-copy remux just to add the chapters
+                cmd = ['ffmpeg', '-y', '-i', joined, '-f', 'ffmetadata', '-i', meta_path,
+                       '-map', '0:a', '-c', 'copy', '-map_metadata', '1', '-map_chapters', '1', output_path]
+                if not self._run_ffmpeg(cmd):
+                    self._remove_partial(output_path)
+                    return False
+
+            # The whole job is one encode as far as speed predictions go
+            history = self._get_speed_history() if speed_key else None
+            if history and total_duration:
+                history.record(speed_key, total_duration, time.monotonic() - started - (self._paused_total - paused_before))
+            return True
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _audio_mix_filter(self, input_filters, first_input, out_label):
+        """
+        filter_complex parts concatenating the audio inputs (starting at
+        input index first_input), each through its own filter if it has one.
+        """
+        parts = []
+        sources = ""
+        for i, input_filter in enumerate(input_filters):
+            source = f"[{first_input + i}:a]"
+            if input_filter:
+                parts.append(f"{source}{input_filter}[norm{i}]")
+                source = f"[norm{i}]"
+            sources += source
+        parts.append(f"{sources}concat=n={len(input_filters)}:v=0:a=1[{out_label}]")
+        return parts
+
+    def _finish_single(self, output_path, audio_paths, success, batch_mode, fades=None):
         if success:
             # Create the Track List Text File
             # Only list the unique tracks (1 iteration), not the repeats
-            self._create_tracklist(output_path, audio_paths)
+            self._create_tracklist(output_path, audio_paths, fades)
+            self._record_output(output_path)
             if not batch_mode:
+                self.progress.finish_job('render', True)
+                self._job_finished(os.path.basename(output_path), True, self._single_started)
                 self.progress_value.emit(100)
                 self.finished.emit(True, "Render Complete!")
+        elif self.cancelled:
+            if not batch_mode:
+                self._job_finished(os.path.basename(output_path), False, self._single_started)
+                self.finished.emit(False, "Render cancelled.")
         else:
             if not batch_mode:
+                self._job_finished(os.path.basename(output_path), False, self._single_started)
                 self.finished.emit(False, "FFmpeg validation failed.")
             else:
                 self.progress_update.emit(f"Failed to render: {os.path.basename(output_path)}")
+        return success
 
 
-    def _create_tracklist(self, output_video_path, audio_paths):
-        """Creates a timestamped text file next to the video."""
+    def _create_tracklist(self, output_video_path, audio_paths, fades=None):
+        """
+        Creates a timestamped text file next to the video. With crossfades,
+        each track starts where its fade-in begins.
+        """
         from src.utils import get_media_duration
         
         txt_path = os.path.splitext(output_video_path)[0] + ".txt"
         current_time = 0.0
         
         with open(txt_path, 'w', encoding='utf-8') as f:
-            for path in audio_paths:
+            for i, path in enumerate(audio_paths):
                 name = os.path.basename(path)
                 # Format MM:SS or HH:MM:SS
                 m, s = divmod(int(current_time), 60)
@@ -317,3 +2051,5 @@ class RenderThread(QThread):
                 duration = get_media_duration(path)
                 if duration:
                     current_time += duration
+                if fades and i < len(fades):
+                    current_time -= fades[i]
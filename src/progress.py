@@ -0,0 +1,122 @@
+import threading
+
+DEFAULT_INTERVAL = 0.25   # seconds between published snapshots
+
+class ProgressAggregator:
+    """
+    Central progress state for a render. Workers report per-job percentages
+    (cheap: a dict write under a lock, no signal emission); a publisher
+    thread turns them into one duration-weighted snapshot and hands it to
+    the subscribers at a fixed rate, and only when something changed.
+
+    Snapshot layout:
+        {'current': int, 'overall': int, 'done': int, 'failed': int,
+         'total': int, 'jobs': [{'id', 'label', 'percent', 'eta', 'state'}]}
+    where 'current' is the weighted progress of the running jobs, 'overall'
+    that of every job, and 'jobs' lists the running ones.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._jobs = {}         # id -> dict(label, weight, percent, eta, state)
+        self._order = []
+        self._subscribers = []
+        self._version = 0
+        self._published = -1
+        self._stop = threading.Event()
+        self._thread = None
+
+    # === REPORTING SIDE (render workers) ===
+    def add_job(self, job_id, label, weight=1.0):
+        """Registers a job that has not started yet (weight ~ its duration)."""
+        with self._lock:
+            if job_id not in self._jobs:
+                self._order.append(job_id)
+            self._jobs[job_id] = {
+                'label': label, 'weight': max(weight or 0, 1.0), 'percent': 0.0,
+                'eta': None, 'state': 'pending',
+            }
+            self._version += 1
+
+    def start_job(self, job_id, label=None, weight=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            self.add_job(job_id, label or str(job_id), weight)
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(state='running', percent=0.0)
+            self._version += 1
+
+    def update(self, job_id, percent=None, eta=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if percent is not None:
+                job['percent'] = min(max(float(percent), 0.0), 100.0)
+            if eta is not None:
+                job['eta'] = eta
+            self._version += 1
+
+    def finish_job(self, job_id, ok=True):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['state'] in ('done', 'failed'):
+                return
+            job.update(state='done' if ok else 'failed', percent=100.0, eta=None)
+            self._version += 1
+
+    # === PUBLISHING SIDE ===
+    def subscribe(self, callback):
+        """callback(snapshot) runs on the publisher thread."""
+        self._subscribers.append(callback)
+
+    def snapshot(self):
+        with self._lock:
+            jobs = [dict(self._jobs[j], id=j) for j in self._order]
+            version = self._version
+
+        total_weight = sum(j['weight'] for j in jobs) or 1.0
+        running = [j for j in jobs if j['state'] == 'running']
+        running_weight = sum(j['weight'] for j in running) or 1.0
+        snap = {
+            'current': round(sum(j['percent'] * j['weight'] for j in running) / running_weight),
+            'overall': round(sum(j['percent'] * j['weight'] for j in jobs) / total_weight),
+            'done': sum(1 for j in jobs if j['state'] == 'done'),
+            'failed': sum(1 for j in jobs if j['state'] == 'failed'),
+            'total': len(jobs),
+            'jobs': [
+                {'id': j['id'], 'label': j['label'], 'percent': int(j['percent']),
+                 'eta': j['eta'], 'state': j['state']}
+                for j in running
+            ],
+        }
+        return snap, version
+
+    def publish(self, force=False):
+        """Sends a snapshot to every subscriber if anything changed."""
+        snap, version = self.snapshot()
+        if version == self._published and not force:
+            return
+        self._published = version
+        for callback in list(self._subscribers):
+            callback(snap)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="progress", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the publisher after one final snapshot."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.publish()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.publish()
@@ -0,0 +1,151 @@
+import os
+import time
+import shutil
+import logging
+import threading
+
+# Target segment length; keyframes are forced on this grid so segments
+# come out evenly sized
+SEGMENT_SECONDS = 6
+MODES = ('fmp4', 'hls')
+# Written into the segment dir once the encode finished and the manifest is final
+COMPLETE_MARKER = "COMPLETE"
+
+MANIFEST_NAMES = {
+    'fmp4': "segments.ffconcat",
+    'hls': "index.m3u8",
+}
+
+def segment_dir_for(output_path):
+    """X.mp4 -> X.segments next to it."""
+    return os.path.splitext(output_path)[0] + ".segments"
+
+def manifest_path(segment_dir, mode):
+    return os.path.join(segment_dir, MANIFEST_NAMES[mode])
+
+def keyframe_args(seconds=SEGMENT_SECONDS):
+    return ['-force_key_frames', f"expr:gte(t,n_forced*{seconds})"]
+
+def output_args(mode, segment_dir, seconds=SEGMENT_SECONDS):
+    """
+    Muxer arguments (ending with the manifest path) replacing the output
+    file of an encode. Segments only appear in the manifest once complete:
+
+    fmp4: self-contained fragmented MP4 parts from the segment muxer, listed
+          in an ffconcat file (readable by ffmpeg's concat demuxer).
+    hls:  an EVENT playlist over fMP4 segments plus init.mp4; it gets
+          #EXT-X-ENDLIST when the encode finishes.
+    """
+    manifest = manifest_path(segment_dir, mode)
+    if mode == 'hls':
+        return ['-f', 'hls', '-hls_time', str(seconds), '-hls_playlist_type', 'event',
+                '-hls_segment_type', 'fmp4', '-hls_fmp4_init_filename', 'init.mp4',
+                '-hls_flags', 'independent_segments+temp_file',
+                '-hls_segment_filename', os.path.join(segment_dir, "seg_%05d.m4s"), manifest]
+    return ['-f', 'segment', '-segment_time', str(seconds), '-segment_format', 'mp4',
+            '-segment_format_options', 'movflags=+frag_keyframe+empty_moov+default_base_moof',
+            '-segment_list', manifest, '-segment_list_type', 'ffconcat', '-segment_list_flags', '+live',
+            os.path.join(segment_dir, "part_%05d.mp4")]
+
+def remux_command(mode, segment_dir, output_path, meta_path=None):
+    """Stream-copies the segments into one regular (faststart) MP4, adding chapters."""
+    manifest = manifest_path(segment_dir, mode)
+    cmd = ['ffmpeg', '-y']
+    if mode == 'fmp4':
+        cmd.extend(['-f', 'concat', '-safe', '0'])
+    cmd.extend(['-i', manifest])
+    if meta_path:
+        cmd.extend(['-f', 'ffmetadata', '-i', meta_path])
+    cmd.extend(['-map', '0', '-c', 'copy'])
+    if meta_path:
+        cmd.extend(['-map_metadata', '1', '-map_chapters', '1'])
+    cmd.extend(['-movflags', '+faststart', output_path])
+    return cmd
+
+def read_manifest(segment_dir, mode):
+    """The manifest text, or None while it does not exist yet."""
+    try:
+        with open(manifest_path(segment_dir, mode), 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def listed_files(text, mode):
+    """Files a manifest references, in order (relative names)."""
+    names = []
+    for line in text.splitlines():
+        line = line.strip()
+        if mode == 'fmp4':
+            if line.startswith("file "):
+                names.append(os.path.basename(line[5:].strip().strip("'")))
+        elif line.startswith('#EXT-X-MAP:'):
+            uri = line.split('URI="', 1)[-1].split('"', 1)[0]
+            names.append(os.path.basename(uri))
+        elif line and not line.startswith('#'):
+            names.append(os.path.basename(line))
+    return names
+
+def mark_complete(segment_dir):
+    with open(os.path.join(segment_dir, COMPLETE_MARKER), 'w', encoding='utf-8') as f:
+        f.write(f"{time.time():.0f}\n")
+
+class SegmentMirror:
+    """
+    Local stand-in for the uploader: copies segments into dest_dir as soon
+    as the manifest lists them, then the manifest itself (atomically), so
+    the mirrored manifest never references a segment that is not there.
+    The completion marker follows once the render is done.
+    """
+
+    def __init__(self, segment_dir, mode, dest_dir, interval=1.0):
+        self.segment_dir = segment_dir
+        self.mode = mode
+        self.dest_dir = dest_dir
+        self.interval = interval
+        self.copied = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        os.makedirs(self.dest_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._loop, name="segment-mirror", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops after a final pass (which also carries the marker, if written)."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.sync()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.sync()
+
+    def sync(self):
+        # The marker is only passed on with a manifest read after it appeared
+        complete = os.path.exists(os.path.join(self.segment_dir, COMPLETE_MARKER))
+        # One snapshot of the manifest: its segments first, then the text
+        text = read_manifest(self.segment_dir, self.mode)
+        if text is None:
+            return
+        try:
+            for name in listed_files(text, self.mode):
+                if name not in self.copied:
+                    self._copy(name)
+                    self.copied.add(name)
+            target = os.path.join(self.dest_dir, MANIFEST_NAMES[self.mode])
+            with open(target + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(target + ".tmp", target)
+            if complete:
+                self._copy(COMPLETE_MARKER)
+        except OSError as e:
+            logging.warning(f"Segment mirror to {self.dest_dir} failed: {e}")
+
+    def _copy(self, name):
+        target = os.path.join(self.dest_dir, name)
+        tmp = target + ".tmp"
+        shutil.copyfile(os.path.join(self.segment_dir, name), tmp)
+        os.replace(tmp, target)
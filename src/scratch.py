@@ -0,0 +1,195 @@
+import os
+import re
+import time
+import shutil
+import itertools
+import logging
+import threading
+
+from src.utils import get_app_data_dir
+
+# Free space every volume keeps after all admitted jobs have finished writing
+DEFAULT_RESERVE_MB = 1024
+# Output and intermediate size estimates are padded by this factor
+SIZE_HEADROOM = 1.2
+# Scratch dirs untouched for this long are removed even if their pid lives
+STALE_SECONDS = 7 * 24 * 3600
+
+def path_size(path):
+    """Bytes currently used by a file or a directory tree (0 if missing)."""
+    try:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+    except OSError:
+        return 0
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+def _existing_parent(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # os.kill() would terminate the process there; assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Exists but belongs to another user
+    return True
+
+class ScratchManager:
+    """
+    Temp space for a render's intermediates (crossfade overlaps, chapter
+    metadata, ...) on a configurable fast local volume, plus disk-aware
+    admission of new jobs.
+
+    A job declares what it will write as (path, expected_bytes) pairs, the
+    final outputs as well as its intermediates. It is admitted only if, on
+    every volume involved, the free space minus what already admitted jobs
+    still have to write leaves `reserve_mb` spare. Otherwise it waits for
+    running jobs to finish. A job that does not fit while nothing else runs
+    goes ahead with a warning (the sizes are estimates), or is refused if
+    `strict`. Each job's workspace is removed when the job is released,
+    whatever the outcome.
+    """
+
+    def __init__(self, root=None, reserve_mb=DEFAULT_RESERVE_MB, strict=False):
+        self.root = root or get_app_data_dir("scratch")
+        self.reserve_bytes = int(reserve_mb * 1024 * 1024)
+        self.strict = strict
+        # One dir per process, so concurrent runs never clean up each other
+        self.run_dir = os.path.join(self.root, f"run-{os.getpid()}-{int(time.time())}")
+        self._cond = threading.Condition()
+        self._admitted = {}     # job_id -> [(path, expected_bytes)]
+        self._workspaces = {}   # job_id -> dir
+        self._serial = itertools.count(1)
+
+    def cleanup_stale(self, max_age=STALE_SECONDS):
+        """
+        Removes workspaces left behind by runs that crashed or were killed:
+        those of dead processes, and any older than max_age.
+        """
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return
+        for entry in entries:
+            match = re.match(r"run-(\d+)-", entry.name)
+            if not entry.is_dir() or not match:
+                continue
+            try:
+                old = time.time() - entry.stat().st_mtime > max_age
+            except OSError:
+                continue
+            if old or not _pid_alive(int(match.group(1))):
+                logging.info(f"Removing stale scratch dir {entry.path}")
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    # === WORKSPACES ===
+    def workspace(self, job_id, create=True):
+        """The job's private scratch dir (created on first use)."""
+        with self._cond:
+            path = self._workspaces.get(job_id)
+            if path is None:
+                safe = re.sub(r'[^\w.-]+', '_', str(job_id)) or "job"
+                path = os.path.join(self.run_dir, f"{next(self._serial):05d}-{safe}")
+                self._workspaces[job_id] = path
+        if create:
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    # === ADMISSION ===
+    def _volume(self, path):
+        path = _existing_parent(path)
+        try:
+            return os.stat(path).st_dev, path
+        except OSError:
+            return path, path
+
+    def _shortfall(self, needs):
+        """Per-volume bytes missing for `needs` on top of the admitted jobs (empty if it fits)."""
+        demand = {}     # volume -> [probe path, bytes still to be written]
+        for job_needs, own in [(n, False) for n in self._admitted.values()] + [(needs, True)]:
+            for path, expected in job_needs:
+                volume, probe = self._volume(path)
+                # Admitted jobs have already written part of their share
+                outstanding = expected if own else max(expected - path_size(path), 0)
+                entry = demand.setdefault(volume, [probe, 0])
+                entry[1] += outstanding
+
+        missing = {}
+        for volume, (probe, outstanding) in demand.items():
+            try:
+                free = shutil.disk_usage(probe).free
+            except OSError:
+                continue
+            if outstanding + self.reserve_bytes > free:
+                missing[probe] = outstanding + self.reserve_bytes - free
+        return missing
+
+    def admit(self, job_id, needs, should_stop=None, on_wait=None, on_short=None, poll_seconds=2.0):
+        """
+        Blocks until the job fits. Returns None once admitted, or the reason
+        it was refused (strict and it can never fit, or should_stop() turned
+        true). on_wait(missing_bytes) is called once if the job has to wait,
+        on_short(reason) if it is admitted without fitting.
+        """
+        needs = [(path, int(size * SIZE_HEADROOM)) for path, size in needs if size]
+        waited = False
+        with self._cond:
+            while True:
+                missing = self._shortfall(needs)
+                if not missing:
+                    self._admitted[job_id] = needs
+                    return None
+                if not self._admitted:
+                    # Nothing running will free space: waiting cannot help
+                    where, short = max(missing.items(), key=lambda item: item[1])
+                    reason = f"needs {short / 1024 ** 3:.1f} GB more free space on {where}"
+                    if self.strict:
+                        return reason
+                    logging.warning(f"Starting {job_id} although it may not fit: {reason}")
+                    if on_short:
+                        on_short(reason)
+                    self._admitted[job_id] = needs
+                    return None
+                if should_stop and should_stop():
+                    return "stopped"
+                if not waited and on_wait:
+                    waited = True
+                    on_wait(sum(missing.values()))
+                self._cond.wait(poll_seconds)
+
+    def release(self, job_id):
+        """Deletes the job's intermediates and frees its admission share."""
+        with self._cond:
+            self._admitted.pop(job_id, None)
+            path = self._workspaces.pop(job_id, None)
+            self._cond.notify_all()
+        if path:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def close(self):
+        """Releases every job and removes this run's scratch dir."""
+        with self._cond:
+            self._admitted.clear()
+            self._workspaces.clear()
+            self._cond.notify_all()
+        shutil.rmtree(self.run_dir, ignore_errors=True)
@@ -0,0 +1,374 @@
+import os
+import hmac
+import json
+import time
+import uuid
+import logging
+import secrets
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from src.metrics import registry as metrics, log_event
+from src.utils import VIDEO_EXTS, get_app_data_dir, flush_probe_cache
+
+DEFAULT_PORT = 8765
+LOG_TAIL = 20
+# Per-install secret every API request must carry (Authorization: Bearer)
+TOKEN_FILE = "service_token"
+# A single render writes one of these; batch and separate-file renders write a folder
+OUTPUT_FILE_EXTS = VIDEO_EXTS + ('.mp3',)
+# Settings holding input or scratch paths, which must be absolute
+PATH_SETTINGS = ('batch_root', 'video_path', 'scratch_dir', 'upload_dir')
+
+def load_token(path=None):
+    """The service token, created (readable by this user only) on first use."""
+    path = path or os.path.join(get_app_data_dir(), TOKEN_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    token = secrets.token_urlsafe(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Created by another process in the meantime
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    return token
+
+def check_settings(settings):
+    """Problem with submitted render settings as a message, or None if they can be queued."""
+    if not isinstance(settings, dict) or not settings.get('output_path'):
+        return "settings need at least an output_path"
+    output_path = settings['output_path']
+    if not isinstance(output_path, str) or not os.path.isabs(output_path):
+        return "output_path must be an absolute path"
+    output_path = os.path.normpath(output_path)
+    if not os.path.isdir(os.path.dirname(output_path)):
+        return "the folder of output_path does not exist"
+
+    writes_folder = settings.get('mode', 'single') != 'single' or settings.get('separate_files')
+    if writes_folder:
+        if os.path.exists(output_path) and not os.path.isdir(output_path):
+            return "output_path must be a folder for this render"
+    else:
+        if not output_path.lower().endswith(OUTPUT_FILE_EXTS):
+            return f"output_path must end in one of {', '.join(OUTPUT_FILE_EXTS)}"
+        if os.path.isdir(output_path):
+            return "output_path is a folder"
+
+    paths = [settings.get(key) for key in PATH_SETTINGS if settings.get(key)]
+    audio_paths = settings.get('audio_paths') or []
+    if not isinstance(audio_paths, list):
+        return "audio_paths must be a list"
+    for path in paths + audio_paths:
+        if not isinstance(path, str) or not os.path.isabs(path):
+            return "input and scratch paths must be absolute"
+    return None
+
+class RenderService:
+    """
+    Long-lived render queue. Jobs (RenderThread settings dicts) are persisted
+    to queue.json and rendered one at a time on a worker thread. The probe
+    cache, encoder detection, audio cache and speed history stay loaded
+    between jobs, so each submission skips the cold-start work.
+    """
+
+    def __init__(self, queue_path=None):
+        self.queue_path = queue_path or os.path.join(get_app_data_dir(), "queue.json")
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._current = None   # (job_id, RenderThread)
+        self.jobs = self._load()
+
+        # Warm state shared by every job
+        self.audio_cache = None
+        self.speed_history = None
+
+    # === PERSISTENCE ===
+    def _load(self):
+        try:
+            with open(self.queue_path, 'r', encoding='utf-8') as f:
+                jobs = json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable render queue: {e}")
+            return []
+
+        # A job that was running when the service died starts over
+        for job in jobs:
+            if job['state'] == 'running':
+                job['state'] = 'queued'
+                job['progress'] = 0
+        return jobs
+
+    def _save(self):
+        tmp = self.queue_path + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.jobs, f, indent=1)
+            os.replace(tmp, self.queue_path)
+        except OSError as e:
+            logging.warning(f"Could not save render queue: {e}")
+
+    # === QUEUE API ===
+    def submit(self, settings):
+        """Queues a render. Returns the new job dict."""
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'settings': settings,
+            'state': 'queued',
+            'progress': 0,
+            'batch_progress': 0,
+            'eta': "",
+            'message': "Queued",
+            'log': [],
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+        }
+        with self._lock:
+            self.jobs.append(job)
+            self._save()
+            self._update_queue_depth()
+        log_event('job_submitted', job=job['id'])
+        self._wakeup.set()
+        return job
+
+    def _update_queue_depth(self):
+        metrics.set('loopvideo_queue_depth', sum(1 for j in self.jobs if j['state'] == 'queued'))
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self.jobs:
+                if job['id'] == job_id:
+                    return dict(job)
+        return None
+
+    def list(self):
+        with self._lock:
+            return [dict(job) for job in self.jobs]
+
+    def cancel(self, job_id):
+        """Cancels a queued or running job. Returns False if not found/over."""
+        with self._lock:
+            job = next((j for j in self.jobs if j['id'] == job_id), None)
+            if not job or job['state'] not in ('queued', 'running'):
+                return False
+            if job['state'] == 'queued':
+                job['state'] = 'cancelled'
+                job['message'] = "Cancelled before start"
+                self._save()
+                return True
+            current = self._current
+
+        if current and current[0] == job_id:
+            current[1].cancel()
+        return True
+
+    # === WORKER ===
+    def start(self):
+        self._worker = threading.Thread(target=self._work_loop, name="render-service", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stopping = True
+        with self._lock:
+            current = self._current
+        if current:
+            current[1].cancel()
+        self._wakeup.set()
+
+    def _next_job(self):
+        with self._lock:
+            for job in self.jobs:
+                if job['state'] == 'queued':
+                    return job
+        return None
+
+    def _work_loop(self):
+        while not self._stopping:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.wait(5)
+                self._wakeup.clear()
+                continue
+            self._run_job(job)
+
+    def _update(self, job, save=False, **fields):
+        with self._lock:
+            job.update(fields)
+            if save:
+                self._save()
+
+    def _run_job(self, job):
+        from src.processor import RenderThread
+
+        thread = RenderThread(job['settings'], audio_cache=self.audio_cache, speed_history=self.speed_history)
+        with self._lock:
+            self._current = (job['id'], thread)
+            job.update(state='running', started_at=time.time(), message="Starting")
+            self._save()
+            self._update_queue_depth()
+
+        def on_message(msg):
+            with self._lock:
+                job['message'] = msg
+                job['log'] = (job['log'] + [msg])[-LOG_TAIL:]
+
+        result = {}
+        thread.progress_update.connect(on_message)
+        thread.progress_value.connect(lambda v: self._update(job, progress=v))
+        thread.progress_batch.connect(lambda v: self._update(job, batch_progress=v))
+        thread.eta_update.connect(lambda text: self._update(job, eta=text))
+        thread.progress_snapshot.connect(lambda snap: self._update(job, active=snap['jobs']))
+        thread.finished.connect(lambda ok, msg: result.update(ok=ok, msg=msg))
+
+        try:
+            thread.run()
+        except Exception as e:
+            logging.exception(f"Render job {job['id']} crashed")
+            result.update(ok=False, msg=str(e))
+
+        # Keep the warm state for the next job
+        self.audio_cache = thread._get_audio_cache()
+        self.speed_history = thread._get_speed_history()
+        flush_probe_cache()
+
+        if thread.cancelled:
+            state = 'cancelled'
+        else:
+            state = 'done' if result.get('ok') else 'failed'
+        with self._lock:
+            self._current = None
+            job.update(state=state, finished_at=time.time(), eta="", active=[],
+                       message=result.get('msg', "Finished"))
+            if state == 'done':
+                job['progress'] = 100
+            self._save()
+
+# === LOCAL HTTP API ===
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+    token = None
+
+    def log_message(self, fmt, *args):
+        logging.debug("render service: " + fmt % args)
+
+    def _allowed(self, body=False):
+        """
+        Replies with an error and returns False unless the request carries the
+        token and comes from this machine's own client: browsers send a foreign
+        Origin (or a rebound Host) and cannot set the token header or the JSON
+        content type without a preflight this server never answers.
+        """
+        port = self.server.server_address[1]
+        local = {f"127.0.0.1:{port}", f"localhost:{port}"}
+        origin = self.headers.get('Origin')
+        if self.headers.get('Host') not in local or (origin and origin.split('://', 1)[-1] not in local):
+            self._reply(403, {'error': "requests must come from this machine"})
+            return False
+        supplied = self.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {self.token}".encode('utf-8')):
+            self._reply(401, {'error': "missing or wrong service token"})
+            return False
+        if body and self.headers.get('Content-Type', '').split(';')[0].strip().lower() != 'application/json':
+            self._reply(415, {'error': "body must be application/json"})
+            return False
+        return True
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self._allowed():
+            return
+        parts = [p for p in self.path.split('/') if p]
+        if parts == ['jobs']:
+            self._reply(200, self.service.list())
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self.service.get(parts[1])
+            if job:
+                self._reply(200, job)
+            else:
+                self._reply(404, {'error': "no such job"})
+        else:
+            self._reply(404, {'error': "not found"})
+
+    def do_POST(self):
+        if not self._allowed(body=True):
+            return
+        parts = [p for p in self.path.split('/') if p]
+        if parts == ['jobs']:
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                settings = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._reply(400, {'error': "body must be a JSON settings object"})
+                return
+            problem = check_settings(settings)
+            if problem:
+                self._reply(400, {'error': problem})
+                return
+            self._reply(201, self.service.submit(settings))
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            ok = self.service.cancel(parts[1])
+            self._reply(200 if ok else 404, {'cancelled': ok})
+        else:
+            self._reply(404, {'error': "not found"})
+
+def serve(port=DEFAULT_PORT, queue_path=None):
+    """Runs the render service with its HTTP API on localhost until Ctrl+C."""
+    service = RenderService(queue_path)
+    service.start()
+
+    handler = type('Handler', (_Handler,), {'service': service, 'token': load_token()})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    print(f"Render service listening on http://127.0.0.1:{port} ({len(service.list())} job(s) in queue)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+class ServiceClient:
+    """Minimal client for the local render service API."""
+
+    def __init__(self, port=DEFAULT_PORT, token=None):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.token = token or load_token()
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json',
+                                              'Authorization': f"Bearer {self.token}"})
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return json.loads(resp.read())
+
+    def submit(self, settings):
+        return self._request('POST', '/jobs', settings)
+
+    def list(self):
+        return self._request('GET', '/jobs')
+
+    def get(self, job_id):
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def cancel(self, job_id):
+        return self._request('POST', f'/jobs/{job_id}/cancel', {})
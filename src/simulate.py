@@ -0,0 +1,195 @@
+"""
+Scheduler benchmark: runs the real batch pipeline (discovery, planning,
+worker pool or shared work queue, progress aggregation) against the
+simulated ffmpeg backend on a synthetic batch.
+
+    python -m src.simulate --folders 10000 --workers 8 --seconds 10
+"""
+import os
+import sys
+import time
+import heapq
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+
+# Background videos of the synthetic folders: (width, height, fps)
+RESOLUTIONS = [(1280, 720, 30), (1920, 1080, 30), (1920, 1080, 60), (3840, 2160, 30)]
+
+def build_synthetic_batch(root, folders, seed=None, tracks=(3, 20), track_seconds=(90, 480), audio_only_share=0.05):
+    """
+    Creates `folders` project folders of empty media files under root and
+    seeds the probe cache with plausible durations and stream info for them,
+    so discovery and planning run unchanged without ffprobe.
+    """
+    from src.utils import store_probe_result, flush_probe_cache
+
+    rng = random.Random(seed)
+    width = len(str(folders))
+    for n in range(folders):
+        folder = os.path.join(root, f"folder_{n + 1:0{width}d}")
+        os.makedirs(folder)
+
+        if rng.random() >= audio_only_share:
+            w, h, fps = rng.choice(RESOLUTIONS)
+            video = os.path.join(folder, "background.mp4")
+            open(video, 'wb').close()
+            store_probe_result(video, {
+                'duration': rng.uniform(5, 60), 'bit_rate': None, 'tags': {},
+                'video': {'codec': 'h264', 'width': w, 'height': h, 'fps': fps, 'bit_rate': None},
+                'audio': None,
+            })
+
+        for t in range(rng.randint(*tracks)):
+            track = os.path.join(folder, f"{t + 1:02d} Track.mp3")
+            open(track, 'wb').close()
+            store_probe_result(track, {
+                'duration': rng.uniform(*track_seconds), 'bit_rate': 192000, 'tags': {},
+                'video': None,
+                'audio': {'codec': 'mp3', 'sample_rate': 44100, 'channels': 2, 'bit_rate': 192000},
+            })
+    flush_probe_cache()
+
+def makespan(costs, workers):
+    """Finish time of `workers` slots taking jobs in the given order."""
+    slots = [0.0] * max(workers, 1)
+    for cost in costs:
+        heapq.heappush(slots, heapq.heappop(slots) + cost)
+    return max(slots)
+
+def run_benchmark(folders=10000, workers=8, seconds=10.0, mode='batch', nodes=2, failure_rate=0.0,
+                  jitter=0.2, seed=1, gpu_encoder='libx264', profiles_path=None, keep=False, work_root=None,
+                  out=None):
+    """Runs one synthetic batch and returns a dict of results."""
+    from src.backends import SimulatedBackend
+
+    out = out or sys.stdout
+    # Recorded speeds are read before the data dir is redirected below
+    profiles = SimulatedBackend.from_history(profiles_path).profiles if profiles_path else {}
+
+    if work_root is None and os.path.isdir("/dev/shm"):
+        # Tens of thousands of empty files: keep them off the real disk
+        work_root = "/dev/shm"
+    work_dir = tempfile.mkdtemp(prefix="loopvideo-sim-", dir=work_root)
+    # Probe cache, speed history and queue of the run stay out of the user's
+    os.environ['LOOPVIDEO_DATA_DIR'] = os.path.join(work_dir, "data")
+    batch_root = os.path.join(work_dir, "batch")
+    output_root = os.path.join(work_dir, "output")
+    os.makedirs(output_root)
+
+    try:
+        t0 = time.monotonic()
+        build_synthetic_batch(batch_root, folders, seed=seed)
+        setup_seconds = time.monotonic() - t0
+
+        from src.planner import inspect_project, plan_batch
+        # Queue workers render one folder at a time each
+        slots = nodes if mode == 'worker' else workers
+        projects = [inspect_project(entry.path) for entry in os.scandir(batch_root) if entry.is_dir()]
+        ordered, planned = plan_batch(projects, gpu_encoder, 1, False, workers=slots)
+        fifo = makespan([p['est_seconds'] for p in sorted(projects, key=lambda p: p['name'])], slots)
+
+        # Compress the planned makespan into roughly `seconds` of wall time
+        time_scale = max(planned / max(seconds, 0.1), 1.0)
+        backend = SimulatedBackend(profiles=profiles, time_scale=time_scale, jitter=jitter,
+                                   failure_rate=failure_rate, seed=seed)
+        settings = {
+            'mode': mode,
+            'batch_root': batch_root,
+            'output_path': output_root,
+            'gpu_encoder': gpu_encoder,
+            'batch_workers': workers,
+            'audio_cache': False,
+            'speed_history': False,
+            'verify_outputs': False,
+            'embed_chapters': False,
+            # Short leases: idle nodes poll the queue every lease / 4 seconds
+            'lease_seconds': 4,
+        }
+        print(f"Synthetic batch: {folders} folders in {setup_seconds:.1f}s; "
+              f"planned makespan {planned / 3600:.1f}h (input order {fifo / 3600:.1f}h), "
+              f"time scale {time_scale:.0f}x", file=out)
+
+        result = _run_threads(settings, backend, nodes if mode == 'worker' else 1)
+        wall = result['wall']
+        # Replaying the encodes in the order they were started gives the
+        # schedule's makespan without this process's own overhead
+        simulated = makespan(backend.encode_seconds, slots)
+        result.update({
+            'folders': folders,
+            'planned_makespan': planned,
+            'fifo_makespan': fifo,
+            'simulated_makespan': simulated,
+            'wall_makespan': wall * time_scale,
+            'time_scale': time_scale,
+            'encodes': backend.started,
+            'injected_failures': backend.failed,
+        })
+        print(f"Ran {backend.started} simulated encodes ({backend.failed} failing) in {wall:.1f}s "
+              f"= {backend.started / max(wall, 1e-6):.0f}/s", file=out)
+        print(f"Simulated makespan {simulated / 3600:.1f}h vs planned {planned / 3600:.1f}h "
+              f"({(simulated / planned - 1) * 100 if planned else 0:+.1f}%); "
+              f"wall clock x scale {wall * time_scale / 3600:.1f}h", file=out)
+        print(f"Progress snapshots published: {result['snapshots']}", file=out)
+        for message in result['messages']:
+            print(f"  {message}", file=out)
+        return result
+    finally:
+        if keep:
+            print(f"Kept benchmark files in {work_dir}", file=out)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def _run_threads(settings, backend, nodes):
+    """Runs one RenderThread (batch) or `nodes` queue workers, synchronously."""
+    from src.processor import RenderThread
+
+    messages = []
+    snapshots = [0]
+    threads = []
+    for n in range(nodes):
+        node_settings = dict(settings, worker_id=f"sim-{n + 1}")
+        thread = RenderThread(node_settings, backend=backend)
+        thread.finished.connect(lambda ok, msg: messages.append(msg))
+        thread.progress_snapshot.connect(lambda snap: snapshots.__setitem__(0, snapshots[0] + 1))
+        threads.append(thread)
+
+    started = time.monotonic()
+    # run() directly: no Qt event loop is needed for direct signal delivery
+    runners = [threading.Thread(target=t.run, name=f"sim-node-{n + 1}") for n, t in enumerate(threads)]
+    for runner in runners:
+        runner.start()
+    for runner in runners:
+        runner.join()
+    wall = time.monotonic() - started
+
+    return {'wall': wall, 'snapshots': snapshots[0], 'messages': messages}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.simulate",
+                                     description="Benchmark batch scheduling against simulated ffmpeg runs.")
+    parser.add_argument("--folders", type=int, default=10000, help="Synthetic batch size (default: 10000)")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel encodes in --mode batch (default: 8)")
+    parser.add_argument("--seconds", type=float, default=10.0,
+                        help="Wall-clock time the planned batch is compressed into (default: 10)")
+    parser.add_argument("--mode", choices=['batch', 'worker'], default='batch',
+                        help="Local worker pool, or nodes sharing the SQLite work queue")
+    parser.add_argument("--nodes", type=int, default=2, help="Queue workers in --mode worker, one folder each at a time (default: 2)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of encodes that fail part way")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Log-normal sigma of the encode speed")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--encoder", default='libx264', help="Encoder whose speed profile is simulated")
+    parser.add_argument("--profiles", metavar="FILE",
+                        help="speed_history.json whose recorded speeds drive the simulation")
+    parser.add_argument("--dir", help="Where to create the synthetic batch (default: /dev/shm or the temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic batch and outputs")
+    args = parser.parse_args(argv)
+
+    run_benchmark(args.folders, args.workers, args.seconds, args.mode, args.nodes, args.fail_rate,
+                  args.jitter, args.seed, args.encoder, args.profiles, args.keep, args.dir)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import os
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils import VIDEO_EXTS, content_digest, content_fingerprint, register_copy, unregister_copy
+
+MODES = ('off', 'auto', 'always')
+# Folders whose inputs are copied ahead of the ones rendering
+DEFAULT_DEPTH = 2
+# Parallel copies from the share
+COPY_WORKERS = 2
+# Background videos up to this size stay local (and in the page cache) for
+# the whole batch: -stream_loop rereads the clip on every loop, and other
+# folders often use the same one
+PIN_MAX_BYTES = 512 * 1024 * 1024
+
+# Filesystem types (/proc/self/mounts) that 'auto' stages from
+NETWORK_FILESYSTEMS = (
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afs', 'ncpfs', '9p', 'davfs', 'glusterfs', 'ceph', 'lustre',
+    'fuse.sshfs', 'fuse.rclone', 'fuse.glusterfs', 'fuse.cephfs',
+)
+
+def read_mounts(path="/proc/self/mounts"):
+    """(mount point, filesystem type) pairs, longest mount point first; empty if unknown."""
+    mounts = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3:
+                    # Spaces and tabs in mount points are octal escapes
+                    point = parts[1].encode().decode('unicode_escape')
+                    mounts.append((point, parts[2]))
+    except OSError:
+        pass
+    return sorted(mounts, key=lambda m: len(m[0]), reverse=True)
+
+def is_network_path(path, mounts=None):
+    """True if path lives on a network share (SMB/NFS/...) as far as the OS tells."""
+    path = os.path.abspath(path)
+    if os.name == 'nt':
+        if path.startswith('\\\\'):
+            return True
+        try:
+            import ctypes
+            DRIVE_REMOTE = 4
+            return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + '\\') == DRIVE_REMOTE
+        except (AttributeError, OSError):
+            return False
+    for point, fstype in (read_mounts() if mounts is None else mounts):
+        if path == point or path.startswith(point.rstrip('/') + '/'):
+            return fstype in NETWORK_FILESYSTEMS
+    return False
+
+def _cache_hint(path):
+    """Asks the kernel to read the file into the page cache ahead of use."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+class InputStager:
+    """
+    Read-ahead staging of batch inputs: while folders render, the inputs of
+    the next `depth` folders are copied from the share into a local dir, so
+    the encodes read local disk instead of the network.
+
+    Copies are shared by content, so a clip that many folders carry is
+    copied once; the copies keep their file names. Files are matched by
+    content_fingerprint and the match confirmed with a full content_digest. Small
+    background videos are pinned until close(), everything else is deleted
+    once no acquired or prefetched folder uses it. A file that cannot be
+    staged (not on a share in 'auto' mode, not enough local space, read
+    error) is simply used from where it is.
+    """
+
+    def __init__(self, root, mode='auto', depth=DEFAULT_DEPTH, reserve_bytes=0, workers=COPY_WORKERS):
+        self.root = root
+        self.mode = mode
+        self.depth = max(int(depth), 0)
+        self.reserve_bytes = reserve_bytes
+        self.copied = 0
+        self.copied_bytes = 0
+        self.reused = 0
+        self._mounts = read_mounts()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage")
+        self._lock = threading.Lock()
+        self._order = []        # projects, planned order
+        self._positions = {}    # name -> index in _order
+        self._next = 0          # index of the next project to prefetch
+        self._projects = {}     # name -> {original path: future of the staged path (or None)}
+        self._released = set()
+        self._blobs = {}        # fingerprint -> {'dir', 'ready', 'refs', 'pinned', 'links'}
+        self._pending_bytes = 0
+
+    def plan(self, projects):
+        """Sets the batch order and starts on the first folders."""
+        self._order = list(projects)
+        self._positions = {p['name']: i for i, p in enumerate(self._order)}
+        self._prefetch(self.depth)
+
+    # === FOLDERS ===
+    def acquire(self, project, on_wait=None):
+        """
+        The project with its video and audio paths pointing at the staged
+        copies, once they are there. Also moves the read-ahead window on.
+        on_wait() is called once if the copies are still in progress.
+        """
+        self._schedule(project)
+        self._prefetch(self._positions.get(project['name'], -1) + 1 + self.depth)
+
+        futures = self._projects[project['name']]
+        if on_wait and not all(f.done() for f in futures.values()):
+            on_wait()
+        local = {path: future.result() or path for path, future in futures.items()}
+        staged = dict(project)
+        if project['video_path']:
+            staged['video_path'] = local[project['video_path']]
+        staged['audio_paths'] = [local[p] for p in project['audio_paths']]
+        return staged
+
+    def release(self, project):
+        """The folder is done: its copies go unless another folder needs them."""
+        with self._lock:
+            futures = self._projects.pop(project['name'], None)
+            self._released.add(project['name'])
+        for future in (futures or {}).values():
+            staged = future.result()
+            if staged:
+                self._unref(os.path.basename(os.path.dirname(staged)))
+
+    def close(self):
+        """Stops copying and deletes every staged file."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for blob in self._blobs.values():
+                for link in blob['links'].values():
+                    unregister_copy(link)
+            self._blobs.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _prefetch(self, until):
+        while True:
+            with self._lock:
+                if self._next >= min(until, len(self._order)):
+                    return
+                project = self._order[self._next]
+                self._next += 1
+            self._schedule(project)
+
+    def _schedule(self, project):
+        with self._lock:
+            if project['name'] in self._projects or project['name'] in self._released:
+                return
+            paths = ([project['video_path']] if project['video_path'] else []) + project['audio_paths']
+            futures = {}
+            for path in dict.fromkeys(paths):
+                futures[path] = self._pool.submit(self._stage, path)
+            self._projects[project['name']] = futures
+
+    # === FILES ===
+    def _stage(self, path):
+        """Local copy of path (shared with identical files), or None to use path itself."""
+        try:
+            if self.mode != 'always' and not is_network_path(path, self._mounts):
+                return None
+            fingerprint = content_fingerprint(path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logging.warning(f"Cannot stage {path}: {e}")
+            return None
+
+        with self._lock:
+            blob = self._blobs.get(fingerprint)
+            owner = blob is None
+            if owner:
+                if not self._fits(size):
+                    return None
+                self._pending_bytes += size
+                blob = {
+                    'dir': os.path.join(self.root, fingerprint), 'ready': threading.Event(), 'ok': False,
+                    'digest': None, 'refs': 0, 'links': {},
+                    'pinned': path.lower().endswith(VIDEO_EXTS) and size <= PIN_MAX_BYTES,
+                }
+                self._blobs[fingerprint] = blob
+            blob['refs'] += 1
+
+        if owner:
+            try:
+                self._copy(path, blob)
+                blob['ok'] = True
+            except OSError as e:
+                logging.warning(f"Cannot stage {path}: {e}")
+            finally:
+                with self._lock:
+                    self._pending_bytes -= size
+                blob['ready'].set()
+        blob['ready'].wait()
+        if not blob['ok']:
+            self._unref(fingerprint)
+            return None
+        if not owner:
+            # The sampled fingerprint only makes a match likely
+            try:
+                same = content_digest(path) == blob['digest']
+                if not same:
+                    logging.warning(f"Not staging {path}: differs from a staged file with the same fingerprint")
+            except OSError as e:
+                logging.warning(f"Cannot stage {path}: {e}")
+                same = False
+            if not same:
+                self._unref(fingerprint)
+                return None
+            with self._lock:
+                self.reused += 1
+
+        name = os.path.basename(path)
+        with self._lock:
+            link = blob['links'].get(name)
+            if link is None:
+                # The same content under another name: a hard link to the copy
+                link = os.path.join(blob['dir'], name)
+                try:
+                    source = next(iter(blob['links'].values()))
+                    try:
+                        os.link(source, link)
+                    except OSError:
+                        shutil.copy2(source, link)
+                    register_copy(link, path)
+                    blob['links'][name] = link
+                except OSError as e:
+                    logging.warning(f"Cannot stage {path}: {e}")
+                    link = None
+        if link is None:
+            self._unref(fingerprint)
+        return link
+
+    def _fits(self, size):
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            free = shutil.disk_usage(self.root).free
+        except OSError:
+            return False
+        return free - self._pending_bytes - size >= self.reserve_bytes
+
+    def _copy(self, path, blob):
+        os.makedirs(blob['dir'], exist_ok=True)
+        target = os.path.join(blob['dir'], os.path.basename(path))
+        tmp = target + ".part"
+        # copy2 keeps the mtime, and uses the kernel's copy offload where it can
+        shutil.copy2(path, tmp)
+        os.replace(tmp, target)
+        register_copy(target, path)
+        # Hashed from the local copy; cached for the original as well
+        blob['digest'] = content_digest(target)
+        if blob['pinned']:
+            _cache_hint(target)
+        with self._lock:
+            blob['links'][os.path.basename(path)] = target
+            self.copied += 1
+            self.copied_bytes += os.path.getsize(target)
+
+    def _unref(self, fingerprint):
+        with self._lock:
+            blob = self._blobs.get(fingerprint)
+            if blob is None:
+                return
+            blob['refs'] -= 1
+            if blob['refs'] > 0 or blob['pinned']:
+                return
+            del self._blobs[fingerprint]
+            for link in blob['links'].values():
+                unregister_copy(link)
+            shutil.rmtree(blob['dir'], ignore_errors=True)
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import logging
+
+# Time from process start to an interactive window. Frozen onefile builds
+# spend part of this unpacking before Python even runs.
+STARTUP_BUDGET_MS = 800
+
+def _process_age(pid):
+    """Seconds since the process started, or None where the OS does not tell."""
+    if sys.platform.startswith('linux'):
+        try:
+            with open(f"/proc/{pid}/stat", 'r') as f:
+                text = f.read()
+            with open("/proc/uptime", 'r') as f:
+                uptime = float(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+        # starttime (field 22) counts clock ticks since boot; the command
+        # name may contain spaces, so fields start after its ')'
+        fields = text[text.rfind(')') + 2:].split()
+        try:
+            return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        except (IndexError, ValueError, OSError):
+            return None
+    if os.name == 'nt':
+        try:
+            import ctypes
+            from ctypes import wintypes
+            PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+            if not handle:
+                return None
+            try:
+                created, exited, kernel, user = (wintypes.FILETIME() for _ in range(4))
+                if not kernel32.GetProcessTimes(handle, ctypes.byref(created), ctypes.byref(exited),
+                                                ctypes.byref(kernel), ctypes.byref(user)):
+                    return None
+            finally:
+                kernel32.CloseHandle(handle)
+            now = wintypes.FILETIME()
+            kernel32.GetSystemTimePreciseAsFileTime(ctypes.byref(now))
+            ticks = lambda ft: (ft.dwHighDateTime << 32) | ft.dwLowDateTime
+            return (ticks(now) - ticks(created)) / 1e7
+        except (AttributeError, OSError):
+            return None
+    return None
+
+def _launch_age():
+    """
+    Seconds since the app was launched: the start of this process, or of
+    the bootloader that unpacked a PyInstaller onefile build and started
+    it. None if unknown (e.g. macOS), then timings start at this import.
+    """
+    meipass = getattr(sys, '_MEIPASS', None)
+    onefile = getattr(sys, 'frozen', False) and meipass and \
+        os.path.normcase(os.path.dirname(os.path.abspath(sys.executable))) != os.path.normcase(meipass)
+    age = _process_age(os.getppid() if onefile else os.getpid())
+    if age is None or age < 0:
+        return None
+    return age
+
+_age = _launch_age()
+_t0 = time.perf_counter() - (_age or 0.0)
+# What the timings count from, for the log
+ORIGIN = "process start" if _age is not None else "startup import"
+_marks = []
+
+def mark(name):
+    """Records a startup phase (milliseconds since launch, see ORIGIN)."""
+    _marks.append((name, (time.perf_counter() - _t0) * 1000))
+
+def finish():
+    """
+    Called once the event loop is running. Logs the phase timings and
+    warns when the budget is exceeded; LOOPVIDEO_STARTUP_TRACE=1 prints
+    them to stderr as well.
+    """
+    mark("interactive")
+    total = _marks[-1][1]
+    phases = ", ".join(f"{name} {ms:.0f}ms" for name, ms in _marks)
+    log = logging.getLogger(__name__)
+    if total > STARTUP_BUDGET_MS:
+        log.warning(f"Startup took {total:.0f}ms since {ORIGIN} (budget {STARTUP_BUDGET_MS}ms): {phases}")
+    else:
+        log.info(f"Startup took {total:.0f}ms since {ORIGIN}: {phases}")
+    if os.environ.get("LOOPVIDEO_STARTUP_TRACE"):
+        print(f"startup (since {ORIGIN}): {phases}", file=sys.stderr)
+    return total
@@ -1,16 +1,17 @@
 
 import os
+import threading
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QPushButton, QListWidget, QLabel, QFileDialog, 
     QMessageBox, QProgressBar, QAbstractItemView,
     QFrame, QComboBox, QCheckBox, QTabWidget, QLineEdit, QSpinBox,
-    QSizePolicy, QGridLayout, QStyleOption, QStyle
+    QSizePolicy, QGridLayout, QStyleOption, QStyle,
+    QTableWidget, QTableWidgetItem, QHeaderView
 )
-from PySide6.QtCore import Qt, QMimeData, Signal, QSize
-from PySide6.QtGui import QDragEnterEvent, QDropEvent, QFont, QPainter, QColor, QPen, QIcon
-from src.utils import detect_gpu
-from src.processor import RenderThread
+from PySide6.QtCore import Qt, QMimeData, Signal, QSize, QUrl, QTimer
+from PySide6.QtGui import QDragEnterEvent, QDropEvent, QFont, QPainter, QColor, QPen, QIcon, QDesktopServices
+from src.utils import detect_gpu, cached_gpu, store_gpu
 
 # === MATERIAL DESIGN STYLESHEET ===
 STYLESHEET = """
@@ -331,6 +332,8 @@ class DropLineEdit(QLineEdit):
             super().dropEvent(event)
 
 class MainWindow(QMainWindow):
+    encoder_detected = Signal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Loop Video Playlist Generator")
@@ -358,6 +361,9 @@ class MainWindow(QMainWindow):
         # Single Mode Data
         self.video_path = None
         self.audio_files = []
+
+        # Renders submitted while another one is running
+        self.pending_renders = []
         
         # UI Setup
         central_widget = QWidget()
@@ -424,8 +430,26 @@ class MainWindow(QMainWindow):
         self.spin_repeat.setValue(1)
         self.chk_separate.stateChanged.connect(self.toggle_repeat_input)
         
+        self.spin_crossfade = QSpinBox()
+        self.spin_crossfade.setRange(0, 15)
+        self.spin_crossfade.setPrefix("Crossfade: ")
+        self.spin_crossfade.setSuffix("s")
+        self.spin_crossfade.setSpecialValueText("Crossfade: Off")
+        self.spin_crossfade.setToolTip("Overlap consecutive tracks by this many seconds (combined output only).")
+        
+        self.chk_dry_run = QCheckBox("Dry Run (Plan Only)")
+        self.chk_dry_run.setCursor(Qt.PointingHandCursor)
+        self.chk_dry_run.setToolTip("Scan and probe inputs, then report ffmpeg commands, durations and disk usage without encoding.")
+        
+        self.chk_normalize = QCheckBox("Normalize Loudness (EBU R128)")
+        self.chk_normalize.setCursor(Qt.PointingHandCursor)
+        self.chk_normalize.setToolTip("Measure each track once (cached) and level all tracks to -16 LUFS before joining them.")
+        
         opts_layout.addWidget(self.chk_separate)
         opts_layout.addWidget(self.spin_repeat)
+        opts_layout.addWidget(self.spin_crossfade)
+        opts_layout.addWidget(self.chk_normalize)
+        opts_layout.addWidget(self.chk_dry_run)
         grid.addLayout(opts_layout, 1, 1)
         
         settings_layout.addLayout(grid)
@@ -437,7 +461,36 @@ class MainWindow(QMainWindow):
         self.btn_render.setMinimumHeight(44)
         self.btn_render.setCursor(Qt.PointingHandCursor)
         self.btn_render.clicked.connect(self.start_render)
-        settings_layout.addWidget(self.btn_render)
+
+        # Quick low-res check of order, transitions and background
+        self.btn_preview = QPushButton("Preview")
+        self.btn_preview.setObjectName("tool")
+        self.btn_preview.setMinimumHeight(44)
+        self.btn_preview.setCursor(Qt.PointingHandCursor)
+        self.btn_preview.setToolTip("Render a small, low-fps preview of the first seconds of every track and every transition, then open it.")
+        self.btn_preview.clicked.connect(lambda: self.start_render(preview=True))
+
+        # Job Control (visible while rendering)
+        self.btn_pause = QPushButton("Pause")
+        self.btn_pause.setObjectName("tool")
+        self.btn_pause.setMinimumHeight(44)
+        self.btn_pause.setCursor(Qt.PointingHandCursor)
+        self.btn_pause.clicked.connect(self.toggle_pause)
+        self.btn_pause.setVisible(False)
+
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setObjectName("tool")
+        self.btn_cancel.setMinimumHeight(44)
+        self.btn_cancel.setCursor(Qt.PointingHandCursor)
+        self.btn_cancel.clicked.connect(self.cancel_render)
+        self.btn_cancel.setVisible(False)
+
+        render_row = QHBoxLayout()
+        render_row.addWidget(self.btn_render, 1)
+        render_row.addWidget(self.btn_preview)
+        render_row.addWidget(self.btn_pause)
+        render_row.addWidget(self.btn_cancel)
+        settings_layout.addLayout(render_row)
         
         # Progress Bars (No Text Label)
         progress_layout = QVBoxLayout()
@@ -448,6 +501,17 @@ class MainWindow(QMainWindow):
         progress_layout.addWidget(self.bar_current)
         progress_layout.addWidget(self.bar_batch)
         
+        # Active renders (parallel batch): one row per running job
+        self.table_jobs = QTableWidget(0, 3)
+        self.table_jobs.setHorizontalHeaderLabels(["Render", "Progress", "ETA"])
+        self.table_jobs.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table_jobs.verticalHeader().setVisible(False)
+        self.table_jobs.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table_jobs.setSelectionMode(QAbstractItemView.NoSelection)
+        self.table_jobs.setMaximumHeight(140)
+        self.table_jobs.setVisible(False)
+        progress_layout.addWidget(self.table_jobs)
+        
         settings_layout.addLayout(progress_layout)
         
         main_layout.addWidget(settings_card)
@@ -455,9 +519,35 @@ class MainWindow(QMainWindow):
         # Initial Logic
         self.list_audio.files_dropped.connect(self.add_audio_files)
         self.list_audio.video_dropped.connect(self.set_video)
-        self.detected_encoder = detect_gpu()
+        # Last known encoder now, fresh detection in the background
+        cached_encoder = cached_gpu()
+        self.detected_encoder = cached_encoder or "libx264"
+        self.encoder_detected.connect(self.on_encoder_detected)
+        threading.Thread(target=self.detect_encoder, daemon=True).start()
         self.status_bar = self.statusBar() # Keep status bar for small logs
-        self.status_bar.showMessage(f"System ready. GPU: {self.detected_encoder}")
+        self.lbl_eta = QLabel("")
+        self.lbl_eta.setObjectName("caption")
+        self.status_bar.addPermanentWidget(self.lbl_eta)
+        if cached_encoder:
+            self.status_bar.showMessage(f"System ready. GPU: {self.detected_encoder}")
+        else:
+            self.status_bar.showMessage("System ready. Detecting GPU...")
+
+    def detect_encoder(self):
+        """Runs on a background thread; WMI needs COM set up there."""
+        try:
+            import pythoncom
+            pythoncom.CoInitialize()
+        except ImportError:
+            pass
+        encoder = detect_gpu()
+        store_gpu(encoder)
+        self.encoder_detected.emit(encoder)
+
+    def on_encoder_detected(self, encoder):
+        self.detected_encoder = encoder
+        if not self.is_rendering():
+            self.status_bar.showMessage(f"System ready. GPU: {encoder}")
 
 
     def init_single_tab(self):
@@ -567,6 +657,29 @@ class MainWindow(QMainWindow):
         batch_input_layout.addWidget(btn_browse)
         
         b_layout.addLayout(batch_input_layout)
+
+        # Parallel renders (largest folders are scheduled first)
+        workers_layout = QHBoxLayout()
+        lbl_workers = QLabel("Parallel Renders")
+        lbl_workers.setObjectName("caption")
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setRange(1, max(os.cpu_count() or 1, 1))
+        self.spin_workers.setSuffix(" at once")
+        self.spin_workers.setValue(1)
+        self.chk_adaptive_workers = QCheckBox("Adapt to Load")
+        self.chk_adaptive_workers.setCursor(Qt.PointingHandCursor)
+        self.chk_adaptive_workers.setToolTip("Start with this many renders, then run more or fewer at once as CPU, memory and disk load allow (Linux).")
+        workers_layout.addWidget(lbl_workers)
+        workers_layout.addWidget(self.spin_workers)
+        workers_layout.addWidget(self.chk_adaptive_workers)
+        workers_layout.addStretch()
+        b_layout.addLayout(workers_layout)
+
+        self.chk_stage_inputs = QCheckBox("Copy Network Inputs Locally")
+        self.chk_stage_inputs.setCursor(Qt.PointingHandCursor)
+        self.chk_stage_inputs.setToolTip("For batch roots on SMB/NFS shares: copy the next folders' audio and videos to local scratch while the current ones render.")
+        b_layout.addWidget(self.chk_stage_inputs)
+
         b_layout.addStretch()
         
         layout.addWidget(card_batch)
@@ -651,8 +764,9 @@ class MainWindow(QMainWindow):
     def toggle_repeat_input(self):
         is_separate = self.chk_separate.isChecked()
         self.spin_repeat.setDisabled(is_separate)
+        self.spin_crossfade.setDisabled(is_separate)
         
-    def start_render(self):
+    def start_render(self, preview=False):
         current_tab_index = self.tabs.currentIndex()
         settings = {}
         
@@ -670,7 +784,11 @@ class MainWindow(QMainWindow):
         common_settings = {
             "gpu_encoder": encoder,
             "separate_files": sep_files,
-            "playlist_repeat": self.spin_repeat.value()
+            "playlist_repeat": self.spin_repeat.value(),
+            "crossfade_seconds": self.spin_crossfade.value(),
+            "normalize_loudness": self.chk_normalize.isChecked(),
+            "dry_run": self.chk_dry_run.isChecked(),
+            "preview": bool(preview)
         }
         
         if current_tab_index == 0:
@@ -766,38 +884,159 @@ class MainWindow(QMainWindow):
             settings["mode"] = "batch"
             settings["batch_root"] = batch_root
             settings["output_path"] = out_path
+            settings["batch_workers"] = self.spin_workers.value()
+            settings["adaptive_workers"] = self.chk_adaptive_workers.isChecked()
+            if self.chk_stage_inputs.isChecked():
+                settings["stage_inputs"] = "auto"
+
+        # Busy: queue behind the running render instead of refusing
+        if self.is_rendering():
+            self.pending_renders.append(settings)
+            self.status_bar.showMessage(f"Queued. {len(self.pending_renders)} render(s) waiting.")
+            return
+
+        self.launch_render(settings)
+
+    def is_rendering(self):
+        thread = getattr(self, 'thread', None)
+        return bool(thread and thread.isRunning())
+
+    def launch_render(self, settings):
+        # Imported on first render, not at startup
+        from src.processor import RenderThread
 
         self.thread = RenderThread(settings)
         self.thread.progress_update.connect(self.update_progress_text)
         self.thread.progress_value.connect(self.bar_current.setValue) 
         self.thread.progress_batch.connect(self.bar_batch.setValue)
+        self.thread.eta_update.connect(self.lbl_eta.setText)
+        self.thread.progress_snapshot.connect(self.update_job_table)
         self.thread.finished.connect(self.render_finished)
         
-        self.btn_render.setEnabled(False)
-        self.btn_render.setText("RENDERING...")
+        # The button stays usable to queue further renders
+        self.btn_render.setText("ADD TO QUEUE")
+        self.btn_pause.setText("Pause")
+        self.btn_pause.setVisible(not settings.get("dry_run"))
+        self.btn_cancel.setEnabled(True)
+        self.btn_cancel.setVisible(True)
         self.bar_current.setVisible(True)
         self.bar_current.setValue(0)
         this_green = "#0F9D58"
         self.bar_current.setStyleSheet(f"QProgressBar::chunk {{ background-color: {this_green}; }}")
         
-        if current_tab_index == 1: 
+        if settings.get("dry_run"):
+            self.status_bar.showMessage("Planning...")
+        else:
+            self.status_bar.showMessage("Rendering preview..." if settings.get("preview") else "Rendering...")
+        
+        if settings.get("mode") == "batch": 
             self.bar_batch.setVisible(True)
             self.bar_batch.setValue(0)
         else:
             self.bar_batch.setVisible(False)
+        self.table_jobs.setRowCount(0)
+        self.table_jobs.setVisible(settings.get("mode") == "batch" and settings.get("batch_workers", 1) > 1)
             
         self.thread.start()
 
     def update_progress_text(self, msg):
         self.status_bar.showMessage(msg)
 
+    def update_job_table(self, snapshot):
+        """Shows the running jobs of a progress snapshot (a few per second at most)."""
+        if not self.table_jobs.isVisible():
+            return
+        jobs = snapshot['jobs']
+        self.table_jobs.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            for col, text in enumerate((job['label'], f"{job['percent']}%", job['eta'] or "")):
+                item = self.table_jobs.item(row, col)
+                if item is None:
+                    self.table_jobs.setItem(row, col, QTableWidgetItem(text))
+                else:
+                    item.setText(text)
+
+    def toggle_pause(self):
+        if not getattr(self, 'thread', None):
+            return
+        if self.thread.is_paused:
+            self.thread.resume()
+            self.btn_pause.setText("Pause")
+        else:
+            self.thread.pause()
+            self.btn_pause.setText("Resume")
+
+    def cancel_render(self):
+        if not getattr(self, 'thread', None):
+            return
+        self.btn_cancel.setEnabled(False)
+        self.btn_pause.setVisible(False)
+        self.status_bar.showMessage("Cancelling... stopping ffmpeg")
+        self.thread.cancel()
+
+    def closeEvent(self, event):
+        # Never leave ffmpeg children running after the window is gone
+        thread = getattr(self, 'thread', None)
+        if thread and thread.isRunning():
+            thread.cancel()
+            if not thread.wait(15000):
+                # Destroying a running QThread aborts the process
+                self.status_bar.showMessage("Still stopping the render... close again in a moment")
+                event.ignore()
+                return
+        super().closeEvent(event)
+
+    def open_previews(self, thread):
+        """Opens a finished preview in the default player (a batch's in its folder)."""
+        paths = thread.preview_paths
+        if not paths or thread.dry_run:
+            return
+        target = paths[0]
+        if len(paths) > 1:
+            # Batch: the output folder (previews of separate-file renders sit one level deeper)
+            target = os.path.dirname(paths[0])
+            if thread.settings.get("separate_files"):
+                target = os.path.dirname(target)
+        QDesktopServices.openUrl(QUrl.fromLocalFile(target))
+
     def render_finished(self, success, message):
+        # Emitted from run() before its cleanup (verifier, scratch dir):
+        # the thread must not be replaced, nor the queue advanced, before
+        # it has really ended
+        self._render_result = (success, message)
+        self._after_render()
+
+    def _after_render(self):
+        if self.thread.isRunning():
+            QTimer.singleShot(50, self._after_render)
+            return
+        success, message = self._render_result
+        cancelled = self.thread.cancelled
+        if success:
+            self.open_previews(self.thread)
+        if cancelled:
+            # Cancel stops everything, including what was queued
+            self.pending_renders.clear()
+        if self.pending_renders:
+            # Start the next queued render before reporting this one
+            self.launch_render(self.pending_renders.pop(0))
+            self.status_bar.showMessage(message)
+            if not success and not cancelled:
+                QMessageBox.critical(self, "Error", message)
+            return
+
         self.btn_render.setEnabled(True)
         self.btn_render.setText("RENDER VIDEO")
+        self.btn_pause.setVisible(False)
+        self.btn_cancel.setVisible(False)
         self.bar_current.setVisible(False)
         self.bar_batch.setVisible(False)
+        self.table_jobs.setVisible(False)
+        self.lbl_eta.setText("")
         self.status_bar.showMessage("Ready")
-        if success:
+        if cancelled:
+            self.status_bar.showMessage(message)
+        elif success:
             QMessageBox.information(self, "Success", message)
         else:
             QMessageBox.critical(self, "Error", message)
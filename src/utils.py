@@ -1,8 +1,25 @@
+import os
 import shutil
 import subprocess
 import json
 import logging
 import platform
+import threading
+import atexit
+import functools
+import hashlib
+
+from src.metrics import registry as metrics
+
+log = logging.getLogger(__name__)
+
+APP_NAME = "LoopVideoGenerator"
+
+VIDEO_EXTS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+AUDIO_EXTS = ('.mp3', '.wav', '.aac', '.m4a', '.flac', '.ogg')
+
+# Bump when the shape of probe results changes to invalidate old cache files
+PROBE_CACHE_VERSION = 1
 
 def get_ffmpeg_path():
     """Check if ffmpeg is available in system PATH."""
@@ -12,30 +29,304 @@ def get_ffprobe_path():
     """Check if ffprobe is available in system PATH."""
     return shutil.which("ffprobe")
 
-def get_media_duration(file_path):
+def get_app_data_dir(*parts):
     """
-    Get the duration of a media file using ffprobe.
-    Returns float duration in seconds, or None if failed.
+    Returns (and creates) the per-user data directory used for caches.
+    Extra path parts are joined onto it, e.g. get_app_data_dir("audio_cache").
+    LOOPVIDEO_DATA_DIR replaces the whole location (benchmarks, tests).
+    """
+    override = os.environ.get("LOOPVIDEO_DATA_DIR")
+    if override:
+        path = os.path.join(override, *parts)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    system = platform.system()
+    if system == "Windows":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif system == "Darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+
+    path = os.path.join(base, APP_NAME, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+# Local copies of inputs (src.staging) -> identity of their original, so
+# probe results, analyses and cache keys carry over to the copy
+_copy_identities = {}
+
+def get_file_identity(file_path):
+    """
+    Cheap identity of a file on disk: (absolute path, size, mtime_ns).
+    Changes whenever the file is replaced or edited.
+    """
+    st = os.stat(file_path)
+    path = os.path.abspath(file_path)
+    identity = (path, st.st_size, st.st_mtime_ns)
+    copied = _copy_identities.get(path)
+    if copied and copied[0] == identity:
+        return copied[1]
+    return identity
+
+def register_copy(copy_path, original_path):
+    """Makes a copy share its original's identity for as long as it is left unmodified."""
+    _copy_identities.pop(os.path.abspath(copy_path), None)
+    _copy_identities[os.path.abspath(copy_path)] = (get_file_identity(copy_path), get_file_identity(original_path))
+
+def unregister_copy(copy_path):
+    _copy_identities.pop(os.path.abspath(copy_path), None)
+
+# Bytes hashed at each sample point of content_fingerprint()
+FINGERPRINT_SAMPLE_BYTES = 64 * 1024
+
+def content_fingerprint(file_path, samples=3):
+    """
+    Identifies a file by content without reading all of it: its size plus
+    a hash of `samples` evenly spaced blocks (start and end included).
+    Byte-identical copies in different places get the same fingerprint, but
+    files differing only between the samples do too: confirm a match with
+    content_digest() before treating two files as the same.
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        if size <= FINGERPRINT_SAMPLE_BYTES * samples:
+            digest.update(f.read())
+        else:
+            step = (size - FINGERPRINT_SAMPLE_BYTES) // (samples - 1)
+            for n in range(samples):
+                f.seek(n * step)
+                digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+    return f"{size}-{digest.hexdigest()}"
+
+def content_digest(file_path):
+    """
+    Hash of the whole file, cached under its identity (a registered copy
+    shares its original's). Reads the entire file on a cache miss.
+    """
+    cached = get_media_analysis(file_path, "digest")
+    if cached:
+        return cached
+    digest = hashlib.blake2b(digest_size=32)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    value = digest.hexdigest()
+    store_media_analysis(file_path, "digest", value)
+    return value
+
+def format_duration(seconds):
+    """Formats seconds as H:MM:SS (or M:SS under an hour) for status text."""
+    seconds = max(int(round(seconds or 0)), 0)
+    m, s = divmod(seconds, 60)
+    h, m = divmod(m, 60)
+    if h > 0:
+        return f"{h}:{m:02d}:{s:02d}"
+    return f"{m}:{s:02d}"
+
+def discover_project(folder):
+    """
+    Scans a project folder (recursively) for its media.
+    Returns (video_path, audio_paths): the first video found (or None) and
+    all audio files sorted by file name.
+    """
+    video_path = None
+    audio_paths = []
+
+    for root, dirs, files in os.walk(folder):
+        for f in files:
+            f_lower = f.lower()
+            path = os.path.join(root, f)
+            if not video_path and f_lower.endswith(VIDEO_EXTS):
+                video_path = path
+            elif f_lower.endswith(AUDIO_EXTS):
+                audio_paths.append(path)
+
+    audio_paths.sort(key=lambda p: os.path.basename(p).lower())
+    return video_path, audio_paths
+
+# === PROBE CACHE ===
+# ffprobe results keyed by file identity, kept in memory and persisted to the
+# app data dir so batch planning and re-renders skip already probed files.
+_probe_cache = None
+_probe_cache_dirty = False
+_probe_lock = threading.Lock()
+
+def _probe_cache_path():
+    return os.path.join(get_app_data_dir(), "probe_cache.json")
+
+def _load_probe_cache():
+    global _probe_cache
+    if _probe_cache is not None:
+        return _probe_cache
+
+    _probe_cache = {}
+    try:
+        with open(_probe_cache_path(), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") == PROBE_CACHE_VERSION:
+            _probe_cache = data.get("entries", {})
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning(f"Ignoring unreadable probe cache: {e}")
+    return _probe_cache
+
+def flush_probe_cache():
+    """Writes new probe results to disk (no-op when nothing changed)."""
+    global _probe_cache_dirty
+    with _probe_lock:
+        if not _probe_cache_dirty or _probe_cache is None:
+            return
+        path = _probe_cache_path()
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"version": PROBE_CACHE_VERSION, "entries": _probe_cache}, f)
+            os.replace(tmp, path)
+            _probe_cache_dirty = False
+        except OSError as e:
+            log.warning(f"Could not save probe cache: {e}")
+
+atexit.register(flush_probe_cache)
+
+def _probe_key(file_path):
+    path, size, mtime_ns = get_file_identity(file_path)
+    return f"{path}|{size}|{mtime_ns}"
+
+def _parse_rate(rate):
+    try:
+        num, den = rate.split('/')
+        return float(num) / float(den) if float(den) else None
+    except (ValueError, AttributeError):
+        return None
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def probe_media(file_path):
+    """
+    Probe a media file with ffprobe (cached by file identity).
+    Returns a dict with 'duration', 'bit_rate', 'tags' and 'video' / 'audio'
+    stream summaries (None when absent), or None if probing failed.
     """
+    try:
+        key = _probe_key(file_path)
+    except OSError as e:
+        log.error(f"Cannot access {file_path}: {e}")
+        return None
+
+    with _probe_lock:
+        cached = _load_probe_cache().get(key)
+    if cached is not None:
+        metrics.inc('loopvideo_probe_cache_hits_total')
+        return cached
+
+    metrics.inc('loopvideo_probe_cache_misses_total')
     ffprobe = get_ffprobe_path()
     if not ffprobe:
-        logging.error("ffprobe not found.")
+        log.error("ffprobe not found.")
         return None
 
     try:
         cmd = [
             ffprobe,
             "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
+            "-show_entries",
+            "format=duration,bit_rate:format_tags=title,artist:"
+            "stream=codec_type,codec_name,width,height,r_frame_rate,sample_rate,channels,bit_rate",
+            "-of", "json",
             file_path
         ]
         result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return float(result.stdout.strip())
+        data = json.loads(result.stdout)
     except Exception as e:
-        logging.error(f"Error getting duration for {file_path}: {e}")
+        log.error(f"Error probing {file_path}: {e}")
         return None
 
+    fmt = data.get("format", {})
+    info = {
+        "duration": float(fmt["duration"]) if fmt.get("duration") else None,
+        "bit_rate": _to_int(fmt.get("bit_rate")),
+        "tags": {k.lower(): v for k, v in fmt.get("tags", {}).items()},
+        "video": None,
+        "audio": None,
+    }
+    for stream in data.get("streams", []):
+        kind = stream.get("codec_type")
+        if kind == "video" and info["video"] is None:
+            info["video"] = {
+                "codec": stream.get("codec_name"),
+                "width": _to_int(stream.get("width")),
+                "height": _to_int(stream.get("height")),
+                "fps": _parse_rate(stream.get("r_frame_rate")),
+                "bit_rate": _to_int(stream.get("bit_rate")),
+            }
+        elif kind == "audio" and info["audio"] is None:
+            info["audio"] = {
+                "codec": stream.get("codec_name"),
+                "sample_rate": _to_int(stream.get("sample_rate")),
+                "channels": _to_int(stream.get("channels")),
+                "bit_rate": _to_int(stream.get("bit_rate")),
+            }
+
+    global _probe_cache_dirty
+    with _probe_lock:
+        _load_probe_cache()[key] = info
+        _probe_cache_dirty = True
+    return info
+
+def store_probe_result(file_path, info):
+    """
+    Puts a probe result into the cache as if ffprobe had returned it
+    (used by the scheduler benchmark for its synthetic media files).
+    """
+    global _probe_cache_dirty
+    key = _probe_key(file_path)
+    with _probe_lock:
+        _load_probe_cache()[key] = info
+        _probe_cache_dirty = True
+
+def get_media_analysis(file_path, name):
+    """
+    Cached result of an expensive per-file analysis (e.g. a loudness
+    measurement), stored next to the probe data under the file identity.
+    Returns None if the file changed or was never analysed.
+    """
+    try:
+        key = f"{_probe_key(file_path)}#{name}"
+    except OSError:
+        return None
+    with _probe_lock:
+        return _load_probe_cache().get(key)
+
+def store_media_analysis(file_path, name, value):
+    """Caches an analysis result for get_media_analysis()."""
+    global _probe_cache_dirty
+    try:
+        key = f"{_probe_key(file_path)}#{name}"
+    except OSError:
+        return
+    with _probe_lock:
+        _load_probe_cache()[key] = value
+        _probe_cache_dirty = True
+
+def get_media_duration(file_path):
+    """
+    Get the duration of a media file using ffprobe (cached).
+    Returns float duration in seconds, or None if failed.
+    """
+    info = probe_media(file_path)
+    if not info or info.get("duration") is None:
+        return None
+    return info["duration"]
+
+@functools.lru_cache(maxsize=1)
 def detect_gpu():
     """
     Detects available hardware acceleration methods for FFmpeg.
@@ -66,22 +357,69 @@ def detect_gpu():
                 if _check_encoder("h264_qsv"):
                     return "h264_qsv"
     except ImportError:
-        logging.warning("WMI module not found, skipping detailed GPU check.")
+        log.warning("WMI module not found, skipping detailed GPU check.")
     except Exception as e:
-        logging.error(f"GPU detection failed: {e}")
+        log.error(f"GPU detection failed: {e}")
 
     return "libx264"
 
+# === CAPABILITY CACHE ===
+# The detected encoder only changes with the ffmpeg binary (or the GPU), so
+# the desktop app can show the last result at once and re-detect in the
+# background instead of blocking startup on WMI and `ffmpeg -encoders`.
+def _capabilities_path():
+    return os.path.join(get_app_data_dir(), "capabilities.json")
+
+def _capabilities_key():
+    ffmpeg = get_ffmpeg_path()
+    if not ffmpeg:
+        return None
+    try:
+        path, size, mtime_ns = get_file_identity(ffmpeg)
+    except OSError:
+        return None
+    return f"{platform.system()}|{path}|{size}|{mtime_ns}"
+
+def cached_gpu():
+    """The encoder detect_gpu() found last time for this ffmpeg, or None."""
+    try:
+        with open(_capabilities_path(), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("key") and data.get("key") == _capabilities_key():
+        return data.get("encoder")
+    return None
+
+def store_gpu(encoder):
+    """Remembers a detect_gpu() result for cached_gpu()."""
+    key = _capabilities_key()
+    if not key:
+        return
+    path = _capabilities_path()
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"key": key, "encoder": encoder}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning(f"Could not save capability cache: {e}")
+
 def _check_encoder(encoder_name):
     """Verifies if the local FFmpeg supports the given encoder."""
+    return encoder_name in _list_encoders()
+
+@functools.lru_cache(maxsize=1)
+def _list_encoders():
+    """Output of `ffmpeg -encoders`, queried once per process."""
     ffmpeg = get_ffmpeg_path()
     if not ffmpeg:
-        return False
+        return ""
     
     try:
         # ffmpeg -encoders
         cmd = [ffmpeg, "-v", "error", "-encoders"]
         result = subprocess.run(cmd, capture_output=True, text=True)
-        return encoder_name in result.stdout
+        return result.stdout
     except:
-        return False
+        return ""
@@ -0,0 +1,143 @@
+import os
+import json
+import logging
+import tempfile
+import subprocess
+
+from src.utils import get_ffprobe_path
+
+# An output may differ from the summed input durations by this much
+DURATION_TOLERANCE = 1.0
+DURATION_TOLERANCE_RATIO = 0.005
+# Largest accepted gap between the last audio and the last video packet
+MAX_AV_DRIFT = 1.0
+
+CORRUPT_SUFFIX = ".corrupt"
+
+def _probe_streams(ffprobe, path):
+    """Container duration and stream types (header only)."""
+    from src.process_control import popen_kwargs
+
+    cmd = [ffprobe, '-v', 'error', '-show_entries', 'format=duration:stream=index,codec_type',
+           '-of', 'json', path]
+    result = subprocess.run(cmd, capture_output=True, text=True, stdin=subprocess.DEVNULL, **popen_kwargs())
+    if result.returncode != 0:
+        raise ValueError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "ffprobe failed")
+    data = json.loads(result.stdout or "{}")
+    duration = data.get('format', {}).get('duration')
+    streams = {s['index']: s.get('codec_type') for s in data.get('streams', [])}
+    return (float(duration) if duration not in (None, 'N/A') else None), streams
+
+def _scan_packets(ffprobe, path):
+    """
+    Reads every packet header (demux only, nothing is decoded) and returns
+    ({stream_index: (packet_count, end_seconds)}, error_text). Output is
+    streamed line by line, so memory stays flat for multi-hour files.
+    """
+    from src.process_control import popen_kwargs
+
+    cmd = [ffprobe, '-v', 'error', '-show_entries', 'packet=stream_index,pts_time,duration_time',
+           '-of', 'csv=p=0', path]
+    packets = {}
+    with tempfile.TemporaryFile(mode='w+') as errors:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors, stdin=subprocess.DEVNULL,
+                                   universal_newlines=True, **popen_kwargs())
+        for line in process.stdout:
+            fields = line.strip().split(',')
+            if len(fields) < 2:
+                continue
+            try:
+                index = int(fields[0])
+                end = float(fields[1]) + (float(fields[2]) if len(fields) > 2 and fields[2] not in ('', 'N/A') else 0)
+            except ValueError:
+                continue
+            count, last = packets.get(index, (0, 0.0))
+            packets[index] = (count + 1, max(last, end))
+        process.wait()
+        errors.seek(0)
+        error_text = errors.read(4096).strip()
+    if process.returncode != 0 and not error_text:
+        error_text = f"ffprobe exited with {process.returncode}"
+    return packets, error_text
+
+def verify_output(path, expected_duration=None, expect_video=True):
+    """
+    Checks a finished render: readable container, the expected streams
+    with packets in them, duration close to expected_duration and audio and
+    video ending together. Returns a result dict with 'ok' and 'problems'.
+    """
+    result = {
+        'path': path,
+        'ok': False,
+        'problems': [],
+        'duration': None,
+        'expected': expected_duration,
+        'drift': None,
+    }
+    problems = result['problems']
+
+    ffprobe = get_ffprobe_path()
+    if not ffprobe:
+        problems.append("ffprobe not found")
+        return result
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        problems.append("output missing or empty")
+        return result
+
+    try:
+        duration, streams = _probe_streams(ffprobe, path)
+        packets, error_text = _scan_packets(ffprobe, path)
+    except (OSError, ValueError) as e:
+        problems.append(f"unreadable: {e}")
+        return result
+    result['duration'] = duration
+
+    if error_text:
+        # Demuxer complaints (truncated atoms, invalid data) mean damage
+        problems.append(f"demux errors: {error_text.splitlines()[0]}")
+
+    ends = {}
+    for kind in (('audio', 'video') if expect_video else ('audio',)):
+        indexes = [i for i, t in streams.items() if t == kind]
+        counted = [packets[i] for i in indexes if i in packets and packets[i][0] > 0]
+        if not counted:
+            problems.append(f"no {kind} packets")
+            continue
+        ends[kind] = max(end for _, end in counted)
+
+    if 'audio' in ends and 'video' in ends:
+        result['drift'] = abs(ends['audio'] - ends['video'])
+        if result['drift'] > MAX_AV_DRIFT:
+            problems.append(f"A/V drift {result['drift']:.2f}s")
+
+    if expected_duration:
+        actual = duration if duration is not None else max(ends.values(), default=0)
+        tolerance = max(DURATION_TOLERANCE, expected_duration * DURATION_TOLERANCE_RATIO)
+        if abs(actual - expected_duration) > tolerance:
+            problems.append(f"duration {actual:.1f}s, expected {expected_duration:.1f}s")
+
+    result['ok'] = not problems
+    return result
+
+def quarantine(path):
+    """Renames a failed output so upload globs no longer match it (quarantine_invalid only)."""
+    target = path + CORRUPT_SUFFIX
+    try:
+        os.replace(path, target)
+        return target
+    except OSError as e:
+        logging.warning(f"Could not move aside {path}: {e}")
+        return None
+
+def format_report(results):
+    """Plain-text verification section for the batch report."""
+    lines = [f"Verified outputs: {len(results)} ({sum(1 for r in results if not r['ok'])} failed)"]
+    for r in sorted(results, key=lambda r: r['path']):
+        status = "OK  " if r['ok'] else "FAIL"
+        detail = f"{r['duration']:.1f}s" if r['duration'] is not None else "-"
+        if r['drift'] is not None:
+            detail += f", drift {r['drift']:.2f}s"
+        if r['problems']:
+            detail += " | " + "; ".join(r['problems'])
+        lines.append(f"  {status} {os.path.basename(r['path'])}: {detail}")
+    return "\n".join(lines)
@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import hashlib
+import logging
+import threading
+
+from src.utils import VIDEO_EXTS, AUDIO_EXTS
+
+WATCH_STATE_NAME = ".watch_state.json"
+DEFAULT_SETTLE_SECONDS = 30
+DEFAULT_POLL_SECONDS = 10
+
+# Names that copy tools use while a transfer is still running
+PARTIAL_SUFFIXES = ('.part', '.partial', '.crdownload', '.tmp', '.download', '.!sync')
+
+def folder_signature(folder):
+    """
+    Fingerprint of a project folder's media: hash of (relative path, size,
+    mtime) for every audio/video file. Returns (signature, has_partial) where
+    has_partial flags files that still look like an in-progress copy.
+    """
+    entries = []
+    has_partial = False
+    for root, dirs, files in os.walk(folder):
+        for f in files:
+            f_lower = f.lower()
+            if f_lower.endswith(PARTIAL_SUFFIXES) or f.startswith('~$'):
+                has_partial = True
+                continue
+            if not f_lower.endswith(VIDEO_EXTS + AUDIO_EXTS):
+                continue
+            path = os.path.join(root, f)
+            try:
+                st = os.stat(path)
+            except OSError:
+                has_partial = True  # Vanished mid-scan: still changing
+                continue
+            entries.append((os.path.relpath(path, folder), st.st_size, st.st_mtime_ns))
+
+    entries.sort()
+    digest = hashlib.sha1(json.dumps(entries).encode('utf-8')).hexdigest() if entries else None
+    return digest, has_partial
+
+class _InotifyWatcher:
+    """Linux inotify on the batch root and all of its subdirectories."""
+
+    MASK = (0x00000002 | 0x00000008 | 0x00000040 | 0x00000080 |   # MODIFY, CLOSE_WRITE, MOVED_FROM, MOVED_TO
+            0x00000100 | 0x00000200 | 0x00000004)                 # CREATE, DELETE, ATTRIB
+    IN_ISDIR = 0x40000000
+    IN_Q_OVERFLOW = 0x00004000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches = {}
+        self._add_tree(self.root)
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch limit reached (fs.inotify.max_user_watches)")
+            return
+        self._watches[wd] = path
+
+    def _add_tree(self, path):
+        self._add_watch(path)
+        for root, dirs, files in os.walk(path):
+            for d in dirs:
+                self._add_watch(os.path.join(root, d))
+
+    def _top_level(self, path):
+        rel = os.path.relpath(path, self.root)
+        if rel == '.' or rel.startswith('..') or rel.startswith('.'):
+            return None
+        return os.path.join(self.root, rel.split(os.sep)[0])
+
+    def wait(self, timeout):
+        """Returns the top-level folders touched within `timeout` seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set(), False
+
+        touched = set()
+        overflow = False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return touched, False
+
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            parent = self._watches.get(wd)
+            if parent is None:
+                continue
+            path = os.path.join(parent, os.fsdecode(name)) if name else parent
+            if mask & self.IN_ISDIR and mask & (0x00000100 | 0x00000080) and os.path.isdir(path):
+                # New (or moved-in) directory: watch it and everything below
+                self._add_tree(path)
+            top = self._top_level(path)
+            if top:
+                touched.add(top)
+        return touched, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+class FolderWatcher:
+    """
+    Watches a batch root for project folders that are new or changed and
+    whose files have stopped changing (stable size/mtime for
+    `settle_seconds`). Uses inotify where available, polling otherwise.
+    """
+
+    def __init__(self, batch_root, state_path, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 poll_seconds=DEFAULT_POLL_SECONDS, use_inotify=True):
+        self.batch_root = os.path.abspath(batch_root)
+        self.state_path = state_path
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.rendered = self._load_state()
+        self._observed = {}   # folder -> (signature, stable_since)
+
+        self._inotify = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self._inotify = _InotifyWatcher(self.batch_root)
+            except (OSError, AttributeError) as e:
+                logging.warning(f"inotify unavailable ({e}); falling back to polling.")
+
+        # First pass looks at every folder; later passes only at touched ones
+        self._candidates = set(self._all_folders())
+
+    @property
+    def backend(self):
+        return "inotify" if self._inotify else "polling"
+
+    def _all_folders(self):
+        try:
+            return [e.path for e in os.scandir(self.batch_root) if e.is_dir() and not e.name.startswith('.')]
+        except OSError as e:
+            logging.error(f"Cannot scan {self.batch_root}: {e}")
+            return []
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable watch state: {e}")
+            return {}
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.rendered, f, indent=1)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            logging.warning(f"Could not save watch state: {e}")
+
+    def mark_rendered(self, folder, signature):
+        self.rendered[os.path.basename(folder)] = signature
+        self._save_state()
+
+    def poll(self):
+        """
+        Waits up to poll_seconds for changes and returns a list of
+        (folder, signature) that are ready to render.
+        """
+        if self._inotify:
+            touched, overflow = self._inotify.wait(self.poll_seconds)
+            if overflow:
+                touched = set(self._all_folders())
+            self._candidates |= touched
+        else:
+            time.sleep(self.poll_seconds)
+            self._candidates |= set(self._all_folders())
+
+        now = time.monotonic()
+        ready = []
+        for folder in list(self._candidates):
+            if not os.path.isdir(folder):
+                self._candidates.discard(folder)
+                self._observed.pop(folder, None)
+                continue
+
+            signature, has_partial = folder_signature(folder)
+            if signature is None or has_partial:
+                # Empty or still being copied; look again next time
+                self._observed.pop(folder, None)
+                continue
+
+            if self.rendered.get(os.path.basename(folder)) == signature:
+                self._candidates.discard(folder)
+                self._observed.pop(folder, None)
+                continue
+
+            previous = self._observed.get(folder)
+            if previous is None or previous[0] != signature:
+                self._observed[folder] = (signature, now)
+                continue
+
+            if now - previous[1] >= self.settle_seconds:
+                ready.append((folder, signature))
+                self._candidates.discard(folder)
+                self._observed.pop(folder, None)
+
+        return ready
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+
+def run_watch(settings, on_message=print, stop_event=None):
+    """
+    Watch mode: renders new or changed subfolders of settings['batch_root']
+    into settings['output_path'] through the normal batch logic, until
+    stop_event is set (or Ctrl+C).
+    """
+    from src.processor import RenderThread
+
+    output_root = settings['output_path']
+    os.makedirs(output_root, exist_ok=True)
+    watcher = FolderWatcher(
+        settings['batch_root'],
+        os.path.join(output_root, WATCH_STATE_NAME),
+        settle_seconds=settings.get('watch_settle_seconds', DEFAULT_SETTLE_SECONDS),
+        poll_seconds=settings.get('watch_poll_seconds', DEFAULT_POLL_SECONDS),
+    )
+    stop_event = stop_event or threading.Event()
+    on_message(f"Watching {watcher.batch_root} ({watcher.backend}); outputs go to {output_root}")
+
+    # Shared between cycles so each render starts warm
+    audio_cache = None
+    speed_history = None
+    try:
+        while not stop_event.is_set():
+            ready = watcher.poll()
+            if not ready:
+                continue
+
+            names = ", ".join(os.path.basename(f) for f, _ in ready)
+            on_message(f"New or changed: {names}")
+
+            cycle = dict(settings, mode='batch', batch_folders=[f for f, _ in ready])
+            thread = RenderThread(cycle, audio_cache=audio_cache, speed_history=speed_history)
+            thread.progress_update.connect(on_message)
+            result = {}
+            thread.finished.connect(lambda ok, msg: result.update(ok=ok, msg=msg))
+
+            worker = threading.Thread(target=thread.run)
+            worker.start()
+            try:
+                while worker.is_alive():
+                    worker.join(0.5)
+                    if stop_event.is_set():
+                        thread.cancel()
+            except KeyboardInterrupt:
+                thread.cancel()
+                worker.join()
+                raise
+            on_message(result.get('msg', ""))
+
+            audio_cache = thread._get_audio_cache()
+            speed_history = thread._get_speed_history()
+            if thread.cancelled:
+                break
+            for folder, signature in ready:
+                if folder in thread.succeeded_folders:
+                    watcher.mark_rendered(folder, signature)
+    finally:
+        watcher.close()
@@ -0,0 +1,194 @@
+import os
+import time
+import contextlib
+import socket
+import sqlite3
+import logging
+
+QUEUE_DB_NAME = ".render_queue.sqlite"
+DEFAULT_LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class WorkQueue:
+    """
+    Batch work queue shared by several render nodes through a SQLite file in
+    the (shared) output root.
+
+    Workers claim folders under a time-limited lease and renew it while they
+    render; a crashed worker's lease simply expires and the folder becomes
+    claimable again. A result only counts if the worker still holds the
+    lease when it completes, so each folder is published exactly once.
+
+    The database uses the rollback journal (not WAL, which needs shared
+    memory and does not work across machines) and short IMMEDIATE
+    transactions, relying on the file system's byte-range locks.
+    """
+
+    def __init__(self, output_root, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.path = os.path.join(output_root, QUEUE_DB_NAME)
+        self.lease_seconds = lease_seconds
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS folders (
+                    name TEXT PRIMARY KEY,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    est_seconds REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    updated REAL
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker TEXT PRIMARY KEY,
+                    current TEXT,
+                    last_seen REAL,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0
+                )""")
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    # === COORDINATION ===
+    def populate(self, projects):
+        """Adds planned folders (idempotent: every worker may call this)."""
+        now = time.time()
+        with self._transaction() as conn:
+            for project in projects:
+                conn.execute(
+                    "INSERT OR IGNORE INTO folders (name, est_seconds, updated) VALUES (?, ?, ?)",
+                    (project['name'], project.get('est_seconds', 0), now)
+                )
+
+    def claim(self, worker_id):
+        """
+        Leases the most expensive available folder (longest-job-first).
+        Returns its name, or None when nothing is claimable right now.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("""
+                SELECT name FROM folders
+                WHERE attempts < ? AND (
+                    state = 'pending' OR (state = 'claimed' AND lease_expires < ?)
+                )
+                ORDER BY est_seconds DESC, name LIMIT 1
+            """, (MAX_ATTEMPTS, now)).fetchone()
+            if row is None:
+                return None
+
+            conn.execute("""
+                UPDATE folders SET state = 'claimed', worker = ?, lease_expires = ?,
+                    attempts = attempts + 1, progress = 0, message = NULL, updated = ?
+                WHERE name = ?
+            """, (worker_id, now + self.lease_seconds, now, row['name']))
+            self._touch_worker(conn, worker_id, row['name'], now)
+            return row['name']
+
+    def renew(self, name, worker_id, progress=None, message=None):
+        """Extends the lease (heartbeat). Returns False if the lease was lost."""
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute("""
+                UPDATE folders SET lease_expires = ?, progress = COALESCE(?, progress),
+                    message = COALESCE(?, message), updated = ?
+                WHERE name = ? AND worker = ? AND state = 'claimed'
+            """, (now + self.lease_seconds, progress, message, now, name, worker_id))
+            self._touch_worker(conn, worker_id, name, now)
+            return cur.rowcount == 1
+
+    def complete(self, name, worker_id, success, message=None, publish=None):
+        """
+        Finishes a claimed folder. `publish` (called inside the transaction,
+        only while the lease is still held) moves the result into place.
+        Returns False if another worker owns the folder by now.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT worker, state FROM folders WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None or row['worker'] != worker_id or row['state'] != 'claimed':
+                return False
+
+            if success and publish is not None:
+                publish()
+
+            if success:
+                state = 'done'
+            else:
+                # Failed folders are retried by any worker until MAX_ATTEMPTS
+                state = 'pending'
+            conn.execute("""
+                UPDATE folders SET state = ?, lease_expires = NULL, progress = ?,
+                    message = ?, updated = ?
+                WHERE name = ?
+            """, (state, 100 if success else 0, message, now, name))
+            column = 'done' if success else 'failed'
+            conn.execute(f"UPDATE workers SET {column} = {column} + 1, current = NULL WHERE worker = ?",
+                         (worker_id,))
+            return True
+
+    def has_unfinished(self):
+        """True while some folder is pending or leased (and may still need us)."""
+        with self._transaction() as conn:
+            row = conn.execute("""
+                SELECT COUNT(*) AS n FROM folders
+                WHERE attempts < ? AND state IN ('pending', 'claimed')
+            """, (MAX_ATTEMPTS,)).fetchone()
+            return row['n'] > 0
+
+    def _touch_worker(self, conn, worker_id, current, now):
+        conn.execute("""
+            INSERT INTO workers (worker, current, last_seen) VALUES (?, ?, ?)
+            ON CONFLICT(worker) DO UPDATE SET current = excluded.current, last_seen = excluded.last_seen
+        """, (worker_id, current, now))
+
+    # === REPORTING ===
+    def status(self):
+        """Returns (folder_counts_by_state, folder_rows, worker_rows)."""
+        try:
+            with self._transaction() as conn:
+                folders = [dict(r) for r in conn.execute("SELECT * FROM folders ORDER BY name")]
+                workers = [dict(r) for r in conn.execute("SELECT * FROM workers ORDER BY worker")]
+        except sqlite3.Error as e:
+            logging.error(f"Cannot read work queue {self.path}: {e}")
+            return {}, [], []
+
+        now = time.time()
+        counts = {}
+        for folder in folders:
+            state = folder['state']
+            if state == 'claimed' and (folder['lease_expires'] or 0) < now:
+                state = 'expired'
+            elif state == 'pending' and folder['attempts'] >= MAX_ATTEMPTS:
+                state = 'failed'
+            folder['display_state'] = state
+            counts[state] = counts.get(state, 0) + 1
+        return counts, folders, workers
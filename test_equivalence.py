@@ -0,0 +1,453 @@
+"""
+Output-equivalence tests for the render fast paths.
+
+Every scenario (lavfi-generated fixtures: mixed codecs, sample rates, odd
+durations, many tracks) is rendered through the reference path - one
+serial ffmpeg run per output, nothing cached, chunked or segmented - and
+through each fast path that applies to it. The outputs have to agree on
+duration, stream layout, decoded audio samples, A/V sync, chapters and
+the tracklist.
+
+    python test_equivalence.py [scenario ...]
+    python -m pytest test_equivalence.py
+
+Needs ffmpeg, ffprobe and PySide6; skipped without them.
+"""
+import os
+import sys
+import json
+import atexit
+import shutil
+import tempfile
+import unittest
+import subprocess
+import importlib.util
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+# Fixture tracks: (seconds, sine frequency, sample rate, channels, encoder args)
+TRACKS = {
+    'mp3_44k': (3.217, 440, 44100, 2, ['-c:a', 'libmp3lame', '-b:a', '192k']),
+    'aac_48k': (2.501, 523, 48000, 2, ['-c:a', 'aac', '-b:a', '160k']),
+    'wav_22k_mono': (1.733, 330, 22050, 1, ['-c:a', 'pcm_s16le']),
+    'flac_48k': (4.091, 659, 48000, 2, ['-c:a', 'flac']),
+    'ogg_32k_mono': (2.977, 392, 32000, 1, ['-c:a', 'libvorbis', '-q:a', '4']),
+    'mp3_48k_mono': (0.913, 587, 48000, 1, ['-c:a', 'libmp3lame', '-b:a', '96k']),
+}
+EXTENSIONS = {'libmp3lame': '.mp3', 'aac': '.m4a', 'pcm_s16le': '.wav', 'flac': '.flac', 'libvorbis': '.ogg'}
+# Background clips: (seconds, size, fps)
+VIDEOS = {
+    'bg_h264': (2.36, '320x240', 25),
+    'bg_odd_fps': (1.07, '256x144', 29.97),
+}
+
+SCENARIOS = {
+    'mixed_audio': {'tracks': ['mp3_44k', 'aac_48k', 'wav_22k_mono', 'flac_48k', 'ogg_32k_mono']},
+    'many_tracks': {'tracks': [name for _ in range(3) for name in TRACKS]},
+    'mono_repeat': {'tracks': ['mp3_48k_mono', 'wav_22k_mono', 'ogg_32k_mono'], 'repeat': 3},
+    'crossfade': {'tracks': ['flac_48k', 'mp3_44k', 'aac_48k', 'ogg_32k_mono'], 'crossfade': 0.8},
+    'video_mixed': {'tracks': ['aac_48k', 'mp3_44k', 'wav_22k_mono', 'flac_48k'], 'video': 'bg_h264'},
+    'video_repeat_crossfade': {'tracks': ['ogg_32k_mono', 'flac_48k', 'mp3_48k_mono'], 'video': 'bg_odd_fps',
+                               'repeat': 2, 'crossfade': 0.5},
+}
+
+# Settings of the reference render: every optimization off
+REFERENCE_SETTINGS = {
+    'audio_cache': False,
+    'chunked_audio': False,
+    'speed_history': False,
+    'gpu_encoder': 'libx264',
+}
+# Fast paths: extra settings, which outputs they apply to (video or
+# audio-only, None for both), a progress message proving the path was taken
+# and whether a first render has to warm it up
+FAST_PATHS = {
+    'chunked_audio': {
+        'settings': {'chunked_audio': True, 'audio_workers': 3, 'audio_chunk_seconds': 3},
+        'video': False,
+        'marker': "audio chunk(s)",
+        # Inputs are decoded (and resampled) one by one; repeated passes
+        # are padded to whole frames
+        'resamples_inputs': True,
+        'pads_passes': True,
+    },
+    'audio_cache': {
+        'settings': {'audio_cache': True},
+        'marker': "Using cached audio mix",
+        'warm': True,
+    },
+    'progressive_fmp4': {
+        'settings': {'progressive_output': 'fmp4', 'progressive_remux': True},
+        'video': True,
+        'marker': "Remuxing segments",
+    },
+    'progressive_hls': {
+        'settings': {'progressive_output': 'hls', 'progressive_remux': True},
+        'video': True,
+        'marker': "Remuxing segments",
+    },
+}
+
+# Allowed differences between a fast path's output and the reference
+DURATION_TOLERANCE = 0.05
+CHAPTER_TOLERANCE = 0.05
+# A/V drift of the reference (a few frames of B-frame reordering), and
+# extra drift allowed over it
+SYNC_TOLERANCE = 0.25
+# Decoded audio samples: MP3s have to match exactly, AAC may differ by its
+# priming/padding frames
+SAMPLE_TOLERANCE = {'mp3': 0, 'aac': 2048}
+MP3_FRAME_SAMPLES = 1152
+# Chapter starts against the summed lengths of the separate renders
+CHAPTER_DRIFT_PER_TRACK = 0.06
+
+_work_dir = None
+_fixtures = {}
+_references = {}
+
+def _missing():
+    """Why these tests cannot run here, or None."""
+    for tool in ('ffmpeg', 'ffprobe'):
+        if not shutil.which(tool):
+            return f"{tool} not found"
+    if importlib.util.find_spec("PySide6") is None:
+        return "PySide6 not installed"
+    return None
+
+def _work():
+    global _work_dir
+    if _work_dir is None:
+        _work_dir = tempfile.mkdtemp(prefix="loopvideo-equivalence-")
+        atexit.register(shutil.rmtree, _work_dir, True)
+        # Probe cache, audio cache and scratch space stay out of the user's
+        os.environ['LOOPVIDEO_DATA_DIR'] = os.path.join(_work_dir, "data")
+    return _work_dir
+
+# === FIXTURES ===
+def _ffmpeg(args):
+    result = subprocess.run(['ffmpeg', '-y', '-v', 'error'] + args, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with {result.returncode}")
+
+def fixture(name):
+    """Path of a generated fixture (created on first use)."""
+    if name in _fixtures:
+        return _fixtures[name]
+    folder = os.path.join(_work(), "fixtures")
+    os.makedirs(folder, exist_ok=True)
+    if name in VIDEOS:
+        seconds, size, fps = VIDEOS[name]
+        path = os.path.join(folder, f"{name}.mp4")
+        _ffmpeg(['-f', 'lavfi', '-i', f"testsrc2=size={size}:rate={fps}:duration={seconds}",
+                 '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', path])
+    else:
+        seconds, frequency, rate, channels, codec = TRACKS[name]
+        path = os.path.join(folder, name + EXTENSIONS[codec[1]])
+        _ffmpeg(['-f', 'lavfi', '-i', f"sine=frequency={frequency}:sample_rate={rate}:duration={seconds}",
+                 '-ac', str(channels)] + codec + [path])
+    _fixtures[name] = path
+    return path
+
+def _scenario_inputs(scenario):
+    spec = SCENARIOS[scenario]
+    # Repeated names are copies, so every track is a file of its own
+    paths = []
+    for n, name in enumerate(spec['tracks']):
+        source = fixture(name)
+        path = os.path.join(_work(), "inputs", scenario, f"{n + 1:02d} {os.path.basename(source)}")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(source, path)
+        paths.append(path)
+    return paths, (fixture(spec['video']) if spec.get('video') else None)
+
+# === RENDERING ===
+def render(scenario, label, extra=None, separate=False):
+    """
+    Renders a scenario synchronously with the reference settings plus
+    `extra`. Returns (output path, progress messages); raises
+    AssertionError if the render failed.
+    """
+    spec = SCENARIOS[scenario]
+    audio_paths, video_path = _scenario_inputs(scenario)
+    out_dir = os.path.join(_work(), "renders", scenario, label)
+    os.makedirs(out_dir, exist_ok=True)
+    if separate:
+        output_path = out_dir
+    else:
+        output_path = os.path.join(out_dir, f"{scenario}{'.mp4' if video_path else '.mp3'}")
+    settings = dict(REFERENCE_SETTINGS, **(extra or {}))
+    settings.update({
+        'mode': 'single',
+        'output_path': output_path,
+        'video_path': video_path,
+        'audio_paths': audio_paths,
+        'separate_files': separate,
+        'playlist_repeat': spec.get('repeat', 1),
+        'crossfade_seconds': spec.get('crossfade', 0),
+        'audio_cache_dir': os.path.join(_work(), "audio_cache", scenario),
+    })
+    return output_path, _run(settings, f"{scenario} [{label}]")
+
+def render_batch(scenario, label, folders, extra=None):
+    """
+    Renders `folders` copies of a video scenario as one batch (numbered
+    file names keep the track order). Returns (outputs, progress messages).
+    """
+    spec = SCENARIOS[scenario]
+    audio_paths, video_path = _scenario_inputs(scenario)
+    root = os.path.join(_work(), "batches", scenario, label)
+    out_dir = os.path.join(_work(), "renders", scenario, label)
+    outputs = []
+    for n in range(folders):
+        folder = os.path.join(root, f"{scenario}_{n + 1}")
+        os.makedirs(folder, exist_ok=True)
+        for i, path in enumerate(audio_paths):
+            shutil.copyfile(path, os.path.join(folder, f"{i:02d}_{os.path.basename(path)}"))
+        shutil.copyfile(video_path, os.path.join(folder, os.path.basename(video_path)))
+        outputs.append(os.path.join(out_dir, f"{scenario}_{n + 1}.mp4"))
+    os.makedirs(out_dir, exist_ok=True)
+    settings = dict(REFERENCE_SETTINGS, **(extra or {}))
+    settings.update({
+        'mode': 'batch',
+        'batch_root': root,
+        'output_path': out_dir,
+        'playlist_repeat': spec.get('repeat', 1),
+        'crossfade_seconds': spec.get('crossfade', 0),
+        'audio_cache_dir': os.path.join(_work(), "audio_cache", scenario),
+    })
+    return outputs, _run(settings, f"{scenario} [{label}]")
+
+def _run(settings, name):
+    """Runs a render synchronously. Returns its progress messages."""
+    from src.processor import RenderThread
+
+    messages = []
+    results = []
+    thread = RenderThread(settings)
+    thread.progress_update.connect(messages.append)
+    thread.finished.connect(lambda ok, message: results.append((ok, message)))
+    # run() directly: no Qt event loop is needed for direct signal delivery
+    thread.run()
+    ok, message = results[-1] if results else (False, "no result")
+    assert ok, f"{name} failed: {message}"
+    return messages
+
+def reference(scenario):
+    if scenario not in _references:
+        _references[scenario] = render(scenario, "reference")[0]
+    return _references[scenario]
+
+# === MEASURING ===
+def probe(path):
+    """Format duration, streams and chapters of an output."""
+    cmd = ['ffprobe', '-v', 'error', '-show_entries',
+           'format=duration:stream=codec_type,codec_name,sample_rate,channels,width,height,pix_fmt',
+           '-show_chapters', '-of', 'json', path]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+def layout(info):
+    keys = ('codec_type', 'codec_name', 'sample_rate', 'channels', 'width', 'height', 'pix_fmt')
+    return [tuple(stream.get(k) for k in keys) for stream in info.get('streams', [])]
+
+def chapter_starts(info):
+    return [float(chapter['start_time']) for chapter in info.get('chapters', [])]
+
+def audio_samples(path):
+    """Samples per channel the first audio stream decodes to."""
+    cmd = ['ffmpeg', '-v', 'error', '-i', path, '-map', '0:a:0', '-ac', '1', '-f', 's16le', '-']
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    return len(result.stdout) // 2
+
+def audio_seconds(path):
+    """
+    Decoded audio length. Container durations are no good here: ffprobe
+    counts an MP3's encoder delay and padding in.
+    """
+    rate = next(int(s['sample_rate']) for s in probe(path)['streams'] if s['codec_type'] == 'audio')
+    return audio_samples(path) / rate
+
+def tracklist_seconds(path):
+    """Timestamps of the tracklist next to an output, in seconds."""
+    with open(os.path.splitext(path)[0] + ".txt", 'r', encoding='utf-8') as f:
+        stamps = [line.split(' - ', 1)[0].split(':') for line in f.read().splitlines()]
+    return [sum(int(field) * 60 ** k for k, field in enumerate(reversed(fields))) for fields in stamps]
+
+def expected_duration(scenario):
+    """Playlist length from the decoded inputs: repeats, minus the crossfades."""
+    from src.crossfade import plan_fades
+
+    spec = SCENARIOS[scenario]
+    audio_paths, _ = _scenario_inputs(scenario)
+    durations = [audio_seconds(p) for p in audio_paths] * spec.get('repeat', 1)
+    total = sum(durations)
+    if spec.get('crossfade'):
+        total -= sum(plan_fades(durations, spec['crossfade']))
+    return total
+
+def compare(reference_path, candidate_path, video, sample_slack=0):
+    """Differences of candidate from reference beyond the tolerances, as text."""
+    from src.verify import verify_output
+
+    problems = []
+    ref, cand = probe(reference_path), probe(candidate_path)
+    if layout(ref) != layout(cand):
+        problems.append(f"stream layout {layout(cand)} != {layout(ref)}")
+
+    ref_duration, cand_duration = float(ref['format']['duration']), float(cand['format']['duration'])
+    # The video may end a few frames after the audio (see SYNC_TOLERANCE)
+    if abs(ref_duration - cand_duration) > DURATION_TOLERANCE + (SYNC_TOLERANCE if video else 0):
+        problems.append(f"duration {cand_duration:.3f}s != {ref_duration:.3f}s")
+
+    codec = 'aac' if video else 'mp3'
+    ref_samples, cand_samples = audio_samples(reference_path), audio_samples(candidate_path)
+    if abs(ref_samples - cand_samples) > SAMPLE_TOLERANCE[codec] + sample_slack:
+        problems.append(f"{cand_samples} audio samples != {ref_samples}")
+
+    if video:
+        ref_drift = verify_output(reference_path, ref_duration)['drift']
+        cand_drift = verify_output(candidate_path, ref_duration)['drift']
+        if cand_drift is None or cand_drift > (ref_drift or 0) + SYNC_TOLERANCE:
+            problems.append(f"A/V drift {cand_drift}s (reference {ref_drift}s)")
+
+    ref_chapters, cand_chapters = chapter_starts(ref), chapter_starts(cand)
+    if len(ref_chapters) != len(cand_chapters) or any(
+            abs(a - b) > CHAPTER_TOLERANCE for a, b in zip(ref_chapters, cand_chapters)):
+        problems.append(f"chapters {cand_chapters} != {ref_chapters}")
+
+    if tracklist_seconds(reference_path) != tracklist_seconds(candidate_path):
+        problems.append("tracklist differs")
+    return problems
+
+# === TESTS ===
+def _applies(scenario, fast_path):
+    wanted = FAST_PATHS[fast_path].get('video')
+    return wanted is None or wanted == bool(SCENARIOS[scenario].get('video'))
+
+# What each test runs on
+REFERENCE_CASES = list(SCENARIOS)
+FAST_PATH_CASES = [(s, f) for s in SCENARIOS for f in FAST_PATHS if _applies(s, f)]
+SEPARATE_CASES = [s for s, spec in SCENARIOS.items() if not spec.get('repeat') and not spec.get('crossfade')]
+SHARED_BACKGROUND_CASES = [s for s, spec in SCENARIOS.items() if spec.get('video')]
+
+def _cases(names, values):
+    """pytest.mark.parametrize, or nothing when run without pytest."""
+    if pytest is None:
+        return lambda test: test
+    return pytest.mark.parametrize(names, values)
+
+def _skip_if_missing():
+    reason = _missing()
+    if reason:
+        raise unittest.SkipTest(reason)
+
+@_cases('scenario', REFERENCE_CASES)
+def test_reference(scenario):
+    """
+    The reference render itself: playlist length, A/V sync, one chapter
+    per track and a tracklist agreeing with the chapters.
+    """
+    from src.verify import verify_output
+
+    _skip_if_missing()
+    spec = SCENARIOS[scenario]
+    path = reference(scenario)
+    result = verify_output(path, expect_video=bool(spec.get('video')))
+    assert result['ok'], f"{scenario}: {result['problems']}"
+    expected, actual = expected_duration(scenario), audio_seconds(path)
+    assert abs(actual - expected) <= DURATION_TOLERANCE, f"{scenario}: {actual:.3f}s, expected {expected:.3f}s"
+    if spec.get('video'):
+        assert result['drift'] <= SYNC_TOLERANCE, f"{scenario}: A/V drift {result['drift']:.3f}s"
+
+    starts = chapter_starts(probe(path))
+    assert len(starts) == len(spec['tracks']) * spec.get('repeat', 1), f"{scenario}: {len(starts)} chapters"
+    stamps = tracklist_seconds(path)
+    assert len(stamps) == len(spec['tracks'])
+    for stamp, start in zip(stamps, starts):
+        # The tracklist shows whole seconds
+        assert 0 <= start - stamp < 1 + CHAPTER_TOLERANCE, f"{scenario}: tracklist {stamp}s, chapter {start:.3f}s"
+
+@_cases('scenario, fast_path', FAST_PATH_CASES)
+def test_fast_path(scenario, fast_path):
+    _skip_if_missing()
+    spec = SCENARIOS[scenario]
+    config = FAST_PATHS[fast_path]
+    if config.get('warm'):
+        render(scenario, f"{fast_path}-warm", config['settings'])
+    path, messages = render(scenario, fast_path, config['settings'])
+    assert any(config['marker'] in m for m in messages), f"{scenario}: {fast_path} was not used"
+
+    slack = 0
+    if config.get('resamples_inputs'):
+        # Each input resampled on its own rounds its length by up to a sample
+        slack += len(spec['tracks']) * spec.get('repeat', 1)
+    if config.get('pads_passes'):
+        slack += (spec.get('repeat', 1) - 1) * MP3_FRAME_SAMPLES
+    problems = compare(reference(scenario), path, bool(spec.get('video')), slack)
+    assert not problems, f"{scenario} [{fast_path}]: " + "; ".join(problems)
+
+@_cases('scenario', SEPARATE_CASES)
+def test_separate(scenario):
+    """
+    Separate-file renders (one output per track) against the combined
+    reference: every track starts its chapter where the tracks before it
+    add up to.
+    """
+    _skip_if_missing()
+    out_dir, _ = render(scenario, "separate", separate=True)
+    audio_paths, video_path = _scenario_inputs(scenario)
+    ext = ".mp4" if video_path else ".mp3"
+    durations = [audio_seconds(os.path.join(out_dir, os.path.splitext(os.path.basename(p))[0] + ext))
+                 for p in audio_paths]
+
+    starts = chapter_starts(probe(reference(scenario)))
+    position = 0.0
+    for n, start in enumerate(starts):
+        # Chapters come from probed container durations, which may be off
+        # by a frame or two per track
+        assert abs(start - position) <= CHAPTER_DRIFT_PER_TRACK * (n + 1), \
+            f"{scenario}: chapter {n + 1} at {start:.3f}s, tracks add up to {position:.3f}s"
+        position += durations[n]
+
+@_cases('scenario', SHARED_BACKGROUND_CASES)
+def test_shared_background(scenario):
+    """
+    Batch folders with the same background: the clip is encoded once and
+    stream-copied into every folder's output, which still has to match
+    the reference render.
+    """
+    _skip_if_missing()
+    outputs, messages = render_batch(scenario, "shared_background", 2)
+    encodes = [m for m in messages if m.startswith("Encoding shared background")]
+    assert len(encodes) == 1, f"{scenario}: {len(encodes)} background encodes"
+    for path in outputs:
+        problems = compare(reference(scenario), path, True)
+        assert not problems, f"{scenario} [shared_background] {os.path.basename(path)}: " + "; ".join(problems)
+
+def _all_cases():
+    """(test, args) of every case, for the runner below."""
+    return ([(test_reference, (s,)) for s in REFERENCE_CASES]
+            + [(test_fast_path, case) for case in FAST_PATH_CASES]
+            + [(test_separate, (s,)) for s in SEPARATE_CASES]
+            + [(test_shared_background, (s,)) for s in SHARED_BACKGROUND_CASES])
+
+if __name__ == "__main__":
+    wanted = sys.argv[1:]
+    failed = 0
+    for test, args in _all_cases():
+        if wanted and args[0] not in wanted:
+            continue
+        name = f"{test.__name__}[{'-'.join(args)}]"
+        try:
+            test(*args)
+            print(f"[OK] {name}")
+        except unittest.SkipTest as e:
+            print(f"[SKIP] {name}: {e}")
+        except (AssertionError, RuntimeError, subprocess.CalledProcessError) as e:
+            failed += 1
+            print(f"[FAIL] {name}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,317 @@
+"""
+Unit tests for the pure-logic parts of the renderer: batch planning,
+deadline presets, the MP3 frame grid and Info header, the shared work
+queue, disk admission and adaptive concurrency. No ffmpeg or Qt needed.
+
+    python test_units.py
+    python -m pytest test_units.py
+"""
+import os
+import sys
+import time
+import shutil
+import struct
+import datetime
+import tempfile
+import threading
+
+from src import mp3join, presets
+from src.concurrency import ConcurrencyController, JobSlots
+from src.planner import plan_batch
+from src.scratch import ScratchManager
+from src.workqueue import MAX_ATTEMPTS, WorkQueue
+
+def _temp_dir():
+    return tempfile.mkdtemp(prefix="loopvideo-units-")
+
+# === PLANNER ===
+def _project(name, seconds):
+    return {'name': name, 'folder': name, 'video_path': None, 'video_info': None,
+            'audio_paths': [f"{name}.mp3"], 'audio_duration': seconds, 'est_seconds': 0.0}
+
+def test_plan_batch_longest_first():
+    projects = [_project('short', 60), _project('long', 600), _project('mid', 300)]
+    ordered, makespan = plan_batch(projects, 'libx264', 1, False, workers=2)
+    assert [p['name'] for p in ordered] == ['long', 'mid', 'short']
+    assert ordered[0]['est_seconds'] > ordered[1]['est_seconds'] > ordered[2]['est_seconds']
+    # mid and short share the second slot, and still finish before long
+    assert makespan == ordered[0]['est_seconds']
+
+def test_plan_batch_repeat_scales_cost():
+    once = plan_batch([_project('a', 120)], 'libx264', 1, False)[1]
+    twice = plan_batch([_project('a', 120)], 'libx264', 2, False)[1]
+    assert twice > once
+
+# === PRESETS ===
+def test_choose_slowest_preset_fast_enough():
+    preset, quality, speed = presets.choose('libx264', 0.5, 1.0)
+    # veryslow and slower are too slow; slow at CRF 18 just misses the margin
+    assert (preset, quality) == ('slow', 20)
+    assert speed >= 0.5 * presets.SAFETY_MARGIN
+
+def test_choose_fastest_when_nothing_is_quick_enough():
+    preset, quality, _ = presets.choose('libx264', 100.0, 1.0)
+    assert (preset, quality) == ('ultrafast', 23)
+
+def test_choose_prefers_measured_speed():
+    measured = lambda preset: 10.0 if preset == 'p7' else None
+    preset, quality, speed = presets.choose('h264_nvenc', 1.0, 1.0, measured)
+    assert (preset, quality) == ('p7', 19)
+    assert speed == 10.0 * 0.95
+
+def test_parse_deadline_relative():
+    assert presets.parse_deadline('+90m', now=1000.0) == 1000.0 + 5400
+    assert presets.parse_deadline('+2h', now=1000.0) == 1000.0 + 7200
+    assert presets.parse_deadline('+45s', now=1000.0) == 1045.0
+    # No unit means minutes
+    assert presets.parse_deadline('+5', now=1000.0) == 1300.0
+
+def test_parse_deadline_time_of_day():
+    now = datetime.datetime(2024, 5, 1, 10, 0).timestamp()
+    later = presets.parse_deadline('11:30', now=now)
+    assert datetime.datetime.fromtimestamp(later) == datetime.datetime(2024, 5, 1, 11, 30)
+    # Already past today: tomorrow
+    earlier = presets.parse_deadline('09:30', now=now)
+    assert datetime.datetime.fromtimestamp(earlier) == datetime.datetime(2024, 5, 2, 9, 30)
+
+def test_parse_deadline_iso_and_invalid():
+    iso = presets.parse_deadline('2024-05-01T08:00')
+    assert iso == datetime.datetime(2024, 5, 1, 8, 0).timestamp()
+    try:
+        presets.parse_deadline('tomorrow')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("no ValueError for an unknown deadline")
+
+# === MP3 FRAMES ===
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, joint stereo, no CRC: 417 bytes
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x40])
+
+def _frames(count):
+    frame = FRAME_HEADER + bytes(417 - len(FRAME_HEADER))
+    return frame * count
+
+def test_parse_header():
+    header = mp3join.parse_header(FRAME_HEADER)
+    assert header == {'version': 3, 'bitrate': 128, 'sample_rate': 44100, 'channels': 2,
+                      'length': 417, 'samples': 1152}
+    assert mp3join.parse_header(b"ID3\x04") is None
+    assert mp3join.parse_header(FRAME_HEADER[:3]) is None
+
+def test_plan_chunks_frame_grid():
+    spf = 1152
+    total = 44100 * 150
+    chunks = mp3join.plan_chunks(total, 44100, chunk_seconds=60)
+    chunk_frames = 60 * 44100 // spf
+    first = 0
+    for n, chunk in enumerate(chunks):
+        # Chunk n keeps the frames from global frame n * chunk_frames on,
+        # encoded with the pre-roll in front
+        assert first == n * chunk_frames
+        assert chunk['start'] == (first - mp3join.PREROLL_FRAMES) * spf
+        assert chunk['skip'] == mp3join.PREROLL_FRAMES
+        first += chunk['keep']
+    # Enough frames for the decoder to reach the last sample
+    assert first == -(-(total + mp3join.CODEC_DELAY) // spf)
+    assert chunks[-1]['start'] + chunks[-1]['count'] == total
+
+def test_plan_chunks_restart_every_period():
+    spf = 1152
+    period = 1000 * spf
+    chunks = mp3join.plan_chunks(3 * period, 44100, period_samples=period, chunk_seconds=10)
+    starts = set()
+    first = 0
+    for chunk in chunks:
+        starts.add(first)
+        first += chunk['keep']
+    assert {0, 1000, 2000} <= starts
+
+def test_window_spans():
+    pieces = [('a.pcm', 100), (None, 50), ('b.pcm', 100)]
+    assert mp3join.window_spans(pieces, -10, 30) == [(None, 0, 10), ('a.pcm', 0, 20)]
+    assert mp3join.window_spans(pieces, 90, 80) == [('a.pcm', 90, 10), (None, 0, 50), ('b.pcm', 0, 20)]
+
+def test_info_frame():
+    header = mp3join.parse_header(FRAME_HEADER)
+    toc = list(range(0, 200, 2))
+    info = mp3join.build_info_frame(header, 250, 104250, toc, delay=576, padding=1000)
+
+    info_header = mp3join.parse_header(info)
+    assert info_header['sample_rate'] == 44100 and info_header['channels'] == 2
+    assert len(info) == info_header['length']
+    tag = 4 + 32
+    assert info[tag:tag + 4] == b"Info"
+    flags, frames, total_bytes = struct.unpack(">III", info[tag + 4:tag + 16])
+    assert (flags, frames, total_bytes) == (0x0F, 250, 104250)
+    assert list(info[tag + 16:tag + 116]) == toc
+    lame = info[tag + 120:tag + 156]
+    assert lame[:9] == b"LAME3.100"
+    delay_padding = int.from_bytes(lame[21:24], 'big')
+    assert (delay_padding >> 12, delay_padding & 0xFFF) == (576, 1000)
+    assert struct.unpack(">H", lame[34:36])[0] == mp3join.crc16(info[:tag + 154])
+
+    # Readers skip the Info frame and find the audio behind it
+    frames = list(mp3join.iter_frames(info + _frames(3)))
+    assert [offset for offset, _ in frames] == [len(info) + 417 * n for n in range(3)]
+
+# === WORK QUEUE ===
+def test_lease_expiry():
+    root = _temp_dir()
+    try:
+        queue = WorkQueue(root, lease_seconds=0.2)
+        queue.populate([{'name': 'folder', 'est_seconds': 10}])
+        assert queue.claim('w1') == 'folder'
+        assert queue.claim('w2') is None
+        time.sleep(0.3)
+        # w1 went quiet: its lease expired
+        assert queue.claim('w2') == 'folder'
+        assert not queue.renew('folder', 'w1')
+        assert not queue.complete('folder', 'w1', True)
+        assert queue.complete('folder', 'w2', True)
+        counts, _, _ = queue.status()
+        assert counts == {'done': 1}
+        assert not queue.has_unfinished()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def test_attempt_limit():
+    root = _temp_dir()
+    try:
+        queue = WorkQueue(root)
+        queue.populate([{'name': 'broken', 'est_seconds': 10}])
+        for _ in range(MAX_ATTEMPTS):
+            assert queue.claim('w1') == 'broken'
+            assert queue.complete('broken', 'w1', False, "ffmpeg failed")
+        assert queue.claim('w1') is None
+        assert not queue.has_unfinished()
+        counts, folders, workers = queue.status()
+        assert counts == {'failed': 1}
+        assert folders[0]['attempts'] == MAX_ATTEMPTS
+        assert workers[0]['failed'] == MAX_ATTEMPTS
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def test_claim_longest_first():
+    root = _temp_dir()
+    try:
+        queue = WorkQueue(root)
+        queue.populate([{'name': 'a', 'est_seconds': 5}, {'name': 'b', 'est_seconds': 50}])
+        assert [queue.claim('w1'), queue.claim('w1'), queue.claim('w1')] == ['b', 'a', None]
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+# === DISK ADMISSION ===
+# More than any disk has free
+HUGE_MB = 1024 ** 4
+
+def _scratch(reserve_mb, strict=False):
+    root = _temp_dir()
+    return ScratchManager(root=os.path.join(root, "scratch"), reserve_mb=reserve_mb, strict=strict), root
+
+def test_admit_fits():
+    scratch, root = _scratch(0)
+    try:
+        assert scratch.admit('a', [(os.path.join(root, "out.mp4"), 1024)]) is None
+        assert scratch.admit('b', [(os.path.join(root, "out2.mp4"), 1024)]) is None
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def test_admit_lone_job_warns():
+    scratch, root = _scratch(HUGE_MB)
+    try:
+        short = []
+        assert scratch.admit('a', [(os.path.join(root, "out.mp4"), 1024)], on_short=short.append) is None
+        assert len(short) == 1 and "more free space" in short[0]
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def test_admit_lone_job_strict():
+    scratch, root = _scratch(HUGE_MB, strict=True)
+    try:
+        reason = scratch.admit('a', [(os.path.join(root, "out.mp4"), 1024)])
+        assert reason and "more free space" in reason
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def test_admit_waits_behind_running_job():
+    scratch, root = _scratch(HUGE_MB)
+    try:
+        out = os.path.join(root, "out.mp4")
+        assert scratch.admit('a', [(out, 1024)]) is None
+        waited = []
+        stop = threading.Event()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(scratch.admit(
+            'b', [(out, 1024)], should_stop=stop.is_set, on_wait=waited.append, poll_seconds=0.05)))
+        waiter.start()
+        time.sleep(0.2)
+        assert waiter.is_alive() and len(waited) == 1
+        # Once 'a' is done, 'b' runs alone
+        scratch.release('a')
+        waiter.join(5)
+        assert result == [None]
+
+        stop.set()
+        assert scratch.admit('c', [(out, 1024)], should_stop=stop.is_set, poll_seconds=0.05) == "stopped"
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+# === CONCURRENCY ===
+def _sample(**values):
+    sample = {'cpu': 0.5, 'iowait': 0.0, 'mem_available': 0.5, 'psi_cpu': None, 'psi_memory': None,
+              'psi_io': None, 'cores': 8, 'job_cores': 2.0, 'job_threads': 8}
+    sample.update(values)
+    return sample
+
+def test_concurrency_shrinks_under_pressure():
+    controller = ConcurrencyController(4, maximum=8, settle_seconds=20)
+    limit, reason = controller.decide(_sample(mem_available=0.05), running=4, now=100)
+    assert limit == 3 and "memory" in reason
+    # Settling: no change right after the last one
+    assert controller.decide(_sample(mem_available=0.05), running=4, now=110) == (3, None)
+    limit, reason = controller.decide(_sample(psi_io={'some': 50.0, 'full': 30.0}), running=3, now=121)
+    assert limit == 2 and "I/O" in reason
+
+def test_concurrency_keeps_minimum():
+    controller = ConcurrencyController(1, maximum=8)
+    assert controller.decide(_sample(iowait=0.5), running=1, now=100) == (1, None)
+
+def test_concurrency_grows_with_idle_cores():
+    controller = ConcurrencyController(2, maximum=8)
+    # 4 idle cores, the two jobs use one each
+    limit, reason = controller.decide(_sample(cpu=0.5, job_cores=2.0), running=2, now=100)
+    assert limit == 3 and "idle" in reason
+
+def test_concurrency_does_not_grow():
+    controller = ConcurrencyController(2, maximum=8)
+    # A free slot already
+    assert controller.decide(_sample(cpu=0.2), running=1, now=100) == (2, None)
+    # Busy machine
+    assert controller.decide(_sample(cpu=0.9), running=2, now=100) == (2, None)
+    # Jobs so heavy that another would not fit in the idle cores
+    assert controller.decide(_sample(cpu=0.5, job_cores=12.0), running=2, now=100) == (2, None)
+    # At the maximum
+    full = ConcurrencyController(2, maximum=2)
+    assert full.decide(_sample(cpu=0.1), running=2, now=100) == (2, None)
+
+def test_job_slots_resize():
+    slots = JobSlots(1)
+    assert slots.acquire()
+    assert not slots.acquire(should_stop=lambda: True, poll_seconds=0.01)
+    slots.resize(2)
+    assert slots.acquire(poll_seconds=0.01)
+    assert slots.running == 2
+
+if __name__ == "__main__":
+    failed = 0
+    for name, test in list(globals().items()):
+        if not name.startswith("test_") or not callable(test):
+            continue
+        try:
+            test()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"[FAIL] {name}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,94 @@
+"""
+Multi-process test of the shared work queue (src.workqueue): several
+worker processes drain one queue file the way render nodes share a batch.
+
+    python test_workqueue.py
+    python -m pytest test_workqueue.py
+"""
+import sys
+import time
+import queue as queue_module
+import shutil
+import tempfile
+import multiprocessing
+
+from src.workqueue import MAX_ATTEMPTS, WorkQueue
+
+WORKERS = 4
+FOLDERS = 40
+# Folder every worker fails on
+POISON = "poison"
+
+def _worker(root, worker_id, events):
+    """Claims and completes folders until the queue is drained; reports each step."""
+    queue = WorkQueue(root, lease_seconds=30)
+    while True:
+        name = queue.claim(worker_id)
+        if name is None:
+            if not queue.has_unfinished():
+                return
+            time.sleep(0.05)
+            continue
+        events.put(('claimed', worker_id, name))
+        success = name != POISON
+        if queue.complete(name, worker_id, success):
+            events.put(('done' if success else 'failed', worker_id, name))
+
+def test_workers_share_queue():
+    root = tempfile.mkdtemp(prefix="loopvideo-workqueue-")
+    try:
+        names = [f"folder{n:02d}" for n in range(FOLDERS)] + [POISON]
+        queue = WorkQueue(root, lease_seconds=0.5)
+        queue.populate([{'name': name, 'est_seconds': n} for n, name in enumerate(names)])
+        # A node that claims a folder and dies: its lease has to expire
+        # before anyone else may take the folder
+        crashed = queue.claim('crashed-node')
+        assert crashed == POISON
+        time.sleep(0.6)
+
+        context = multiprocessing.get_context()
+        events = context.Queue()
+        processes = [context.Process(target=_worker, args=(root, f"node{n}", events)) for n in range(WORKERS)]
+        for process in processes:
+            process.start()
+        # Drained while they run: a worker blocked on a full pipe never exits
+        log = []
+        deadline = time.monotonic() + 60
+        while any(p.is_alive() for p in processes) and time.monotonic() < deadline:
+            try:
+                log.append(events.get(timeout=0.1))
+            except queue_module.Empty:
+                pass
+        for process in processes:
+            process.join(5)
+            assert process.exitcode == 0, f"worker exited with {process.exitcode}"
+        while True:
+            try:
+                log.append(events.get(timeout=0.5))
+            except queue_module.Empty:
+                break
+        claims = [name for kind, _, name in log if kind == 'claimed']
+        done = [name for kind, _, name in log if kind == 'done']
+        failed = [name for kind, _, name in log if kind == 'failed']
+
+        # Every folder claimed exactly once and published exactly once
+        healthy = [name for name in names if name != POISON]
+        assert sorted(name for name in claims if name != POISON) == healthy
+        assert sorted(done) == healthy
+        # The expired lease was taken over; the poison folder was retried
+        # by the workers until the attempt limit
+        assert claims.count(POISON) == MAX_ATTEMPTS - 1
+        assert failed == [POISON] * (MAX_ATTEMPTS - 1)
+
+        counts, folders, _ = queue.status()
+        assert counts == {'done': len(healthy), 'failed': 1}
+        poison = next(f for f in folders if f['name'] == POISON)
+        assert poison['attempts'] == MAX_ATTEMPTS and poison['worker'] != 'crashed-node'
+        assert not queue.has_unfinished()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_workers_share_queue()
+    print("[OK] test_workers_share_queue")
+    sys.exit(0)